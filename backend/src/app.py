@@ -12,12 +12,17 @@ from controllers import (
 )
 
 import json
-from sqlalchemy import create_engine, inspect, Table, MetaData
-from sqlalchemy.orm import sessionmaker
+import functools
+from sqlalchemy import Table, MetaData
 # from apscheduler.schedulers.background import BackgroundScheduler
-from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
 from database.create_tables import create_tables
 from database.populate_tables import populate_tables
+from database.migrate_tables import migrate_tables
+from database.session import engine, Session, register_session_teardown
+from services.encoding_service import FORMATS, DTYPES, BINARY_MIMETYPE, encode_compact, encode_binary
+from services.tile_service import tile_service
+from services.response_cache import response_cache, make_key
+from services.job_service import job_manager, Job
 # import atexit
 
 
@@ -31,26 +36,24 @@ from database.populate_tables import populate_tables
 # atexit.register(lambda: scheduler.shutdown())
 
 
-DATABASE_URI = f'mysql+pymysql://{LOGIN_MYSQL}:{PASSWORD_MYSQL}@db/poluicao'
-engine = create_engine(DATABASE_URI)
-
-Session = sessionmaker(bind=engine)
-SESSION = Session()
-
-
 try:
     measure_indicator = Table('measure_indicator', MetaData(), autoload_with=engine, schema='poluicao')
-    row_count = SESSION.query(measure_indicator).count()
+    row_count = Session().query(measure_indicator).count()
     if row_count == 0:
         populate_tables()
 except Exception as e:
     print(e)
     create_tables()
     populate_tables()
+finally:
+    Session.remove()
+
+migrate_tables()
 
 
 app = Flask(__name__)
-CORS(app)
+CORS(app, expose_headers=["X-Search-Strategy", "X-CV-Scores"]) # Metadata of the /heatmap responses
+register_session_teardown(app, Session) # Each request gets its own session, closed when the request ends
 
 
 @app.route('/')
@@ -79,23 +82,218 @@ def heatmap(payload):
     Args:
         payload (str): A JSON string containing the request data, which should include:
             - "indicator": The name of the environmental indicator.
-            - "interpolator": A dictionary with "method" (interpolation type) and "params" (parameters for the method).
+            - "interpolator": A dictionary with "method" (interpolation type), "params" (parameters for the method)
+              and optionally "search" ("exhaustive" or "halving" hyperparameter search).
             - "interval": The time interval for the heatmap (e.g., "daily", "monthly").
             - Additional time references based on the interval.
+            - Optionally "format" ("json", "compact" or "binary") and "dtype" ("float32" or "uint16",
+              for the compact formats). Requests accepting only BINARY_MIMETYPE get the "binary" format.
 
     Returns:
-        Response: A JSON response containing the generated heatmaps with HTTP status 200.
+        Response: A response containing the generated heatmaps with HTTP status 200:
+            - "json" (default): a JSON object mapping each period to its list of {"lat", "long", "value"}.
+            - "compact": a JSON object with the grid geometry sent once and the base64 values of each
+              period (see services/encoding_service.py).
+            - "binary": the same header and values as a binary body (see encode_binary).
+        The hyperparameter search strategy used and the cross validation score (RMSE) of each heatmap
+        are reported in the "X-Search-Strategy" and "X-CV-Scores" (JSON) headers.
+        An invalid payload (see HeatMapController.validate_payload_format), or an unknown format or
+        dtype, gets HTTP status 400.
     """
     payload = json.loads(payload)
     response = make_response()
 
     if request.method == 'GET':
-        heatmaps = HeatMapController(session=SESSION).get_heatmap(payload=payload)
-        SESSION.close()
+        heatmap_format = get_heatmap_format(payload.pop("format", None), payload.pop("dtype", None))
+        if heatmap_format is None:
+            return jsonify({"error": UNKNOWN_FORMAT_ERROR}), 400
+        response_format, dtype = heatmap_format
+
+        heatmap_controller = HeatMapController(session=Session())
+        if not heatmap_controller.validate_payload_format(payload):
+            return jsonify({"error": "Invalid heatmap payload"}), 400
+        frames = heatmap_controller.get_heatmap_frames(payload=payload)
+        response = make_heatmap_response(frames, heatmap_controller.get_grid(), heatmap_controller.search_strategy,
+                                         heatmap_controller.cv_scores, response_format, dtype)
+
+    return response
+
+
+UNKNOWN_FORMAT_ERROR = f"Unknown format or dtype, expected one of {', '.join(FORMATS)} and {', '.join(DTYPES)}"
+
+
+def get_heatmap_format(response_format, dtype):
+    """
+    The format of a heatmap response: the requested one, or "binary" for the requests accepting only
+    BINARY_MIMETYPE and "json" otherwise. Returns the format and the dtype ("float32" by default), or
+    None if either is unknown, which is checked before computing the heatmaps.
+    """
+    if response_format is None:
+        accepts_binary = request.accept_mimetypes.best_match(["application/json", BINARY_MIMETYPE]) == BINARY_MIMETYPE
+        response_format = "binary" if accepts_binary else "json"
+    if dtype is None:
+        dtype = "float32"
+    if response_format not in FORMATS or dtype not in DTYPES:
+        return None
+    return response_format, dtype
+
+
+def make_heatmap_response(frames, grid, search_strategy, cv_scores, response_format, dtype):
+    """
+    The response of the heatmaps returned by HeatMapController.get_heatmap_frames, in the format (see heatmap).
+    """
+    if response_format == "json":
+        response = jsonify(HeatMapController.get_points(frames))
+    elif response_format == "compact":
+        response = jsonify(encode_compact(grid, frames, dtype))
+    else:
+        response = make_response(encode_binary(grid, frames, dtype))
+        response.mimetype = BINARY_MIMETYPE
+    response.vary.add("Accept")
+
+    response.headers["X-Search-Strategy"] = search_strategy
+    response.headers["X-CV-Scores"] = json.dumps(cv_scores)
+    response.status = 200
+    return response
+
+
+def run_heatmap_job(payload, job):
+    """
+    Computes the heatmaps of the payload in a background job, with its own database session.
+    """
+    try:
+        heatmap_controller = HeatMapController(session=Session())
+        heatmap_controller.progress = job.set_progress
+        frames = heatmap_controller.get_heatmap_frames(payload=payload)
+        return frames, heatmap_controller.get_grid(), heatmap_controller.search_strategy, heatmap_controller.cv_scores
+    finally:
+        Session.remove()
+
+
+@app.route('/heatmap/jobs', methods=['POST'])
+def submit_heatmap_job():
+    """
+    API endpoint to compute heatmaps in the background, for requests too long to wait for (e.g. many
+    frames or a large hyperparameter search).
+
+    Args:
+        Body: A JSON object with the heatmap request data (see heatmap), without "format" and "dtype".
+
+    Returns:
+        Response: A JSON response with the job (see heatmap_job_status) with HTTP status 202. Submitting the
+        payload of a job not failed nor expired returns that job. A missing or invalid payload gets
+        HTTP status 400, and no job.
+    """
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({"error": "The body must be a JSON object"}), 400
+    payload.pop("format", None)
+    payload.pop("dtype", None)
+    if not HeatMapController(session=None).validate_payload_format(payload):
+        return jsonify({"error": "Invalid heatmap payload"}), 400
+
+    job = job_manager.submit(make_key("heatmap", payload), functools.partial(run_heatmap_job, payload))
+    response = jsonify(job.to_dict())
+    response.status = 202
+    return response
 
-        response = jsonify(heatmaps)
-        response.status = 200
 
+@app.route('/heatmap/jobs/<string:job_id>', methods=['GET'])
+def heatmap_job_status(job_id):
+    """
+    API endpoint to poll a heatmap job.
+
+    Returns:
+        Response: A JSON response with the "status" of the job ("queued", "running", "done" or "failed"),
+        its progress ("frames_done" out of "frames_total", null until known) and its "error" if failed,
+        with HTTP status 200, or HTTP status 404 for unknown or expired jobs.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+
+    response = jsonify(job.to_dict())
+    response.status = 200
+    return response
+
+
+@app.route('/heatmap/jobs/<string:job_id>/result', methods=['GET'])
+def heatmap_job_result(job_id):
+    """
+    API endpoint to get the heatmaps of a finished job.
+
+    Args:
+        job_id (str): The job.
+        Query string: Optionally "format" and "dtype" (see heatmap).
+
+    Returns:
+        Response: The heatmaps as in heatmap with HTTP status 200. The job is returned with HTTP status
+        202 while it is not finished, and with HTTP status 500 if it failed. Unknown or expired jobs get
+        HTTP status 404, and an unknown format or dtype HTTP status 400.
+    """
+    heatmap_format = get_heatmap_format(request.args.get("format"), request.args.get("dtype"))
+    if heatmap_format is None:
+        return jsonify({"error": UNKNOWN_FORMAT_ERROR}), 400
+
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    if job.status == Job.FAILED:
+        return jsonify(job.to_dict()), 500
+    if job.status != Job.DONE:
+        return jsonify(job.to_dict()), 202
+
+    return make_heatmap_response(*job.result, *heatmap_format)
+
+
+@app.route('/heatmap/tiles/<int:z>/<int:x>/<int:y>.png', methods=['GET'])
+def heatmap_tile(z, x, y):
+    """
+    API endpoint to render a heatmap as Web Mercator PNG tiles, e.g. for a Leaflet tile layer.
+
+    Args:
+        z, x, y (int): The tile.
+        Query string:
+            - "payload": A JSON string with the heatmap request data (see heatmap).
+            - "frame": The key of the heatmap of the payload to render (e.g., the day of a "daily" payload).
+
+    Returns:
+        Response: The PNG tile with HTTP status 200. The cells of the heatmap are colored by the quality
+        intervals of the indicator, and the pixels without a value are transparent.
+        A missing or invalid payload or frame gets HTTP status 400, and a frame without a heatmap in the
+        payload HTTP status 404.
+    """
+    if "payload" not in request.args or "frame" not in request.args:
+        return jsonify({"error": "The payload and frame query arguments are required"}), 400
+    try:
+        payload = json.loads(request.args["payload"])
+    except ValueError:
+        return jsonify({"error": "The payload is not valid JSON"}), 400
+    frame = request.args["frame"]
+
+    heatmap_controller = HeatMapController(session=Session())
+    if not heatmap_controller.validate_payload_format(payload):
+        return jsonify({"error": "Invalid heatmap payload"}), 400
+
+    tile = tile_service.get_tile(payload, frame, z, x, y, heatmap_controller)
+    if tile is None:
+        return jsonify({"error": f"Unknown frame: {frame}"}), 404
+    response = make_response(tile)
+    response.mimetype = "image/png"
+    response.status = 200
+    return response
+
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    API endpoint to monitor the response cache of /heatmap and /linegraph.
+
+    Returns:
+        Response: A JSON response with the hit and miss counts and the size of the cache with HTTP status 200.
+    """
+    response = jsonify(response_cache.stats())
+    response.status = 200
     return response
 
 
@@ -117,8 +315,7 @@ def linegraph(payload):
     response = make_response()
 
     if request.method == 'GET':
-        linegraph_ = LineGraphController(session=SESSION).get_line_graph(payload=payload)
-        SESSION.close()
+        linegraph_ = LineGraphController(session=Session()).get_line_graph(payload=payload)
 
         response = jsonify({"line_graph": linegraph_})
         response.status = 200
@@ -1,9 +1,17 @@
 from repositories import MeasureIndicatorRepository
 from models import MeasureIndicator
 import math
+import functools
 import numpy as np
 from metadata.meta_data import INDICATORS, STATIONS_ID, RADIUS
-from services.interpolation_service import KNNInterpolator, KrigingInterpolator
+from services.interpolation_service import KNNInterpolator, KrigingInterpolator, IDWInterpolator, RBFInterpolator
+from services.discretization_service import AreaDiscretization, RectangularDiscretization, get_rectangular_discretization
+from services.hyperparameter_cache import hyperparameter_cache, make_key
+from services.execution_service import execution_pool
+from services.response_cache import response_cache, make_key as make_response_key
+from services.single_flight import single_flight
+from utils.config import HEATMAP_GRID_LAT_POINTS, KRIGING_NEIGHBORS
+from utils.utils import get_time_reference_range
 
 
 class HeatMapController:
@@ -21,34 +29,49 @@ class HeatMapController:
 
         self.measure_indicator_repository = MeasureIndicatorRepository(session)
         self.session = session
+        self.hyperparameter_cache = hyperparameter_cache
+        self.response_cache = response_cache
+        self.single_flight = single_flight
+        self.search_strategy = None # Set by get_heatmap
+        self.cv_scores = {} # Cross validation score (RMSE) of each heatmap, set by get_heatmap
+        self.progress = None # Called with (heatmaps done, total heatmaps) while get_heatmap computes
         self.interpolators = {
             "KNN": KNNInterpolator,
             "Kriging": KrigingInterpolator,
+            "IDW": IDWInterpolator,
+            "RBF": RBFInterpolator,
         }
+        # Hyperparameter search strategies of any interpolator
+        self.search_strategies = set().union(*(interpolator.SEARCH_STRATEGIES for interpolator in self.interpolators.values()))
         self.TIME_REFERENCE_MAP = {
             "instant": {
                 "isPeriod": False,
                 "payload_field": "hour",
                 "heatmaps_keys": range(1,2),
+                "heatmaps_period": None,
             },
             "hourly": {
                 "isPeriod": False,
                 "payload_field": "day",
                 "heatmaps_keys": range(0,24),
+                "heatmaps_period": "hour",
             },
             "daily": {
                 "isPeriod": False,
                 "payload_field": "month",
+                "heatmaps_period": "day",
             },
             "monthly": {
                 "isPeriod": False,
                 "payload_field": "year",
                 "heatmaps_keys": range(1,13),
+                "heatmaps_period": "month",
             },
             "yearly": {
                 "isPeriod": True,
                 "first_time_reference": "first_year",
                 "last_time_reference": "last_year",
+                "heatmaps_period": "year",
             },
         }
         self.MONTHS_HEATMAPS_KEYS = {
@@ -61,18 +84,72 @@ class HeatMapController:
     ) -> dict[dict]:
         """
         Generate heatmaps for a specified indicator, interval, and interpolator method.
+
+        Args:
+            payload (dict): See get_heatmap_frames.
+
+        Returns:
+            dict[dict]: A dict of dictionaries representing the heatmap data for each time period.
+            The search strategy used and the cross validation score of each heatmap are kept in
+            self.search_strategy and self.cv_scores.
+        """
+        return self.get_points(self.get_heatmap_frames(payload=payload))
+
+    @staticmethod
+    def get_points(frames: dict) -> dict[list]:
+        """
+        Convert the heatmaps returned by get_heatmap_frames to lists of {"lat", "long", "value"}.
+        """
+        response = {}
+        for key, frame in frames.items():
+            response[key] = [] if frame is None else [{"lat": coordinates[0], "long": coordinates[1], "value": value}
+                                                      for coordinates, value in zip(*frame)]
+        return response
+
+    def get_heatmap_frames(
+        self,
+        payload: dict
+    ) -> dict:
+        """
+        Generate the heatmaps for a specified indicator, interval, and interpolator method, as arrays.
         
         Args:
             payload (dict): A dictionary containing:
                 - "indicator": The name of the indicator.
-                - "interpolator": A dictionary with "method" (interpolation type) and "params" (parameters for the method).
+                - "interpolator": A dictionary with "method" (interpolation type), "params" (parameters for the method)
+                  and optionally "search" (hyperparameter search strategy, "exhaustive" by default).
                 - "interval": The time interval for the heatmap (e.g., "daily", "monthly").
                 - Additional time references based on the interval.
 
         Returns:
-            dict[dict]: A dict of dictionaries representing the heatmap data for each time period.
+            dict: A dict mapping each time period to its (area discretization, predicted values), or
+            None for the periods without data. The area discretizations are subsets of get_grid().
+            The search strategy used and the cross validation score of each heatmap are kept in
+            self.search_strategy and self.cv_scores.
+            The results of identical payloads are served from the response cache until new measures
+            of their indicator and period are inserted, and concurrent requests of the same payload
+            share a single computation.
         """
+        cache_key = make_response_key("heatmap", payload)
+        cached = self.response_cache.get(cache_key)
+        if cached is None:
+            cached = self.single_flight.do(cache_key, functools.partial(self.__compute_heatmap_frames, payload, cache_key))
 
+        response, self.search_strategy, self.cv_scores = cached
+        self.__report_progress(len(response), len(response))
+        return response
+
+    def __compute_heatmap_frames(self, payload: dict, cache_key) -> tuple:
+        """
+        Compute the heatmaps of the payload (see get_heatmap_frames) and cache them.
+
+        Args:
+            payload (dict): The heatmap payload.
+            cache_key: The response cache key of the payload.
+
+        Returns:
+            tuple: The heatmaps, the search strategy used and the cross validation score of each heatmap.
+        """
         indicator = payload["indicator"]
         interpolator_dict = payload["interpolator"]
         indicator_id = INDICATORS[indicator]
@@ -80,6 +157,14 @@ class HeatMapController:
         interpolator_method = interpolator_dict["method"]
         parameters = interpolator_dict["params"]
 
+        search = interpolator_dict.get("search", "exhaustive")
+        if search not in self.search_strategies:
+            raise ValueError(f"Unknown search strategy: {search}")
+        if search not in self.interpolators[interpolator_method].SEARCH_STRATEGIES:
+            search = "exhaustive" # e.g. KNN scores every k at once
+        self.search_strategy = search
+        self.cv_scores = {}
+
         interval = payload["interval"]
         interval_map = self.TIME_REFERENCE_MAP[interval]
 
@@ -101,13 +186,18 @@ class HeatMapController:
                 heatmaps_keys = interval_map["heatmaps_keys"]
         
         response = self.__get_heatmaps(heatmaps_keys=heatmaps_keys,
+                                       heatmaps_period=interval_map["heatmaps_period"],
                                        time_reference_str=time_reference_str,
                                        indicator_id=indicator_id,
                                        interpolator_method=interpolator_method,
                                        parameters=parameters,
-                                       indicator=indicator)
-         
-        return response
+                                       search=search,
+                                       indicator=indicator,
+                                       interval=interval)
+
+        result = (response, self.search_strategy, self.cv_scores)
+        self.response_cache.set(cache_key, result, [indicator_id], *self.get_time_range(payload))
+        return result
     
     top = [-23.5737757 + 0.4, -46.7369984 - 0.2]
     bottom = [-23.5737757 - 0.4, -46.7369984 + 0.6]
@@ -115,51 +205,173 @@ class HeatMapController:
     def __get_heatmaps(
         self,
         heatmaps_keys: list,
+        heatmaps_period: str,
         time_reference_str: str,
         indicator_id: int,
         interpolator_method: str,
         parameters,
+        search: str,
         indicator: str,
+        interval: str,
     ):
         """
         Generate heatmaps for each time key in the interval.
 
         Args:
             heatmaps_keys (list): Keys representing specific time periods within the interval.
+            heatmaps_period (str): The period ("year", "month", "day" or "hour") represented by the keys.
             time_reference_str (str): The base time reference string for the interval.
             indicator_id (int): The ID of the indicator.
             interpolator_method (str): The interpolation method to use.
             parameters: Parameters for the interpolation method.
+            search (str): The hyperparameter search strategy.
             indicator (str): The name of the indicator.
+            interval (str): The time interval of the heatmaps.
 
         Returns:
-            dict: A dictionary mapping time keys to heatmap data.
+            dict: A dictionary mapping time keys (str) to (area discretization, values), or None.
         """
-        response = {}
-        for key in heatmaps_keys:
-            incremented_time_reference_str = self.__increment_time_reference_str(time_reference_str, key)
+        mean_values_per_key = self.__get_mean_values_per_key(heatmaps_keys=heatmaps_keys,
+                                                             heatmaps_period=heatmaps_period,
+                                                             time_reference_str=time_reference_str,
+                                                             indicator_id=indicator_id)
 
-            mean_values = self.measure_indicator_repository.get_mean_measure_indicators(time_reference_str=incremented_time_reference_str,
-                                                                                            indicator_id=indicator_id)
+        interpolator_class = self.interpolators[interpolator_method]
+        neighbors = KRIGING_NEIGHBORS if getattr(interpolator_class, "local", False) else None
+
+        # Frames sharing the same known points are interpolated together by the batched interpolators
+        frames_per_station_set = {}
+        for key in heatmaps_keys:
+            mean_values = mean_values_per_key.get(key, [])
             if len(mean_values) > 0:
                 area_discretization = self.__get_rectangular_discretization(mean_values, indicator)
 
-                interpolator_input = self.__build_interpolator_input(area_discretization=area_discretization,
-                                                                     measure_indicators=mean_values)
-                
-                interpolator = self.interpolators[interpolator_method](interpolator_input, parameters)
+                known_points, values = self.__build_interpolator_input(area_discretization=area_discretization,
+                                                                       measure_indicators=mean_values)
 
-                y = interpolator.predict(X=area_discretization)
+                station_ids = [mean_value.idStation for mean_value in mean_values if not math.isnan(mean_value.value)]
+                time_key = self.__increment_time_reference_str(time_reference_str, key) if heatmaps_period else time_reference_str
+                cache_key = make_key(indicator_id, interval, time_key, station_ids, interpolator_method, parameters, search,
+                                     neighbors)
 
-                heat_map = [{"lat": coordinates[0], "long": coordinates[1], "value": value} for coordinates, value in zip(area_discretization,y)]
-            else:
-                heat_map = []
+                station_set = (area_discretization, tuple(known_points)) if getattr(interpolator_class, "batched", False) else key
+                frames_per_station_set.setdefault(station_set, []).append((key, area_discretization, (known_points, values),
+                                                                           cache_key))
+
+        frame_groups = list(frames_per_station_set.values())
+        frames_done = len(heatmaps_keys) - sum(len(frames) for frames in frame_groups) # The heatmaps without data
+        self.__report_progress(frames_done, len(heatmaps_keys))
+
+        def on_groups_done(groups_done):
+            self.__report_progress(frames_done + sum(len(frames) for frames in frame_groups[:groups_done]), len(heatmaps_keys))
 
-            key = str(key)
-            response[key] = heat_map
+        heat_maps = self.__interpolate_frames(frame_groups, interpolator_class, parameters, search, neighbors, on_groups_done)
+
+        response = {}
+        for key in heatmaps_keys:
+            response[str(key)] = heat_maps.get(key)
         
         return response
+
+    def __interpolate_frames(self, frame_groups: list, interpolator_class, parameters, search: str, neighbors,
+                             on_groups_done=None) -> dict:
+        """
+        Interpolate groups of frames sharing the same discretized area and known points. A single frame
+        is interpolated alone; several frames are interpolated by one batched interpolator. The groups
+        are dispatched to the execution pool as units of work.
+        The hyperparameters cached for the frames are reused, and the newly selected ones are cached.
+
+        Args:
+            frame_groups (list): Lists of (key, area discretization, (known points, values), cache key) of each frame.
+            interpolator_class: The interpolator class to use.
+            parameters: Parameters for the interpolation method.
+            search (str): The hyperparameter search strategy.
+            neighbors (int): The number of nearest stations of local kriging, or None.
+            on_groups_done (callable): Called with the number of groups interpolated, as they are done.
+
+        Returns:
+            dict: A dictionary mapping time keys to (area discretization, values).
+        """
+        options = {"search": search} if search != "exhaustive" else {}
+        if neighbors is not None:
+            options["neighbors"] = neighbors
+
+        units = []
+        cached_params_per_group = []
+        for frames in frame_groups:
+            _, area_discretization, (known_points, values), _ = frames[0]
+            cached_params = self.hyperparameter_cache.get_many([cache_key for _, _, _, cache_key in frames])
+            if len(frames) > 1:
+                values = np.column_stack([frame_values for _, _, (_, frame_values), _ in frames])
+            else:
+                cached_params = cached_params[0]
+            coordinates = np.column_stack((area_discretization.lat[known_points], area_discretization.long[known_points]))
+            units.append(((coordinates, values), area_discretization, cached_params))
+            cached_params_per_group.append(cached_params)
+
+        number_of_known_points = max([len(frames[0][2][0]) for frames in frame_groups], default=0)
+        results = execution_pool.map(functools.partial(_interpolate, interpolator_class, parameters, options),
+                                     units, points=number_of_known_points, callback=on_groups_done)
+
+        heat_maps = {}
+        for frames, cached_params, (y, selected_params) in zip(frame_groups, cached_params_per_group, results):
+            if len(frames) == 1:
+                cached_params, selected_params = [cached_params], [selected_params]
+            y = np.reshape(y, (len(y), len(frames)))
+
+            self.hyperparameter_cache.set_many({cache_key: frame_selected_params
+                                                for (_, _, _, cache_key), cached, frame_selected_params in zip(frames, cached_params, selected_params)
+                                                if cached is None})
+
+            for i, (key, area_discretization, _, _) in enumerate(frames):
+                score = float(selected_params[i][1])
+                self.cv_scores[str(key)] = None if math.isnan(score) else score # NaN is not valid JSON
+                heat_maps[key] = (area_discretization, y[:, i])
+        return heat_maps
     
+    def __get_mean_values_per_key(
+        self,
+        heatmaps_keys: list,
+        heatmaps_period: str,
+        time_reference_str: str,
+        indicator_id: int
+    ) -> dict:
+        """
+        Retrieve the mean values of every heatmap with a single query and split them by time key.
+
+        Args:
+            heatmaps_keys (list): Keys representing specific time periods within the interval.
+            heatmaps_period (str): The period ("year", "month", "day" or "hour") represented by the keys.
+            time_reference_str (str): The base time reference string for the interval.
+            indicator_id (int): The ID of the indicator.
+
+        Returns:
+            dict: A dictionary mapping time keys to the mean values of each station.
+        """
+        if heatmaps_period is None:
+            key = heatmaps_keys[0]
+            incremented_time_reference_str = self.__increment_time_reference_str(time_reference_str, key)
+            mean_values = self.measure_indicator_repository.get_mean_measure_indicators(time_reference_str=incremented_time_reference_str,
+                                                                                        indicator_id=indicator_id)
+            return {key: mean_values}
+
+        if time_reference_str is None:
+            first_year, last_year = heatmaps_keys[0], heatmaps_keys[-1]
+        else:
+            first_year, last_year = None, None
+
+        mean_values = self.measure_indicator_repository.get_mean_measure_indicators_per_period(indicator_id=indicator_id,
+                                                                                               period=heatmaps_period,
+                                                                                               time_reference_str=time_reference_str,
+                                                                                               first_year=first_year,
+                                                                                               last_year=last_year)
+
+        mean_values_per_key = {}
+        for mean_value in mean_values:
+            mean_values_per_key.setdefault(int(mean_value.period), []).append(mean_value)
+
+        return mean_values_per_key
+
     def __increment_time_reference_str(self, time_reference_str, key):
         """
         Increment the time reference string by the given key.
@@ -187,39 +399,79 @@ class HeatMapController:
             return time_reference_str + " " + str_key
 
     
-    def __get_rectangular_discretization(self, mean_values: list, indicator: str) -> list[tuple]:
+    BORDERS_COORDINATES = {
+        "min_lat": -24.00736242788278,
+        "max_lat": -23.35831688708724,
+        "min_long": -46.83459631388834,
+        "max_long": -46.36359807038185,
+    }
+    NUMBER_OF_LAT_POINTS = HEATMAP_GRID_LAT_POINTS  # Number of divisions in latitude
+
+    def __report_progress(self, done: int, total: int) -> None:
+        if self.progress is not None:
+            self.progress(done, total)
+
+    def get_grid(self) -> RectangularDiscretization:
+        """
+        The rectangular grid covering the area, built once per process and shared by every request.
+        """
+        return get_rectangular_discretization(number_of_lat_points=self.NUMBER_OF_LAT_POINTS, **self.BORDERS_COORDINATES)
+
+    @staticmethod
+    def get_time_range(payload: dict) -> tuple:
+        """
+        Return the first instant of the period covered by the heatmaps of the payload and the first
+        instant after it, e.g. the month of a "daily" payload.
+        """
+        if payload["interval"] == "yearly":
+            return get_time_reference_range(payload["first_year"])[0], get_time_reference_range(payload["last_year"])[1]
+        payload_field = {"instant": "hour", "hourly": "day", "daily": "month", "monthly": "year"}[payload["interval"]]
+        return get_time_reference_range(payload[payload_field])
+
+    def validate_payload_format(self, payload: dict) -> bool:
         """
-        Create a rectangular grid of coordinates within a specified area.
+        Validates the format of the input payload (see get_heatmap_frames), before computing its heatmaps.
 
         Args:
-            mean_values (list): List of mean values from the database.
-            indicator (str): The name of the indicator.
+            payload (dict): Payload dictionary to validate.
 
         Returns:
-            list[tuple]: A list of tuples representing the discretized area.
+            bool: True if the payload format is valid, False otherwise.
         """
+        try:
+            if payload["indicator"] not in INDICATORS:
+                return False
 
-        borders_coordinates = {
-            "min_lat": -24.00736242788278,
-            "max_lat": -23.35831688708724,
-            "min_long": -46.83459631388834,
-            "max_long": -46.36359807038185,
-        }
+            interpolator_dict = payload["interpolator"]
+            if interpolator_dict["method"] not in self.interpolators or not isinstance(interpolator_dict["params"], dict):
+                return False
+            if interpolator_dict.get("search", "exhaustive") not in self.search_strategies:
+                return False
 
-        number_of_lat_points = 60  # Number of divisions in latitude
-        
-        lat_range = np.linspace(borders_coordinates['min_lat'], borders_coordinates['max_lat'], number_of_lat_points)
-        
-        lat_distance = borders_coordinates['max_lat'] - borders_coordinates['min_lat']
-        long_distance = borders_coordinates['max_long'] - borders_coordinates['min_long']
-        
-        aspect_ratio = lat_distance / long_distance
-        number_of_long_points = int(number_of_lat_points / aspect_ratio)
-        
-        long_range = np.linspace(borders_coordinates['min_long'], borders_coordinates['max_long'], number_of_long_points)
+            if payload["interval"] not in self.TIME_REFERENCE_MAP:
+                return False
+            self.get_time_range(payload) # Validates the time references of the interval
+
+        except Exception as e:
+            print(e)
+            return False
 
-        area_discretization = [(lat, lon) for lat in lat_range for lon in long_range]
-        area_discretization = self.__remove_distant_points(area_discretization=area_discretization,
+        return True
+
+    def __get_rectangular_discretization(self, mean_values: list, indicator: str) -> AreaDiscretization:
+        """
+        Select the points of the rectangular grid covering the area that are close to a useful station.
+        The grid itself is built once per process and shared by every request.
+
+        Args:
+            mean_values (list): List of mean values from the database.
+            indicator (str): The name of the indicator.
+
+        Returns:
+            AreaDiscretization: The discretized area.
+        """
+
+        area_discretization = self.__remove_distant_points(area_discretization=self.get_grid(),
                                                            mean_values=mean_values,
                                                            indicator=indicator)
 
@@ -229,148 +481,137 @@ class HeatMapController:
         self,
         mean_values,
         indicator,
-        area_discretization: list[tuple]
-    ) -> list[tuple]:
+        area_discretization: AreaDiscretization
+    ) -> AreaDiscretization:
         """
         Remove points from the discretized area that are farther than a specified radius from any useful station.
 
         Args:
             mean_values (list): List of indicator measures.
             indicator (str): The indicator.
-            area_discretization (list[tuple]): The list of discretized coordinates.
+            area_discretization (AreaDiscretization): The discretized area.
 
         Returns:
-            list[tuple]: A filtered list of coordinates.
+            AreaDiscretization: The filtered discretized area.
         """
 
-        new_area_discretization = []
-
-        for point in area_discretization:
-            for measure_indicator in mean_values:
-                if math.isnan(measure_indicator.value): continue
-
-                station_coordinates = STATIONS_ID[measure_indicator.idStation]
-                dist = self.__haversine_dist(point[0], point[1], station_coordinates[0], station_coordinates[1])
+        station_ids = frozenset(measure_indicator.idStation for measure_indicator in mean_values
+                                if not math.isnan(measure_indicator.value))
 
-                if dist < RADIUS[indicator][measure_indicator.idStation]:
-                    new_area_discretization.append(point)
-                    break
-
-        return new_area_discretization
-
-    def __haversine_dist(self, lat1, lon1, lat2, lon2):
-        """
-        Calculate the Haversine distance between two geographic coordinates.
-
-        Args:
-            lat1 (float): Latitude of the first point.
-            lon1 (float): Longitude of the first point.
-            lat2 (float): Latitude of the second point.
-            lon2 (float): Longitude of the second point.
-
-        Returns:
-            float: The distance in kilometers.
-        """
-
-        R = 6371.0
-
-        lat1_rad = math.radians(lat1)
-        lon1_rad = math.radians(lon1)
-        lat2_rad = math.radians(lat2)
-        lon2_rad = math.radians(lon2)
-
-        dlat = lat2_rad - lat1_rad
-        dlon = lon2_rad - lon1_rad
-
-        a = math.sin(dlat / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-        distance = R * c
-
-        return distance
+        return _get_covered_discretization(area_discretization, indicator, station_ids)
 
     def __build_interpolator_input(
         self,
-        area_discretization: list[list],
+        area_discretization: AreaDiscretization,
         measure_indicators
-    ) -> dict[tuple,float]:
+    ) -> tuple[np.ndarray, np.ndarray]:
         """
-        Build the input for the interpolator by mapping coordinates to values.
+        Build the input for the interpolator: the points of the discretized area closest to the stations
+        with a measure, and the measured values.
 
         Args:
-            area_discretization (list[list]): The discretized area coordinates.
+            area_discretization (AreaDiscretization): The discretized area coordinates.
             measure_indicators: The list of indicator measures.
 
         Returns:
-            dict[tuple, float]: A mapping of coordinates to values.
+            tuple[np.ndarray, np.ndarray]: The indices of the known points in the discretized area, in
+            increasing order, and their values.
         """
 
-        y = []
-        for _ in area_discretization:
-            y.append(math.nan)
+        y = np.full(len(area_discretization), math.nan)
         
         y = self.__fill_known_points(area_discretization=area_discretization,
                           y=y,
                           measure_indicators=measure_indicators)
         
-        interpolator_input = {tuple(a):b for a,b in zip(area_discretization,y)}
+        known_points = np.nonzero(~np.isnan(y))[0]
 
-        return interpolator_input
+        return known_points, y[known_points]
 
     def __fill_known_points(
         self,
-        area_discretization: list,
-        y: list,
+        area_discretization: AreaDiscretization,
+        y: np.ndarray,
         measure_indicators
-    ) -> list:
+    ) -> np.ndarray:
         """
         Fill known points in the interpolator input with their measured values.
 
         Args:
-            area_discretization (list): The list of discretized coordinates.
-            y (list): The list which should be filled with values.
+            area_discretization (AreaDiscretization): The discretized area.
+            y (np.ndarray): The array which should be filled with values.
             measure_indicators: The list of indicator measures.
 
         Returns:
-            list: The updated list of values.
+            np.ndarray: The updated array of values.
         """
 
+        station_cells = _get_station_cells(area_discretization)
+
         for measure_indicator in measure_indicators:
-            station_coordinates = STATIONS_ID[measure_indicator.idStation]
-            min_dist_index = self.__get_closer_point(area_discretization=area_discretization,
-                                                     station_coordinates=station_coordinates)
-            y[min_dist_index] = measure_indicator.value
+            y[station_cells[measure_indicator.idStation]] = measure_indicator.value
         
         return y
 
-    def __get_closer_point(
-        self,
-        area_discretization: list[tuple],
-        station_coordinates: tuple
-    ) -> int:
-        """
-        Find the closest point in the discretized area to a station's coordinates.
 
-        Args:
-            area_discretization (list[tuple]): The list of discretized coordinates.
-            station_coordinates (tuple): The coordinates of the station.
+@functools.lru_cache(maxsize=1024)
+def _get_covered_discretization(
+    area_discretization: AreaDiscretization,
+    indicator: str,
+    station_ids: frozenset
+) -> AreaDiscretization:
+    """
+    Select the points of the discretized area covered by the radius of at least one of the stations.
+    Memoized, since the radius of each station is static and the set of reporting stations rarely changes.
+
+    Args:
+        area_discretization (AreaDiscretization): The discretized area.
+        indicator (str): The indicator.
+        station_ids (frozenset): IDs of the stations with a valid measure.
+
+    Returns:
+        AreaDiscretization: The filtered discretized area.
+    """
+    station_ids = sorted(station_ids)
+    station_coordinates = [STATIONS_ID[station_id] for station_id in station_ids]
+    radius = [RADIUS[indicator][station_id] for station_id in station_ids]
+
+    mask = area_discretization.coverage_mask(station_coordinates, radius)
+
+    return area_discretization.subset(mask)
 
-        Returns:
-            int: The index of the closest point.
-        """
-        
-        min_dist = float("inf")
-        min_dist_index = None
-
-        for i in range(len(area_discretization)):
-            point = area_discretization[i]
-            dist = math.sqrt((point[0] - station_coordinates[0]) ** 2 + (point[1] - station_coordinates[1]) ** 2)
-            if dist < min_dist:
-                min_dist_index = i
-                min_dist = dist
-        
-        return min_dist_index
 
+@functools.lru_cache(maxsize=1024)
+def _get_station_cells(area_discretization: AreaDiscretization) -> dict[int, int]:
+    """
+    Precompute the closest point of the discretized area to every station of the catalog.
+
+    Args:
+        area_discretization (AreaDiscretization): The discretized area.
+
+    Returns:
+        dict[int, int]: A mapping of station IDs to indices of the discretized area.
+    """
+    station_ids = list(STATIONS_ID.keys())
+    indices = area_discretization.closest_points([STATIONS_ID[station_id] for station_id in station_ids])
 
+    return dict(zip(station_ids, indices.tolist()))
 
 
+def _interpolate(interpolator_class, parameters, options, unit):
+    """
+    Fit an interpolator and predict the points of the discretized area. Run by the execution pool,
+    so it only receives picklable arguments.
+
+    Args:
+        interpolator_class: The interpolator class to use.
+        parameters: Parameters for the interpolation method.
+        options (dict): Extra arguments of the interpolator (e.g., the search strategy).
+        unit (tuple): (interpolator input, area discretization, hyperparameters previously selected).
+
+    Returns:
+        tuple: The predicted values and the hyperparameters selected for the input.
+    """
+    interpolator_input, area_discretization, selected_params = unit
+    interpolator = interpolator_class(interpolator_input, parameters, selected_params=selected_params, **options)
+    return interpolator.predict(X=area_discretization), interpolator.selected_params
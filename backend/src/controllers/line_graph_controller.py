@@ -1,5 +1,7 @@
 from repositories import MeasureIndicatorRepository
 from metadata.meta_data import INDICATORS, STATIONS_ID
+from services.response_cache import response_cache, make_key, ALL_TIME
+from utils.utils import get_time_reference_range
 
 
 # Maybe using ENUM would be the "best practice" way to implement it;
@@ -19,6 +21,7 @@ class LineGraphController:
         """
         self.measure_indicator_repository = MeasureIndicatorRepository(session)
         self.session = session
+        self.response_cache = response_cache
 
     def get_line_graph(
             self,
@@ -37,69 +40,59 @@ class LineGraphController:
 
         Returns:
             list[dict]: A list of dictionaries containing the requested data for each indicator.
+            The results of identical payloads are served from the response cache until new measures
+            of their indicators and period are inserted.
         """
-        if self.validate_payload_format(payload):
-            indicators = payload["indicators"]
-            indicator_ids = []
-            for indicator in indicators:
-                indicator_ids.append(INDICATORS[indicator])
+        if not self.validate_payload_format(payload):
+            return []
+
+        cache_key = make_key("linegraph", payload)
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        indicators = payload["indicators"]
+        indicator_ids = [INDICATORS[indicator] for indicator in indicators]
+        interval = payload["interval"]
+
+        # Every indicator is fetched by a single query, returning indicator_id --> rows
+        if interval == "monthly":
+            if "month" in payload.keys():
+                results = self.measure_indicator_repository.get_measure_indicator_by_month_through_years(
+                    month=payload["month"], indicator_ids=indicator_ids)
+            else:
+                results = self.measure_indicator_repository.get_measure_indicator_averaged_per_month_for_all_years(
+                    indicator_ids=indicator_ids)
 
-            interval = payload["interval"]
-            if not (interval in INTERVAL_POSSIBILITIES):
-                return []
-
-            if interval == "monthly":
-                if "month" in payload.keys():
-                    month = payload["month"]
-                    response = []
-                    for indicator_index, indicator_id in enumerate(indicator_ids):
-                        response.append({f"{indicators[indicator_index]}":
-                            self.measure_indicator_repository.get_measure_indicator_by_month_through_years(month=month,
-                                                                                             indicator_id=indicator_id)
-                                         })
-                else:
-                    response = []
-                    for indicator_index, indicator_id in enumerate(indicator_ids):
-                        response.append({f"{indicators[indicator_index]}":
-                                             self.measure_indicator_repository.get_measure_indicator_averaged_per_month_for_all_years(
-                                                 indicator_id=indicator_id)
-                                         })
+        elif interval == "daily":
+            results = self.measure_indicator_repository.get_measure_indicator_by_day(month=payload["month"],
+                                                                                     year=payload["year"],
+                                                                                     indicator_ids=indicator_ids)
 
-            elif interval == "daily":
-                month = payload["month"]
-                year = payload["year"]
+        elif interval == "hourly":
+            results = self.measure_indicator_repository.get_measure_indicator_by_hour(month=payload["month"],
+                                                                                      indicator_ids=indicator_ids)
 
-                response = []
-                for indicator_index, indicator_id in enumerate(indicator_ids):
-                    response.append({f"{indicators[indicator_index]}":
-                                         self.measure_indicator_repository.get_measure_indicator_by_day(month=month,
-                                                                                                        year=year,
-                                                                                                        indicator_id=indicator_id)
-                                     })
+        else: # yearly
+            results = self.measure_indicator_repository.get_measure_indicator_by_year(indicator_ids=indicator_ids)
 
-            elif interval == "hourly":
-                month = payload["month"]
-                response = []
-                for indicator_index, indicator_id in enumerate(indicator_ids):
-                    response.append({f"{indicators[indicator_index]}":
-                                         self.measure_indicator_repository.get_measure_indicator_by_hour(month=month,
-                                                                                                         indicator_id=indicator_id)
-                                     })
-
-            elif interval == "yearly":
-                response = []
-                for indicator_index, indicator_id in enumerate(indicator_ids):
-                    response.append({f"{indicators[indicator_index]}":
-                                         self.measure_indicator_repository.get_measure_indicator_by_year(indicator_id=indicator_id)
-                                     })
-
-            else:
-                response = []
-        else:
-            response = []
+        response = []
+        for indicator, indicator_id in zip(indicators, indicator_ids):
+            response.append({f"{indicator}": results[indicator_id]})
 
+        self.response_cache.set(cache_key, response, indicator_ids, *self.get_time_range(payload))
         return response
 
+    @staticmethod
+    def get_time_range(payload: dict) -> tuple:
+        """
+        Return the period of the measures of a valid payload: the month of a "daily" payload, and every
+        measure for the others, which aggregate all the years.
+        """
+        if payload["interval"] == "daily":
+            return get_time_reference_range(f"{payload['year']}-{payload['month']}")
+        return ALL_TIME
+
     def validate_payload_format(self, payload: dict) -> bool:
         """
         Validates the format of the input payload.
@@ -113,9 +106,9 @@ class LineGraphController:
         try:
             # Validate indicators
             indicators = payload["indicators"]
-            indicator_ids = []
             for indicator in indicators:
-                indicator_ids.append(INDICATORS[indicator])
+                if indicator not in INDICATORS:
+                    return False
 
             # Validate interval
             interval = payload["interval"]
@@ -1,6 +1,7 @@
 from sqlalchemy import (create_engine, Column, Integer, MetaData, Table, DateTime, Double,
-                        text, String, Boolean, ForeignKey, Index)
+                        text, String, Boolean, ForeignKey, Index, Date)
 from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
+from utils.config import PARTITION_MEASURE_INDICATOR, PARTITION_FIRST_YEAR, PARTITION_LAST_YEAR
 
 
 def create_tables():
@@ -14,23 +15,42 @@ def create_tables():
     - Creates each table along with its columns and any necessary foreign key constraints.
     - Adds specific indexes to the 'measure_indicator' table for optimization.
     - Calls `metadata.create_all(engine)` to create the tables in the database.
+    - Partitions the 'measure_indicator' table by year when `PARTITION_MEASURE_INDICATOR` is set.
 
     Returns:
         None
     """
     engine = create_database()
+    metadata = define_metadata()
+
+    metadata.create_all(engine)
+    if PARTITION_MEASURE_INDICATOR:
+        with engine.begin() as connection:
+            partition_measure_indicator_table(connection)
+    print("Tables and indexes created successfully.")
+
+
+def define_metadata():
+    """
+    Builds the SQLAlchemy metadata holding every table defined in `define_tables_and_columns()`
+    within the 'poluicao' schema, along with their indexes.
+
+    Returns:
+        sqlalchemy.MetaData: The metadata object holding the table definitions.
+    """
     tables_and_columns = define_tables_and_columns()
     metadata = MetaData(schema='poluicao')
 
     for table_name, columns in tables_and_columns.items():
         table_columns = []
         for column_name, column_type, is_primary_key, *fk in columns:
+            if table_name == 'measure_indicator' and PARTITION_MEASURE_INDICATOR:
+                fk = [] # Partitioned tables do not support foreign keys
             column = create_column(column_name, column_type, is_primary_key, *fk)
             table_columns.append(column)
         create_table(table_name, metadata, *table_columns)
 
-    metadata.create_all(engine)
-    print("Tables and indexes created successfully.")
+    return metadata
 
 
 def create_database():
@@ -74,6 +94,33 @@ def define_tables_and_columns():
             ("idIndicator", Integer, True, "indicators.id"),
             ("datetime", DateTime, True),
             ("value", Double, False)
+        ],
+        "measure_indicator_daily": [
+            ("idStation", Integer, True, "stations.id"),
+            ("idIndicator", Integer, True, "indicators.id"),
+            ("date", Date, True),
+            ("sum_value", Double, False),
+            ("count_value", Integer, False),
+            ("min_value", Double, False),
+            ("max_value", Double, False),
+        ],
+        "measure_indicator_monthly": [
+            ("idStation", Integer, True, "stations.id"),
+            ("idIndicator", Integer, True, "indicators.id"),
+            ("year", Integer, True),
+            ("month", Integer, True),
+            ("sum_value", Double, False),
+            ("count_value", Integer, False),
+            ("min_value", Double, False),
+            ("max_value", Double, False),
+        ],
+        "measure_indicator_climatology": [
+            ("idStation", Integer, True, "stations.id"),
+            ("idIndicator", Integer, True, "indicators.id"),
+            ("month", Integer, True),
+            ("hour", Integer, True),
+            ("sum_value", Double, False),
+            ("count_value", Integer, False),
         ]
     }
     return tables_and_columns
@@ -116,12 +163,47 @@ def create_table(table_name, metadata, *table_columns):
     Notes:
         - For the `measure_indicator` table, additional indexes are created on the `datetime`, 
           `idStation`, and `idIndicator` columns to optimize queries involving these fields.
+        - The `measure_indicator` table gets a covering index on (`idIndicator`, `datetime`, `idStation`,
+          `value`), matching the queries that filter by indicator first and time second.
+        - The rollup tables `measure_indicator_daily` and `measure_indicator_monthly` are indexed by
+          indicator and period.
+        - The climatology table `measure_indicator_climatology` is indexed by indicator, month and hour.
     """
     table = Table(table_name, metadata, *table_columns)
     if table_name == 'measure_indicator':
         Index('idx_datetime', table.c.datetime) # B+ Tree index
         Index('idx_idStation_hash', table.c.idStation, mysql_using='hash') # Hash index
         Index('idx_idIndicator_hash', table.c.idIndicator, mysql_using='hash') # Hash index
+        Index('idx_idIndicator_datetime_covering', table.c.idIndicator, table.c.datetime,
+              table.c.idStation, table.c.value)
+    if table_name == 'measure_indicator_daily':
+        Index('idx_daily_idIndicator_date', table.c.idIndicator, table.c.date)
+    if table_name == 'measure_indicator_monthly':
+        Index('idx_monthly_idIndicator_year_month', table.c.idIndicator, table.c.year, table.c.month)
+    if table_name == 'measure_indicator_climatology':
+        Index('idx_climatology_idIndicator_month_hour', table.c.idIndicator, table.c.month, table.c.hour)
+
+
+def partition_measure_indicator_table(connection):
+    """
+    Partitions the 'measure_indicator' table by RANGE of YEAR(datetime), with one partition per year
+    from `PARTITION_FIRST_YEAR` to `PARTITION_LAST_YEAR` and a last partition for any later year.
+    Queries restricted to a datetime range are pruned to the partitions of the years they touch.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+
+    Returns:
+        None
+    """
+    partitions = [f"PARTITION p{year} VALUES LESS THAN ({year + 1})"
+                  for year in range(PARTITION_FIRST_YEAR, PARTITION_LAST_YEAR + 1)]
+    partitions.append("PARTITION pmax VALUES LESS THAN MAXVALUE")
+
+    connection.execute(text(f"""
+        ALTER TABLE poluicao.measure_indicator
+        PARTITION BY RANGE (YEAR(datetime)) ({", ".join(partitions)})
+    """))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,149 @@
+from sqlalchemy import create_engine, text
+from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
+from utils.config import PARTITION_MEASURE_INDICATOR
+from metadata.meta_data import INDICATORS
+from database.create_tables import define_metadata, partition_measure_indicator_table
+from database.rollup_tables import ROLLUP_TABLES, CLIMATOLOGY_TABLE, populate_rollup_tables
+
+
+# Index name --> indexed columns of the 'measure_indicator' table added after the first release
+MEASURE_INDICATOR_INDEXES = {
+    "idx_idIndicator_datetime_covering": "(idIndicator, datetime, idStation, value)",
+}
+
+# Stored generated columns of the 'measure_indicator' table, and their indexes, that are no longer read:
+# the month-of-year and hour-of-day profiles are served by the climatology table
+UNUSED_MEASURE_INDICATOR_INDEXES = ["idx_idIndicator_month_hour", "idx_idIndicator_hour"]
+UNUSED_MEASURE_INDICATOR_COLUMNS = ["month_of_year", "hour_of_day"]
+
+
+def migrate_tables():
+    """
+    Brings an existing 'poluicao' schema up to date with the schema defined in `create_tables`.
+
+    Every step checks `information_schema` before altering anything, so running it on an up to date
+    database (e.g., one just built by `create_tables`) does nothing. Dropping the unused generated
+    columns or partitioning rebuilds the `measure_indicator` table, so the first run on a large database
+    can take a while.
+
+    Returns:
+        None
+    """
+    db_connection = create_engine(f"mysql+pymysql://{LOGIN_MYSQL}:{PASSWORD_MYSQL}@db/poluicao")
+    with db_connection.begin() as connection:
+        drop_indexes(connection, "measure_indicator", UNUSED_MEASURE_INDICATOR_INDEXES)
+        drop_columns(connection, "measure_indicator", UNUSED_MEASURE_INDICATOR_COLUMNS)
+        add_indexes(connection, "measure_indicator", MEASURE_INDICATOR_INDEXES)
+        if PARTITION_MEASURE_INDICATOR and not is_partitioned(connection, "measure_indicator"):
+            drop_foreign_keys(connection, "measure_indicator")
+            partition_measure_indicator_table(connection)
+            print("measure_indicator - partitioned by year")
+
+    define_metadata().create_all(db_connection) # Only creates the tables that are missing
+    with db_connection.connect() as connection:
+        empty_rollup_tables = [table_name for table_name in [*ROLLUP_TABLES, CLIMATOLOGY_TABLE]
+                               if connection.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar() == 0]
+    if empty_rollup_tables:
+        populate_rollup_tables(db_connection, INDICATORS.values())
+    print("Tables migrated successfully.")
+
+
+def drop_columns(connection, table_name, column_names):
+    """
+    Drops the columns of a table that exist.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        table_name (str): The name of the table.
+        column_names (list): The names of the columns to drop.
+
+    Returns:
+        None
+    """
+    for column_name in column_names:
+        if column_exists(connection, table_name, column_name):
+            connection.execute(text(f"ALTER TABLE {table_name} DROP COLUMN {column_name}"))
+            print(f"{table_name} - {column_name} dropped")
+
+
+def add_indexes(connection, table_name, indexes):
+    """
+    Adds the indexes of a table that are missing.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        table_name (str): The name of the table.
+        indexes (dict): A dictionary mapping index names to their column lists (e.g., "(idIndicator, datetime)").
+
+    Returns:
+        None
+    """
+    for index_name, columns in indexes.items():
+        if not index_exists(connection, table_name, index_name):
+            connection.execute(text(f"ALTER TABLE {table_name} ADD INDEX {index_name} {columns}"))
+            print(f"{table_name} - {index_name} added")
+
+
+def drop_indexes(connection, table_name, index_names):
+    """
+    Drops the indexes of a table that exist.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        table_name (str): The name of the table.
+        index_names (list): The names of the indexes to drop.
+
+    Returns:
+        None
+    """
+    for index_name in index_names:
+        if index_exists(connection, table_name, index_name):
+            connection.execute(text(f"ALTER TABLE {table_name} DROP INDEX {index_name}"))
+            print(f"{table_name} - {index_name} dropped")
+
+
+def drop_foreign_keys(connection, table_name):
+    """
+    Drops the foreign keys of a table, which partitioned tables do not support.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        table_name (str): The name of the table.
+
+    Returns:
+        None
+    """
+    query = text("""
+        SELECT CONSTRAINT_NAME FROM information_schema.TABLE_CONSTRAINTS
+        WHERE TABLE_SCHEMA = 'poluicao' AND TABLE_NAME = :table_name AND CONSTRAINT_TYPE = 'FOREIGN KEY'
+    """)
+    for constraint_name in connection.execute(query, {'table_name': table_name}).scalars().all():
+        connection.execute(text(f"ALTER TABLE {table_name} DROP FOREIGN KEY {constraint_name}"))
+
+
+def is_partitioned(connection, table_name):
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = 'poluicao' AND TABLE_NAME = :table_name AND PARTITION_NAME IS NOT NULL
+    """)
+    return connection.execute(query, {'table_name': table_name}).scalar() > 0
+
+
+def column_exists(connection, table_name, column_name):
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = 'poluicao' AND TABLE_NAME = :table_name AND COLUMN_NAME = :column_name
+    """)
+    return connection.execute(query, {'table_name': table_name, 'column_name': column_name}).scalar() > 0
+
+
+def index_exists(connection, table_name, index_name):
+    query = text("""
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = 'poluicao' AND TABLE_NAME = :table_name AND INDEX_NAME = :index_name
+    """)
+    return connection.execute(query, {'table_name': table_name, 'index_name': index_name}).scalar() > 0
+
+
+if __name__ == "__main__":
+    migrate_tables()
@@ -3,6 +3,7 @@ import pandas as pd
 from sqlalchemy import create_engine
 from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
 from metadata.meta_data import STATIONS, INDICATORS, INDICATORS_DATA
+from database.rollup_tables import populate_rollup_tables
 
 
 def populate_tables():
@@ -16,6 +17,7 @@ def populate_tables():
             station_name = file_name.replace(".csv", "")
             insert_data_from_station(file_path, station_name, db_connection)
     print("All files processed successfully.")
+    populate_rollup_tables(db_connection, INDICATORS.values())
 
 
 def insert_stations_data(db_connection):
@@ -0,0 +1,164 @@
+import pandas as pd
+from datetime import datetime, timedelta
+from sqlalchemy import text
+
+
+def get_day_range(moment):
+    """
+    Returns the first instant of the day containing `moment` and the first instant of the next day.
+    """
+    day_start = datetime(moment.year, moment.month, moment.day)
+    return day_start, day_start + timedelta(days=1)
+
+
+def get_month_range(moment):
+    """
+    Returns the first instant of the month containing `moment` and the first instant of the next month.
+    """
+    month_start = datetime(moment.year, moment.month, 1)
+    return month_start, datetime(moment.year + moment.month // 12, moment.month % 12 + 1, 1)
+
+
+# Rollup table --> (bucket columns, bucket expressions over 'measure_indicator', bucket range function)
+ROLLUP_TABLES = {
+    "measure_indicator_daily": (["date"], ["DATE(datetime)"], get_day_range),
+    "measure_indicator_monthly": (["year", "month"], ["YEAR(datetime)", "MONTH(datetime)"], get_month_range),
+}
+
+CLIMATOLOGY_TABLE = "measure_indicator_climatology"
+
+
+def refresh_rollup_tables(connection, station_id=None, indicator_id=None, first_datetime=None, last_datetime=None):
+    """
+    Recomputes the rollup tables ('measure_indicator_daily' and 'measure_indicator_monthly') from the
+    'measure_indicator' table.
+
+    Only the buckets of the given station and indicator lying between the bucket of `first_datetime`
+    and the bucket of `last_datetime` are recomputed, each one from all of its rows; omitted filters
+    select every station, indicator or datetime. Recomputing a bucket overwrites its previous sum,
+    count, min and max, so refreshing the same buckets twice is harmless.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        station_id (int, optional): The ID of the station whose buckets should be recomputed.
+        indicator_id (int, optional): The ID of the indicator whose buckets should be recomputed.
+        first_datetime (datetime, optional): The earliest datetime of the rows that changed.
+        last_datetime (datetime, optional): The latest datetime of the rows that changed.
+
+    Returns:
+        None
+    """
+    for table_name, (bucket_columns, bucket_expressions, get_bucket_range) in ROLLUP_TABLES.items():
+        filters = ["value IS NOT NULL"]
+        parameters = {}
+        if station_id is not None:
+            filters.append("idStation = :station_id")
+            parameters["station_id"] = station_id
+        if indicator_id is not None:
+            filters.append("idIndicator = :indicator_id")
+            parameters["indicator_id"] = indicator_id
+        if first_datetime is not None:
+            filters.append("datetime >= :start")
+            parameters["start"] = get_bucket_range(first_datetime)[0]
+        if last_datetime is not None:
+            filters.append("datetime < :end")
+            parameters["end"] = get_bucket_range(last_datetime)[1]
+
+        buckets = ", ".join(f"{expression} AS {column}" for column, expression in zip(bucket_columns, bucket_expressions))
+        connection.execute(text(f"""
+            INSERT INTO {table_name} (idStation, idIndicator, {", ".join(bucket_columns)},
+                                      sum_value, count_value, min_value, max_value)
+            SELECT * FROM (
+                SELECT idStation, idIndicator, {buckets},
+                       SUM(value) AS sum_value, COUNT(value) AS count_value,
+                       MIN(value) AS min_value, MAX(value) AS max_value
+                FROM measure_indicator
+                WHERE {" AND ".join(filters)}
+                GROUP BY idStation, idIndicator, {", ".join(bucket_expressions)}
+            ) AS new
+            ON DUPLICATE KEY UPDATE sum_value = new.sum_value, count_value = new.count_value,
+                                    min_value = new.min_value, max_value = new.max_value
+        """), parameters)
+
+
+def refresh_climatology_table(connection, indicator_id=None):
+    """
+    Recomputes the climatology table ('measure_indicator_climatology'), which holds the sum and count of
+    the values of each station and indicator per month of the year and hour of the day, over all years.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        indicator_id (int, optional): The ID of the indicator to recompute; every indicator when omitted.
+
+    Returns:
+        None
+    """
+    filters = ["value IS NOT NULL"]
+    parameters = {}
+    if indicator_id is not None:
+        filters.append("idIndicator = :indicator_id")
+        parameters["indicator_id"] = indicator_id
+
+    connection.execute(text(f"""
+        INSERT INTO {CLIMATOLOGY_TABLE} (idStation, idIndicator, month, hour, sum_value, count_value)
+        SELECT * FROM (
+            SELECT idStation, idIndicator, MONTH(datetime) AS month, HOUR(datetime) AS hour,
+                   SUM(value) AS sum_value, COUNT(value) AS count_value
+            FROM measure_indicator
+            WHERE {" AND ".join(filters)}
+            GROUP BY idStation, idIndicator, MONTH(datetime), HOUR(datetime)
+        ) AS new
+        ON DUPLICATE KEY UPDATE sum_value = new.sum_value, count_value = new.count_value
+    """), parameters)
+
+
+def increment_climatology_table(connection, station_id, indicator_id, datetimes, values):
+    """
+    Adds newly inserted measures to the climatology table, without reading 'measure_indicator' back.
+    Each measure must be added exactly once, so this must only be called with rows that were just inserted.
+
+    Parameters:
+        connection (SQLAlchemy Connection): The active connection to the database.
+        station_id (int): The ID of the station of the measures.
+        indicator_id (int): The ID of the indicator of the measures.
+        datetimes (pandas.Series): The datetime of each measure.
+        values (pandas.Series): The value of each measure.
+
+    Returns:
+        None
+    """
+    datetimes = pd.to_datetime(pd.Series(datetimes).reset_index(drop=True))
+    values = pd.Series(values).reset_index(drop=True).astype(float)
+    df = pd.DataFrame({"month": datetimes.dt.month, "hour": datetimes.dt.hour, "value": values}).dropna()
+    if df.empty:
+        return
+    grouped = df.groupby(["month", "hour"])["value"].agg(sum_value="sum", count_value="count").reset_index()
+
+    rows = [{"station_id": station_id, "indicator_id": indicator_id, "month": int(row.month),
+             "hour": int(row.hour), "sum_value": float(row.sum_value), "count_value": int(row.count_value)}
+            for row in grouped.itertuples(index=False)]
+    connection.execute(text(f"""
+        INSERT INTO {CLIMATOLOGY_TABLE} (idStation, idIndicator, month, hour, sum_value, count_value)
+        VALUES (:station_id, :indicator_id, :month, :hour, :sum_value, :count_value) AS new
+        ON DUPLICATE KEY UPDATE sum_value = {CLIMATOLOGY_TABLE}.sum_value + new.sum_value,
+                                count_value = {CLIMATOLOGY_TABLE}.count_value + new.count_value
+    """), rows)
+
+
+def populate_rollup_tables(db_connection, indicator_ids):
+    """
+    Fills the rollup tables and the climatology table from the whole 'measure_indicator' table,
+    one indicator at a time.
+
+    Parameters:
+        db_connection (SQLAlchemy Engine): The engine connected to the database.
+        indicator_ids (list[int]): The IDs of the indicators to roll up.
+
+    Returns:
+        None
+    """
+    for indicator_id in indicator_ids:
+        with db_connection.begin() as connection:
+            refresh_rollup_tables(connection, indicator_id=indicator_id)
+            refresh_climatology_table(connection, indicator_id=indicator_id)
+    print("Rollup tables populated successfully.")
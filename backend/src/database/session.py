@@ -0,0 +1,66 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import QueuePool
+from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
+from utils.config import DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+
+
+DATABASE_URI = f'mysql+pymysql://{LOGIN_MYSQL}:{PASSWORD_MYSQL}@db/poluicao'
+
+
+def create_pooled_engine(database_uri, **engine_options):
+    """
+    Creates an engine backed by a QueuePool configured from `utils.config`.
+
+    Parameters:
+        database_uri (str): The URI of the database.
+        **engine_options: Extra arguments for `create_engine` (e.g., `connect_args`).
+
+    Returns:
+        sqlalchemy.engine.Engine: The engine holding the connection pool.
+    """
+    return create_engine(
+        database_uri,
+        poolclass=QueuePool,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE, # MySQL closes connections idle for longer than wait_timeout
+        pool_pre_ping=DB_POOL_PRE_PING, # Replaces connections dropped by the server before using them
+        **engine_options
+    )
+
+
+def create_scoped_session(engine):
+    """
+    Creates a session registry giving each thread (i.e., each request of a threaded server) its own
+    session, and therefore its own pooled connection.
+
+    Parameters:
+        engine (sqlalchemy.engine.Engine): The engine the sessions are bound to.
+
+    Returns:
+        sqlalchemy.orm.scoped_session: The session registry. `Session()` returns the session of the
+        current thread and `Session.remove()` closes it, giving its connection back to the pool.
+    """
+    return scoped_session(sessionmaker(bind=engine))
+
+
+def register_session_teardown(app, session_registry):
+    """
+    Closes the session of each request once the request is over.
+
+    Parameters:
+        app (flask.Flask): The application.
+        session_registry (sqlalchemy.orm.scoped_session): The session registry used by the requests.
+
+    Returns:
+        None
+    """
+    @app.teardown_appcontext
+    def remove_session(exception=None):
+        session_registry.remove()
+
+
+engine = create_pooled_engine(DATABASE_URI)
+Session = create_scoped_session(engine)
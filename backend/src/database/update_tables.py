@@ -6,6 +6,10 @@ from datetime import datetime, timedelta
 
 from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
 from metadata.meta_data import STATIONS, INDICATORS
+from database.rollup_tables import refresh_rollup_tables, increment_climatology_table
+from services.hyperparameter_cache import hyperparameter_cache
+from services.tile_service import tile_service
+from services.response_cache import response_cache
 from utils.utils import (ddmmyyyyhhmm_yyyymmddhhmm, string_to_float,
                          get_request_response, get_session_id)
 
@@ -54,9 +58,15 @@ class UpdateData:
         with tempfile.NamedTemporaryFile(mode='w+', delete=True) as file:
             file.write(data)
             file.flush()
-            df_to_update_csv = self.update_measure_indicator_table(file.name, station, indicator,
-                                                                db_connection)
+            # The new measures and the rollups they fall into are committed together: if the refresh
+            # fails, the measures are rolled back too (and fetched again by the next update, as the
+            # CSV file is not updated either)
+            with db_connection.begin() as connection:
+                df_to_update_csv = self.update_measure_indicator_table(file.name, station, indicator,
+                                                                    connection)
+                self.update_rollup_tables(df_to_update_csv, station, indicator, connection)
             self.update_station_indicators_table(station, indicator, db_connection)
+            self.invalidate_caches(df_to_update_csv, indicator)
         return df_to_update_csv
 
     @staticmethod
@@ -126,6 +136,7 @@ class UpdateData:
             station (str): The name of the station associated with the data.
             indicator (str): The indicator name for which data is being updated.
             db_connection (sqlalchemy.engine.base.Connection): The database connection to interact with the MySQL database.
+                                                               The rows are committed with its transaction.
 
         Returns:
             pandas.DataFrame: A DataFrame containing the adjusted data for the specified indicator, used for updating the CSV file
@@ -171,6 +182,56 @@ class UpdateData:
             except Exception as e:
                 print(f"Error: {e}")
 
+    @staticmethod
+    def update_rollup_tables(df, station, indicator, connection):
+        """
+        Recomputes the buckets of the rollup tables that the newly inserted rows fall into and adds
+        the newly inserted rows to the climatology table, in the transaction that inserted them.
+
+        Parameters:
+            df (pandas.DataFrame): A DataFrame with the 'datetime' and the value (in a column named after
+                                   the indicator, in lowercase) of the newly inserted rows.
+            station (str): The name of the station associated with the data.
+            indicator (str): The name of the indicator associated with the data.
+            connection (SQLAlchemy Connection): The connection whose transaction inserted the rows.
+
+        Returns:
+            None
+        """
+        if df.empty:
+            return
+        refresh_rollup_tables(connection,
+                              station_id=STATIONS[station][0],
+                              indicator_id=INDICATORS[indicator],
+                              first_datetime=df['datetime'].min(),
+                              last_datetime=df['datetime'].max())
+        increment_climatology_table(connection,
+                                    station_id=STATIONS[station][0],
+                                    indicator_id=INDICATORS[indicator],
+                                    datetimes=df['datetime'],
+                                    values=df[indicator.lower()])
+
+    @staticmethod
+    def invalidate_caches(df, indicator):
+        """
+        Drops the hyperparameters, the tiles and the responses cached for the heatmaps and line graphs
+        of the indicator that the newly inserted rows fall into, so they are computed again with the
+        new measures.
+
+        Parameters:
+            df (pandas.DataFrame): A DataFrame with the 'datetime' of the newly inserted rows.
+            indicator (str): The name of the indicator associated with the data.
+
+        Returns:
+            None
+        """
+        if df.empty:
+            return
+        for cache in (hyperparameter_cache, tile_service, response_cache):
+            cache.invalidate(INDICATORS[indicator],
+                             first_datetime=df['datetime'].min(),
+                             last_datetime=df['datetime'].max())
+
     @staticmethod
     def update_csv_file(original_df, dfs_to_update_csv, directory, file_name):
         """
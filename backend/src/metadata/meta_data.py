@@ -403,4 +403,21 @@ RADIUS = {
     "TEMP": RADIUS_MAX,
     "UR": RADIUS_MAX,
     "VV": RADIUS_MAX
-}
\ No newline at end of file
+}
+
+# Colors of the heatmap tiles, as in the frontend legend
+GREEN, YELLOW, PINK, RED, PURPLE = (0, 128, 0), (255, 255, 0), (255, 192, 203), (255, 0, 0), (128, 0, 128)
+BLUE, CYAN, ORANGE, DARKRED = (0, 0, 255), (0, 255, 255), (255, 165, 0), (139, 0, 0)
+
+# indicator --> (quality intervals, quality colors). A value gets the color of the first interval
+# upper bound it does not exceed, or the last color.
+QUALITY_COLORS = {
+    "MP2.5": ([25, 50, 75, 125], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "MP10": ([50, 100, 150, 250], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "O3": ([100, 130, 160, 200], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "CO": ([9, 11, 13, 15], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "NO2": ([200, 240, 320, 1130], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "SO2": ([20, 40, 365, 800], [GREEN, YELLOW, PINK, RED, PURPLE]),
+    "TEMP": ([15, 20, 25, 30, 35, 40], [BLUE, CYAN, GREEN, YELLOW, ORANGE, RED, DARKRED]),
+    "UR": ([20, 40, 60, 80, 100], [DARKRED, RED, YELLOW, GREEN, CYAN, BLUE]),
+}
@@ -2,3 +2,6 @@ from models.stations import Stations
 from models.indicators import Indicators
 from models.station_indicators import StationIndicators
 from models.measure_indicator import MeasureIndicator
+from models.measure_indicator_daily import MeasureIndicatorDaily
+from models.measure_indicator_monthly import MeasureIndicatorMonthly
+from models.measure_indicator_climatology import MeasureIndicatorClimatology
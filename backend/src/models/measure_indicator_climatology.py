@@ -0,0 +1,16 @@
+from sqlalchemy import Column, ForeignKey, Float, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+
+Base = declarative_base()
+
+
+class MeasureIndicatorClimatology(Base):
+    __tablename__ = "measure_indicator_climatology"
+
+    idStation = Column(Integer, ForeignKey('stations.id'), primary_key=True)
+    idIndicator = Column(Integer, ForeignKey('indicators.id'), primary_key=True)
+    month = Column(Integer, primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    sum_value = Column(Float)
+    count_value = Column(Integer)
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, ForeignKey, Float, Date, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+
+Base = declarative_base()
+
+
+class MeasureIndicatorDaily(Base):
+    __tablename__ = "measure_indicator_daily"
+
+    idStation = Column(Integer, ForeignKey('stations.id'), primary_key=True)
+    idIndicator = Column(Integer, ForeignKey('indicators.id'), primary_key=True)
+    date = Column(Date, primary_key=True)
+    sum_value = Column(Float)
+    count_value = Column(Integer)
+    min_value = Column(Float)
+    max_value = Column(Float)
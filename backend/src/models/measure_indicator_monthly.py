@@ -0,0 +1,18 @@
+from sqlalchemy import Column, ForeignKey, Float, Integer
+from sqlalchemy.ext.declarative import declarative_base
+
+
+Base = declarative_base()
+
+
+class MeasureIndicatorMonthly(Base):
+    __tablename__ = "measure_indicator_monthly"
+
+    idStation = Column(Integer, ForeignKey('stations.id'), primary_key=True)
+    idIndicator = Column(Integer, ForeignKey('indicators.id'), primary_key=True)
+    year = Column(Integer, primary_key=True)
+    month = Column(Integer, primary_key=True)
+    sum_value = Column(Float)
+    count_value = Column(Integer)
+    min_value = Column(Float)
+    max_value = Column(Float)
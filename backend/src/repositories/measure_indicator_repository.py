@@ -1,11 +1,16 @@
-from models import MeasureIndicator
-from sqlalchemy import extract, func
+from models import MeasureIndicator, MeasureIndicatorDaily, MeasureIndicatorMonthly, MeasureIndicatorClimatology
+from sqlalchemy import extract, func, tuple_
+from datetime import datetime
+from utils.utils import get_time_reference_range
 
 
 class MeasureIndicatorRepository:
     """
     Repository for interacting with the MeasureIndicator table in the database.
     Provides methods to retrieve aggregated indicator data based on specified filters.
+    Means over days, months or years are read from the coarsest rollup table
+    (MeasureIndicatorDaily or MeasureIndicatorMonthly) that answers the query, and hour-of-day and
+    month-of-year profiles are read from the climatology table (MeasureIndicatorClimatology).
     """
 
     def __init__(self, session) -> None:
@@ -54,131 +59,306 @@ class MeasureIndicatorRepository:
 
         return result
 
+    def get_mean_measure_indicators_per_period(
+        self,
+        indicator_id: int,
+        period: str,
+        time_reference_str: str = None,
+        first_year: int = None,
+        last_year: int = None
+    ) -> list[tuple]:
+        """
+        Retrieve, in a single query, the mean values of measure indicators grouped by period and station
+        for a specific indicator and time range.
+
+        Args:
+            indicator_id (int): The ID of the indicator to filter by.
+            period (str): The period to group by ("year", "month", "day" or "hour").
+            time_reference_str (str, optional): A string representing the time range (e.g., "2024", "2024-11", "2024-11-19").
+            first_year (int, optional): The first year of the time range.
+            last_year (int, optional): The last year of the time range.
+
+        Returns:
+            list[tuple]: A list of tuples, where each tuple contains:
+                - period (int): The period (e.g., the hour of the day) of the mean.
+                - idStation (int): The ID of the station.
+                - value (float): The average value of the indicator at the station during the period.
+        """
+
+        if time_reference_str:
+            start, end = get_time_reference_range(time_reference_str)
+        else:
+            start, end = datetime(int(first_year), 1, 1), datetime(int(last_year) + 1, 1, 1)
+
+        if period == "hour":
+            period_column = extract(period, MeasureIndicator.datetime)
+            query = (
+                self.session.query(
+                    period_column.label('period'),
+                    MeasureIndicator.idStation,
+                    func.avg(MeasureIndicator.value).label('value')
+                )
+                .filter(MeasureIndicator.idIndicator == indicator_id)
+            )
+            query = self.__process_datetime_range_filters(query, start, end)
+            station_column = MeasureIndicator.idStation
+
+        elif period == "day":
+            period_column = extract(period, MeasureIndicatorDaily.date)
+            query = (
+                self.session.query(
+                    period_column.label('period'),
+                    MeasureIndicatorDaily.idStation,
+                    self.__rollup_mean(MeasureIndicatorDaily).label('value')
+                )
+                .filter(MeasureIndicatorDaily.idIndicator == indicator_id)
+                .filter(MeasureIndicatorDaily.date >= start.date())
+                .filter(MeasureIndicatorDaily.date < end.date())
+            )
+            station_column = MeasureIndicatorDaily.idStation
+
+        else:
+            period_column = getattr(MeasureIndicatorMonthly, period)
+            query = (
+                self.session.query(
+                    period_column.label('period'),
+                    MeasureIndicatorMonthly.idStation,
+                    self.__rollup_mean(MeasureIndicatorMonthly).label('value')
+                )
+                .filter(MeasureIndicatorMonthly.idIndicator == indicator_id)
+                .filter(tuple_(MeasureIndicatorMonthly.year, MeasureIndicatorMonthly.month) >= (start.year, start.month))
+                .filter(tuple_(MeasureIndicatorMonthly.year, MeasureIndicatorMonthly.month) < (end.year, end.month))
+            )
+            station_column = MeasureIndicatorMonthly.idStation
+
+        result = (
+            query.group_by(
+                period_column,
+                station_column
+            )
+            .all()
+        )
+
+        return result
+
+    @staticmethod
+    def __rollup_mean(rollup):
+        """
+        Build the mean of the rows aggregated by a rollup table (MeasureIndicatorDaily, MeasureIndicatorMonthly
+        or MeasureIndicatorClimatology).
+
+        Args:
+            rollup: The rollup model.
+
+        Returns:
+            The SQLAlchemy expression dividing the summed values by the number of summed rows.
+        """
+        return func.sum(rollup.sum_value) / func.sum(rollup.count_value)
+
     @staticmethod
     def __process_date_filters(query, time_reference: str):
         """
         Apply date and time filters to a query based on the provided time reference string.
+        The filter is a half-open datetime range, so it can use the index on the datetime column.
 
         Args:
             query: The SQLAlchemy query object to filter.
             time_reference (str): A string representing the time reference (e.g., "2024", "2024-11", "2024-11-19 14").
 
         Returns:
-            The query object with applied filters for year, month, day, and/or hour.
+            The query object with applied filters for the year, month, day or hour represented by the time reference.
         """
-        
-        year, month, day, hour = None, None, None, None
-        datetime_list = time_reference.split(" ")
 
-        date_list = datetime_list[0].split("-")
-        year = date_list[0]
-        if len(date_list) > 1:
-            month = date_list[1]
-            if len(date_list) > 2:
-                day = date_list[2]
+        start, end = get_time_reference_range(time_reference)
+
+        return MeasureIndicatorRepository.__process_datetime_range_filters(query, start, end)
 
-        if len(datetime_list) > 1:
-            time_list = datetime_list[1].split(":")
-            hour = time_list[0]
+    @staticmethod
+    def __process_datetime_range_filters(query, start: datetime, end: datetime):
+        """
+        Restrict a query to the measures taken in the half-open range [start, end).
 
-        if year:
-            query = query.filter(extract("year", MeasureIndicator.datetime) == year)
-        if month:
-            query = query.filter(extract("month", MeasureIndicator.datetime) == month)
-        if day:
-            query = query.filter(extract("day", MeasureIndicator.datetime) == day)
-        if hour:
-            query = query.filter(extract("hour", MeasureIndicator.datetime) == hour)
+        Args:
+            query: The SQLAlchemy query object to filter.
+            start (datetime): The first instant of the range.
+            end (datetime): The first instant after the range.
 
-        return query
+        Returns:
+            The query object with the range filter applied.
+        """
+        return (
+            query.filter(MeasureIndicator.datetime >= start)
+            .filter(MeasureIndicator.datetime < end)
+        )
 
-    def get_measure_indicator_by_year(self, indicator_id: int) -> list[dict]:
+    @staticmethod
+    def __group_by_indicator(indicator_ids: list[int], results, to_dict) -> dict[int, list[dict]]:
         """
-            Returns the average 'value' of MeasureIndicators grouped by year for a specific indicator_id.
+        Split rows holding an 'indicator' column into one list per requested indicator.
+
+        Args:
+            indicator_ids (list[int]): The IDs of the requested indicators.
+            results: The rows returned by the query, ordered by bucket.
+            to_dict: Function converting a row into the dictionary returned for it.
+
+        Returns:
+            dict[int, list[dict]]: A dictionary mapping each indicator ID to the converted rows of that
+            indicator, in the order they were returned (an empty list when it has no rows).
+        """
+        grouped = {indicator_id: [] for indicator_id in indicator_ids}
+        for row in results:
+            grouped[int(row.indicator)].append(to_dict(row))
+        return grouped
+
+    def get_measure_indicator_by_year(self, indicator_ids: list[int]) -> dict[int, list[dict]]:
+        """
+            Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by year.
         """
         results = (
             self.session.query(
-                func.extract('year', MeasureIndicator.datetime).label('year'),
-                func.avg(MeasureIndicator.value).label('average_value')
+                MeasureIndicatorMonthly.idIndicator.label('indicator'),
+                MeasureIndicatorMonthly.year.label('year'),
+                self.__rollup_mean(MeasureIndicatorMonthly).label('average_value')
             )
-            .filter(MeasureIndicator.idIndicator == indicator_id)
-            .group_by(func.extract('year', MeasureIndicator.datetime))
+            .filter(MeasureIndicatorMonthly.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorMonthly.idIndicator, MeasureIndicatorMonthly.year)
+            .order_by(MeasureIndicatorMonthly.idIndicator, MeasureIndicatorMonthly.year)
             .all()
         )
 
-        return [{"year": int(row.year), "average_value": row.average_value} for row in results]
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"year": int(row.year), "average_value": row.average_value})
 
-    def get_measure_indicator_by_month_through_years(self, month: int, indicator_id: int) -> list[dict]:
+    def get_measure_indicator_by_month_through_years(self, month: int, indicator_ids: list[int]) -> dict[int, list[dict]]:
         """
-            Returns the average 'value' of MeasureIndicators grouped by year, filtered by month,
-            for a specific indicator_id.
+            Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by year,
+            filtered by month.
         """
         results = (
             self.session.query(
-                func.extract('year', MeasureIndicator.datetime).label('year'),
-                func.avg(MeasureIndicator.value).label('average_value')
+                MeasureIndicatorMonthly.idIndicator.label('indicator'),
+                MeasureIndicatorMonthly.year.label('year'),
+                self.__rollup_mean(MeasureIndicatorMonthly).label('average_value')
             )
-            .filter(func.extract('month', MeasureIndicator.datetime) == month)
-            .filter(MeasureIndicator.idIndicator == indicator_id)
-            .group_by(func.extract('year', MeasureIndicator.datetime))
+            .filter(MeasureIndicatorMonthly.month == month)
+            .filter(MeasureIndicatorMonthly.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorMonthly.idIndicator, MeasureIndicatorMonthly.year)
+            .order_by(MeasureIndicatorMonthly.idIndicator, MeasureIndicatorMonthly.year)
             .all()
         )
 
-        return [{"year": int(row.year), "average_value": row.average_value} for row in results]
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"year": int(row.year), "average_value": row.average_value})
 
-    def get_measure_indicator_averaged_per_month_for_all_years(self, indicator_id) -> list[dict]:
+    def get_measure_indicator_averaged_per_month_for_all_years(self, indicator_ids: list[int]) -> dict[int, list[dict]]:
         """
-            Returns the average 'value' of MeasureIndicators grouped by month for a specific indicator_id.
+            Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by month.
         """
         results = (
             self.session.query(
-                func.extract('month', MeasureIndicator.datetime).label('month'),
-                func.avg(MeasureIndicator.value).label('average_value')
+                MeasureIndicatorClimatology.idIndicator.label('indicator'),
+                MeasureIndicatorClimatology.month.label('month'),
+                self.__rollup_mean(MeasureIndicatorClimatology).label('average_value')
             )
-            .filter(MeasureIndicator.idIndicator == indicator_id)
-            .group_by(func.extract('month', MeasureIndicator.datetime))
-            .order_by(func.extract('month', MeasureIndicator.datetime))
+            .filter(MeasureIndicatorClimatology.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.month)
+            .order_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.month)
             .all()
         )
 
-        return [{"month": int(row.month), "average_value": row.average_value} for row in results]
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"month": int(row.month), "average_value": row.average_value})
 
-    def get_measure_indicator_by_day(self, year: int, month: int, indicator_id: int) -> list[dict]:
+    def get_measure_indicator_averaged_per_month_per_station(self, indicator_ids: list[int]) -> dict[int, list[dict]]:
         """
-        Returns the average 'value' of MeasureIndicators grouped by day, filtered by year and month,
-        for a specific indicator_id.
+            Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by station and month.
         """
         results = (
             self.session.query(
-                func.extract('day', MeasureIndicator.datetime).label('day'),
-                func.avg(MeasureIndicator.value).label('average_value')
+                MeasureIndicatorClimatology.idIndicator.label('indicator'),
+                MeasureIndicatorClimatology.idStation.label('station'),
+                MeasureIndicatorClimatology.month.label('month'),
+                self.__rollup_mean(MeasureIndicatorClimatology).label('average_value')
             )
-            .filter(func.extract('year', MeasureIndicator.datetime) == year)
-            .filter(func.extract('month', MeasureIndicator.datetime) == month)
-            .filter(MeasureIndicator.idIndicator == indicator_id)
-            .group_by(func.extract('day', MeasureIndicator.datetime))
+            .filter(MeasureIndicatorClimatology.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.idStation,
+                      MeasureIndicatorClimatology.month)
+            .order_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.idStation,
+                      MeasureIndicatorClimatology.month)
             .all()
         )
 
-        return [{"day": int(row.day), "average_value": row.average_value} for row in results]
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"station": int(row.station), "month": int(row.month),
+                                                      "average_value": row.average_value})
 
-    def get_measure_indicator_by_hour(self, month: int, indicator_id: int) -> list[dict]:
+    def get_measure_indicator_by_day(self, year: int, month: int, indicator_ids: list[int]) -> dict[int, list[dict]]:
         """
-        Returns the average 'value' of MeasureIndicators grouped by hour (from 00:00 to 23:00),
-        filtered by month, for a specific indicator_id.
+        Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by day,
+        filtered by year and month.
         """
-        hour_column = func.extract('hour', MeasureIndicator.datetime).label('hour')
+        start, end = get_time_reference_range(f"{year}-{month}")
+        day = func.extract('day', MeasureIndicatorDaily.date)
 
         results = (
             self.session.query(
-                hour_column,
-                func.avg(MeasureIndicator.value).label('average_value')
+                MeasureIndicatorDaily.idIndicator.label('indicator'),
+                day.label('day'),
+                self.__rollup_mean(MeasureIndicatorDaily).label('average_value')
             )
-            .filter(func.extract('month', MeasureIndicator.datetime) == month)
-            .filter(MeasureIndicator.idIndicator == indicator_id)
-            .group_by(hour_column)
-            .order_by(hour_column)
+            .filter(MeasureIndicatorDaily.idIndicator.in_(indicator_ids))
+            .filter(MeasureIndicatorDaily.date >= start.date())
+            .filter(MeasureIndicatorDaily.date < end.date())
+            .group_by(MeasureIndicatorDaily.idIndicator, day)
+            .order_by(MeasureIndicatorDaily.idIndicator, day)
+            .all()
+        )
+
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"day": int(row.day), "average_value": row.average_value})
+
+    def get_measure_indicator_by_hour(self, month: int, indicator_ids: list[int]) -> dict[int, list[dict]]:
+        """
+        Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by hour
+        (from 00:00 to 23:00), filtered by month.
+        """
+        results = (
+            self.session.query(
+                MeasureIndicatorClimatology.idIndicator.label('indicator'),
+                MeasureIndicatorClimatology.hour.label('hour'),
+                self.__rollup_mean(MeasureIndicatorClimatology).label('average_value')
+            )
+            .filter(MeasureIndicatorClimatology.month == month)
+            .filter(MeasureIndicatorClimatology.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.hour)
+            .order_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.hour)
+            .all()
+        )
+
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"hour": int(row.hour), "average_value": row.average_value})
+
+    def get_measure_indicator_by_hour_per_station(self, month: int, indicator_ids: list[int]) -> dict[int, list[dict]]:
+        """
+        Returns, for each indicator_id, the average 'value' of MeasureIndicators grouped by station and hour
+        (from 00:00 to 23:00), filtered by month.
+        """
+        results = (
+            self.session.query(
+                MeasureIndicatorClimatology.idIndicator.label('indicator'),
+                MeasureIndicatorClimatology.idStation.label('station'),
+                MeasureIndicatorClimatology.hour.label('hour'),
+                self.__rollup_mean(MeasureIndicatorClimatology).label('average_value')
+            )
+            .filter(MeasureIndicatorClimatology.month == month)
+            .filter(MeasureIndicatorClimatology.idIndicator.in_(indicator_ids))
+            .group_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.idStation,
+                      MeasureIndicatorClimatology.hour)
+            .order_by(MeasureIndicatorClimatology.idIndicator, MeasureIndicatorClimatology.idStation,
+                      MeasureIndicatorClimatology.hour)
             .all()
         )
 
-        return [{"hour": int(row.hour), "average_value": row.average_value} for row in results]
+        return self.__group_by_indicator(indicator_ids, results,
+                                         lambda row: {"station": int(row.station), "hour": int(row.hour),
+                                                      "average_value": row.average_value})
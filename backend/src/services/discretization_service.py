@@ -0,0 +1,164 @@
+import functools
+import threading
+import numpy as np
+import pyproj
+from sklearn.neighbors import KDTree
+
+
+_transformers = threading.local()
+
+
+def get_utm_transformer() -> pyproj.Transformer:
+    """
+    Return the transformer from (long, lat) to the UTM zone of São Paulo.
+    It is built once per thread (pyproj objects should not be used by several threads at once) and
+    shared by every interpolator and discretization of the thread.
+    """
+    if not hasattr(_transformers, "utm"):
+        _transformers.utm = pyproj.Transformer.from_crs(pyproj.CRS(proj='longlat', ellps='WGS84'),
+                                                        pyproj.CRS(proj='utm', zone=23, south=True, ellps='WGS84'), # Sâo Paulo projection zone
+                                                        always_xy=True)
+    return _transformers.utm
+
+
+def project_to_utm(lat, long) -> np.ndarray:
+    """
+    lat -> array with the latitude of each point
+    long -> array with the longitude of each point
+    returns the (n, 2) array with the projected (x, y) coordinates of each point
+    """
+    x, y = get_utm_transformer().transform(np.asarray(long, dtype=float), np.asarray(lat, dtype=float))
+    return np.column_stack((np.atleast_1d(x), np.atleast_1d(y)))
+
+
+class AreaDiscretization():
+    """
+    Set of (lat, long) points together with their UTM projection.
+    Points keep their position (indices) in the rectangular grid they were taken from.
+    """
+    def __init__(self, lat, long, utm, indices):
+        """
+        lat -> array with the latitude of each point
+        long -> array with the longitude of each point
+        utm -> (n, 2) array with the projected (x, y) coordinates of each point
+        indices -> array with the index of each point in the rectangular grid
+        """
+        self.lat = lat
+        self.long = long
+        self.utm = utm
+        self.indices = indices
+        self._scaled_coordinates = {}
+
+    def __len__(self):
+        return len(self.lat)
+
+    def __getstate__(self):
+        # The scaled coordinates are memoized per interpolator, and not worth pickling (e.g. when cached)
+        return {**self.__dict__, "_scaled_coordinates": {}}
+
+    def __iter__(self):
+        return zip(self.lat.tolist(), self.long.tolist())
+
+    def __getitem__(self, i):
+        return (self.lat[i], self.long[i])
+
+    def subset(self, mask):
+        """
+        mask -> boolean array selecting the points to keep
+        returns a new AreaDiscretization reusing the already projected coordinates
+        """
+        return AreaDiscretization(self.lat[mask], self.long[mask], self.utm[mask], self.indices[mask])
+
+    def coverage_mask(self, station_coordinates, radius):
+        """
+        station_coordinates -> (s, 2) array of station (lat, long)
+        radius -> array with the radius, in kilometers, covered by each station
+        returns a boolean array marking the points closer than the radius of at least one station
+        """
+        station_coordinates = np.asarray(station_coordinates, dtype=float).reshape(-1, 2)
+        dist = haversine_dist(self.lat[:, np.newaxis], self.long[:, np.newaxis],
+                              station_coordinates[:, 0], station_coordinates[:, 1])
+        return np.any(dist < np.asarray(radius, dtype=float), axis=1)
+
+    def closest_points(self, coordinates):
+        """
+        coordinates -> (s, 2) array of (lat, long)
+        returns the index of the closest point (euclidean distance in degrees) to each coordinate
+        """
+        coordinates = np.asarray(coordinates, dtype=float).reshape(-1, 2)
+        tree = KDTree(np.column_stack((self.lat, self.long)))
+        _, indices = tree.query(coordinates, k=1)
+        return indices[:, 0]
+
+    def scaled(self, scaler):
+        """
+        scaler -> fitted Scaler
+        returns the UTM coordinates transformed by the scaler, memoized per scaler parameters
+        """
+        key = (scaler.x_0_min, scaler.x_1_min, scaler.scale_factor)
+        if key not in self._scaled_coordinates:
+            self._scaled_coordinates[key] = scaler.transform(self.utm)
+        return self._scaled_coordinates[key]
+
+
+class RectangularDiscretization(AreaDiscretization):
+    """
+    Regular lat/long grid covering a bounding box.
+    """
+    def __init__(self, min_lat, max_lat, min_long, max_long, number_of_lat_points):
+        self.borders_coordinates = {
+            "min_lat": min_lat,
+            "max_lat": max_lat,
+            "min_long": min_long,
+            "max_long": max_long,
+        }
+
+        self.lat_range = np.linspace(min_lat, max_lat, number_of_lat_points)
+
+        aspect_ratio = (max_lat - min_lat) / (max_long - min_long)
+        number_of_long_points = int(number_of_lat_points / aspect_ratio)
+
+        self.long_range = np.linspace(min_long, max_long, number_of_long_points)
+        self.shape = (number_of_lat_points, number_of_long_points)
+
+        lat, long = np.meshgrid(self.lat_range, self.long_range, indexing='ij')
+        lat = lat.ravel()
+        long = long.ravel()
+
+        super().__init__(lat, long, project_to_utm(lat, long), np.arange(len(lat)))
+
+
+def haversine_dist(lat1, lon1, lat2, lon2):
+    """
+    Haversine distance, in kilometers, between geographic coordinates.
+    Arguments are arrays (or scalars) and are broadcast against each other.
+    """
+    R = 6371.0
+
+    lat1_rad = np.radians(lat1)
+    lon1_rad = np.radians(lon1)
+    lat2_rad = np.radians(lat2)
+    lon2_rad = np.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = np.sin(dlat / 2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+    return R * c
+
+
+@functools.lru_cache(maxsize=None)
+def get_rectangular_discretization(
+    min_lat: float,
+    max_lat: float,
+    min_long: float,
+    max_long: float,
+    number_of_lat_points: int
+) -> RectangularDiscretization:
+    """
+    Return the process-wide rectangular grid for a bounding box and resolution.
+    The grid (and its projection) is built only on the first call.
+    """
+    return RectangularDiscretization(min_lat, max_lat, min_long, max_long, number_of_lat_points)
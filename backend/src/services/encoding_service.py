@@ -0,0 +1,128 @@
+import json
+import base64
+import struct
+import numpy as np
+
+
+FORMATS = ("json", "compact", "binary")
+DTYPES = ("float32", "uint16")
+BINARY_MIMETYPE = "application/octet-stream"
+UINT16_NODATA = 65535 # Quantized value of the cells without a value in a frame
+ALIGNMENT = 4 # Bytes, so the arrays of a binary body can be read as typed arrays in place
+
+
+def grid_values(grid, frames: dict) -> tuple:
+    """
+    Place the values of each frame in the cells of the rectangular grid they were predicted for.
+
+    Args:
+        grid (RectangularDiscretization): The grid the areas of the frames were taken from.
+        frames (dict): Mapping of frame keys to (area discretization, values), or None for empty frames.
+
+    Returns:
+        tuple: The boolean mask of the grid cells with a value in any frame, and the mapping of frame
+        keys to the array of values of those cells (NaN for the cells without a value in the frame).
+    """
+    mask = np.zeros(len(grid), dtype=bool)
+    for frame in frames.values():
+        if frame is not None:
+            mask[frame[0].indices] = True
+
+    cells = np.full(len(grid), -1)
+    cells[mask] = np.arange(np.count_nonzero(mask))
+
+    values = {}
+    for key, frame in frames.items():
+        values[key] = np.full(np.count_nonzero(mask), np.nan)
+        if frame is not None:
+            area_discretization, frame_values = frame
+            values[key][cells[area_discretization.indices]] = frame_values
+    return mask, values
+
+
+def quantize(values: np.ndarray) -> tuple:
+    """
+    Map values linearly to 0..65534, keeping UINT16_NODATA for NaN.
+
+    Returns:
+        tuple: The uint16 array, and the offset and scale restoring the values as offset + scale * q.
+    """
+    known = ~np.isnan(values)
+    offset = float(np.min(values[known])) if known.any() else 0.0
+    scale = (float(np.max(values[known])) - offset) / (UINT16_NODATA - 1) if known.any() else 0.0
+
+    quantized = np.full(len(values), UINT16_NODATA, dtype=np.uint16)
+    if scale > 0:
+        quantized[known] = np.rint((values[known] - offset) / scale)
+    else:
+        quantized[known] = 0
+    return quantized, offset, scale
+
+
+def encode_frames(grid, frames: dict, dtype: str = "float32") -> tuple:
+    """
+    Encode the frames as a header describing the grid once and one array of values per frame.
+
+    Args:
+        grid (RectangularDiscretization): The grid the areas of the frames were taken from.
+        frames (dict): Mapping of frame keys to (area discretization, values), or None for empty frames.
+        dtype (str): "float32" values (NaN for missing cells) or "uint16" quantized values.
+
+    Returns:
+        tuple: The header (dict) and the list with the little-endian bytes of the values of each frame,
+        in the order of header["frames"].
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"Unknown dtype: {dtype}")
+
+    mask, values = grid_values(grid, frames)
+    header = {
+        "grid": {
+            "bbox": grid.borders_coordinates,
+            "shape": list(grid.shape),
+            "mask": base64.b64encode(np.packbits(mask).tobytes()).decode("ascii"),
+            "cells": int(np.count_nonzero(mask)),
+        },
+        "dtype": dtype,
+        "nodata": UINT16_NODATA if dtype == "uint16" else None,
+        "frames": [],
+    }
+
+    arrays = []
+    for key, frame_values in values.items():
+        frame_header = {"key": key}
+        if dtype == "uint16":
+            frame_values, frame_header["offset"], frame_header["scale"] = quantize(frame_values)
+            arrays.append(frame_values.astype("<u2").tobytes())
+        else:
+            arrays.append(frame_values.astype("<f4").tobytes())
+        header["frames"].append(frame_header)
+    return header, arrays
+
+
+def encode_compact(grid, frames: dict, dtype: str = "float32") -> dict:
+    """
+    Compact JSON encoding: the header of encode_frames with the base64 values of each frame in
+    header["frames"][i]["values"].
+    """
+    header, arrays = encode_frames(grid, frames, dtype)
+    for frame_header, array in zip(header["frames"], arrays):
+        frame_header["values"] = base64.b64encode(array).decode("ascii")
+    return header
+
+
+def encode_binary(grid, frames: dict, dtype: str = "float32") -> bytes:
+    """
+    Binary encoding: the length of the JSON header (uint32, little-endian), the header of encode_frames,
+    then the values of each frame. The header and each array are padded with zeros to ALIGNMENT bytes.
+    """
+    header, arrays = encode_frames(grid, frames, dtype)
+    header = json.dumps(header).encode("utf-8")
+    chunks = [struct.pack("<I", len(header)), header, _padding(4 + len(header))]
+    for array in arrays:
+        chunks += [array, _padding(len(array))]
+    return b"".join(chunks)
+
+
+def _padding(length: int) -> bytes:
+    return b"\0" * (-length % ALIGNMENT)
@@ -0,0 +1,111 @@
+import atexit
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from utils.config import INTERPOLATION_POOL_KIND, INTERPOLATION_POOL_SIZE, INTERPOLATION_INLINE_THRESHOLD
+
+
+_worker_thread = threading.local()
+_in_worker_process = False
+
+
+def _mark_worker_process():
+    global _in_worker_process
+    _in_worker_process = True
+
+
+def _run_in_worker_thread(fn, item):
+    _worker_thread.active = True
+    try:
+        return fn(item)
+    finally:
+        _worker_thread.active = False
+
+
+def in_worker():
+    """
+    Returns whether the caller runs inside a worker of an ExecutionPool.
+    """
+    return _in_worker_process or getattr(_worker_thread, "active", False)
+
+
+class ExecutionPool():
+    """
+    Long-lived pool of workers shared by the interpolation work of every request.
+
+    The units of work (heatmap frames, parameter candidates) are dispatched with map, which runs them
+    inline when the pool would not pay off: a pool of a single worker, a single unit, work below the
+    inline threshold, or a caller that already runs inside a worker (nested work never waits on the
+    pool it occupies). With "process" workers, the function and the units must be picklable.
+    """
+
+    KINDS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+    def __init__(self, kind=INTERPOLATION_POOL_KIND, max_workers=INTERPOLATION_POOL_SIZE,
+                 inline_threshold=INTERPOLATION_INLINE_THRESHOLD):
+        """
+        kind -> "thread" or "process"
+        max_workers -> number of workers
+        inline_threshold -> work (units x known points) below which map runs inline
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown pool kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.inline_threshold = inline_threshold
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def map(self, fn, items, points=1, callback=None):
+        """
+        fn -> function applied to each unit
+        items -> units of work
+        points -> number of known points of each unit, to estimate the size of the work
+        callback -> function called in the calling thread with the number of units done, as the
+        results are collected (in the order of the items)
+        returns the list of results, in the order of the items
+        """
+        items = list(items)
+        if self.__runs_inline(items, points):
+            results = (fn(item) for item in items)
+        elif self.kind == "thread":
+            results = self.__get_executor().map(_run_in_worker_thread, [fn] * len(items), items)
+        else:
+            results = self.__get_executor().map(fn, items)
+
+        collected = []
+        for result in results:
+            collected.append(result)
+            if callback is not None:
+                callback(len(collected))
+        return collected
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+
+    def __runs_inline(self, items, points):
+        return (self.max_workers <= 1
+                or len(items) <= 1
+                or len(items) * points < self.inline_threshold
+                or in_worker())
+
+    def __get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # Forking a process running request threads could copy held locks, so workers are spawned
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers,
+                                                         mp_context=multiprocessing.get_context("spawn"),
+                                                         initializer=_mark_worker_process)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="interpolation")
+            return self._executor
+
+
+# Shared by every request of the process
+execution_pool = ExecutionPool()
+atexit.register(execution_pool.shutdown)
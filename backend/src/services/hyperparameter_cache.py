@@ -0,0 +1,149 @@
+import os
+import json
+import pickle
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from utils.config import HYPERPARAMETER_CACHE_SIZE, HYPERPARAMETER_CACHE_PATH
+from utils.utils import get_time_reference_range
+
+
+def make_key(indicator_id, interval, time_key, station_ids, interpolator_method, parameters, search="exhaustive",
+             neighbors=None):
+    """
+    Builds the cache key of the hyperparameters selected for a heatmap frame.
+
+    Parameters:
+        indicator_id (int): The ID of the indicator.
+        interval (str): The interval of the heatmap (e.g., "hourly", "daily").
+        time_key (str): The period of the frame (see utils.utils.get_time_reference_range).
+        station_ids (iterable): The IDs of the stations with a value in the frame.
+        interpolator_method (str): The interpolation method.
+        parameters: The parameters (or grid of parameters) of the interpolation method.
+        search (str): The hyperparameter search strategy.
+        neighbors (int): The number of nearest stations of local kriging, or None.
+
+    Returns:
+        tuple: (indicator_id, interval, time_key, station_ids, hash of the parameter grid).
+    """
+    param_grid = {"method": interpolator_method, "params": parameters, "search": search}
+    if neighbors is not None: # Changes the scores of the "universal" kriging parameters
+        param_grid["neighbors"] = neighbors
+    param_grid = json.dumps(param_grid, sort_keys=True, default=str)
+    param_grid_hash = hashlib.sha1(param_grid.encode()).hexdigest()
+    return (indicator_id, interval, time_key, tuple(sorted(station_ids)), param_grid_hash)
+
+
+class HyperparameterCache():
+    """
+    LRU cache of the hyperparameters (and their cross validation score) selected by the interpolators
+    for each heatmap frame, so a frame requested again is refit with them without repeating the search.
+
+    The keys are built by make_key. When a path is given, the entries are loaded from it on creation
+    and saved to it after every change, so they survive restarts. Entries must be invalidated when the
+    measures of their frame change (see invalidate).
+    """
+
+    def __init__(self, max_size=HYPERPARAMETER_CACHE_SIZE, path=HYPERPARAMETER_CACHE_PATH):
+        """
+        max_size -> maximum number of entries, the least recently used ones being evicted first
+        path -> file where the entries are persisted, or None to keep them in memory only
+        """
+        self.max_size = max_size
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.__load()
+
+    def get(self, key):
+        """
+        key -> cache key (see make_key)
+        returns the cached (params, score), or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def get_many(self, keys):
+        """
+        keys -> list of cache keys
+        returns the list of cached (params, score), None for the missing keys
+        """
+        return [self.get(key) for key in keys]
+
+    def set_many(self, entries):
+        """
+        entries -> dict key : (params, score)
+        """
+        if not entries:
+            return
+        with self._lock:
+            for key, value in entries.items():
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.__save()
+
+    def set(self, key, value):
+        """
+        key -> cache key (see make_key)
+        value -> (params, score)
+        """
+        self.set_many({key: value})
+
+    def invalidate(self, indicator_id, first_datetime, last_datetime):
+        """
+        Removes the entries of the indicator whose period contains measures between `first_datetime`
+        and `last_datetime` (inclusive).
+        """
+        with self._lock:
+            stale_keys = [key for key in self._entries
+                          if key[0] == indicator_id and self.__overlaps(key[2], first_datetime, last_datetime)]
+            for key in stale_keys:
+                del self._entries[key]
+            if stale_keys:
+                self.__save()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.__save()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def __overlaps(time_key, first_datetime, last_datetime):
+        period_start, period_end = get_time_reference_range(time_key)
+        return period_start <= last_datetime and first_datetime < period_end
+
+    def __load(self):
+        if self.path is None or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as file:
+                entries = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            print(f"Ignoring the hyperparameter cache at {self.path}: {e}")
+            return
+        self._entries.update(list(entries.items())[-self.max_size:])
+
+    def __save(self):
+        """
+        Writes the entries to a temporary file replacing the cache file, so readers never see a partial file.
+        """
+        if self.path is None:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode="wb", dir=directory, delete=False) as file:
+            pickle.dump(self._entries, file)
+        os.replace(file.name, self.path)
+
+
+# Shared by every request of the process
+hyperparameter_cache = HyperparameterCache()
@@ -1,13 +1,17 @@
 from sklearn.neighbors import KNeighborsRegressor
-import pyproj
 from sklearn.model_selection import  cross_val_score
 import numpy as np
 import math
+from scipy.spatial.distance import cdist
 from pykrige.ok import OrdinaryKriging
 from pykrige.rk import Krige
 import itertools
+import functools
 import sys 
 import os
+from services.discretization_service import AreaDiscretization, project_to_utm
+from services.kriging_service import KrigingLOO, KrigingWeights
+from services.execution_service import execution_pool
 
 def convex_hull_indices(points):
     """
@@ -57,6 +61,52 @@ class ConvexLOOCV():
     
     def get_n_splits(self, X, y=None, groups=None):
         return len(self.split(X))
+
+    def test_indices(self, X):
+        """
+        returns the index of the point left out by each fold
+        """
+        return [test_index[0] for _, test_index in self.split(X)]
+
+
+def knn_loo_predictions(X, y, test_indices):
+    """
+    X -> (n, 2) array of coordinates
+    y -> list of n values, or (n, frames) array
+    test_indices -> indices of the points to leave out, one at a time
+    returns a (len(test_indices), n - 1) array whose column k - 1 holds the leave one out prediction of
+    KNeighborsRegressor(n_neighbors=k, weights='distance') for each test point, for every k in 1..n-1.
+    For a (n, frames) y, returns a (len(test_indices), n - 1, frames) array.
+
+    The distance matrix is computed once and each row is sorted once: the prediction for k neighbors is
+    the ratio of the cumulative sums of 1/d * y and 1/d over the first k neighbors. As in scikit-learn,
+    neighbors at distance zero take all the weight when there are any.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    test_indices = np.asarray(test_indices, dtype=int)
+    n = len(y)
+
+    dist = np.sqrt(((X[test_indices, np.newaxis, :] - X[np.newaxis, :, :])**2).sum(axis=2))
+    dist[np.arange(len(test_indices)), test_indices] = np.inf # Leave the test point out of its own neighbors
+
+    order = np.argsort(dist, axis=1, kind='stable')[:, :n - 1]
+    dist = np.take_along_axis(dist, order, axis=1)
+    neighbors_y = y[order]
+
+    zero = dist == 0
+    with np.errstate(divide='ignore'):
+        weights = np.where(zero, 0, 1 / dist)
+    if y.ndim == 2: # One column of values per frame
+        zero, weights = zero[..., np.newaxis], weights[..., np.newaxis]
+
+    weighted_sum = np.cumsum(weights * neighbors_y, axis=1)
+    weights_sum = np.cumsum(weights, axis=1)
+    zero_count = np.cumsum(zero, axis=1)
+    zero_sum = np.cumsum(np.where(zero, neighbors_y, 0), axis=1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(zero_count > 0, zero_sum / np.maximum(zero_count, 1), weighted_sum / weights_sum)
     
 class Scaler():
     """
@@ -83,43 +133,98 @@ class Interpolator():
     """
     Base interpolator class.
     """
+    SEARCH_STRATEGIES = ("exhaustive",) # Hyperparameter search strategies, the others chosen by a "search" argument
+
     def __init__(self, data, verbose=False):
-        self.P = pyproj.Proj(proj='utm', zone=23, south=True, ellps='WGS84') # Sâo Paulo projection zone
+        """
+        data -> (coordinates, values) arrays (see _preprocess_data), or dict (lat,long) : value
+        """
         self.scaler = Scaler()
-        self.X, self.y = self._preprocess_data(data)
+        self.X, self.y = self._preprocess_data(*self._as_arrays(data))
 
         self.verbose = verbose
 
-    def _preprocess_data(self, data):
+    @staticmethod
+    def _as_arrays(data):
+        """
+        data -> (coordinates, values) tuple, or dict (lat,long) : value (or list with the value of each frame)
+        returns
+        coordinates -> (n, 2) array of (lat, long)
+        values -> (n,) array, or (n, frames) array
+        """
+        if isinstance(data, dict):
+            coordinates, values = list(data.keys()), list(data.values())
+        else:
+            coordinates, values = data
+        return np.asarray(coordinates, dtype=float).reshape(-1, 2), np.asarray(values, dtype=float)
+
+    def _preprocess_data(self, coordinates, values):
         """
-        data -> dict  (lat,long) : value
-        Convert (lat, long) to [0,1] coordinates preserving relative distance.
+        coordinates -> (n, 2) array of (lat, long)
+        values -> (n,) array, or (n, frames) array with the value of each frame
+        Drop the points without any value and convert (lat, long) to [0,1] coordinates preserving relative distance.
         returns 
         X -> coordinates
         y -> values 
         """
-        X = data.keys()
-        y = [data[k] for k in X if not math.isnan(data[k])]
-        X = np.array([list(self.P(c[1], c[0])) for c in X  if not math.isnan(data[c])]) # Projection input is long, lat
+        known = ~np.all(np.isnan(values.reshape(len(values), -1)), axis=1)
+        X = project_to_utm(coordinates[known, 0], coordinates[known, 1])
         X = self.scaler.fit_transform(X)
-        return X,y
+        return X, values[known]
+
+    def _frames_selected_params(self, selected_params):
+        """
+        selected_params -> (params, score) previously selected for the data, or in the batched mode a list
+        with the (params, score) of each frame, None for the frames to search
+        returns the list with the (params, score), or None, of each frame
+        """
+        if np.ndim(self.y) != 2:
+            return [selected_params]
+        if selected_params is None:
+            return [None] * np.shape(self.y)[1]
+        return list(selected_params)
+
+    def _set_selected_params(self, frames_selected_params):
+        """
+        Keeps the (params, score) selected for each frame in self.selected_params, in the same format as
+        the selected_params argument of the constructor, so they can be reused for the same data.
+        """
+        self.selected_params = frames_selected_params if np.ndim(self.y) == 2 else frames_selected_params[0]
+
+    def _transform(self, X):
+        """
+        X -> AreaDiscretization or list of (lat, lon) pairs
+        returns the coordinates scaled as the training coordinates
+        """
+        if isinstance(X, AreaDiscretization):
+            return X.scaled(self.scaler)
+        _X = np.asarray(X, dtype=float).reshape(-1, 2)
+        return self.scaler.transform(project_to_utm(_X[:, 0], _X[:, 1]))
     
     def predict(self, X):
         """
-        X -> List of (lat, lon) pairs
+        X -> AreaDiscretization or list of (lat, lon) pairs
         returns a list containing interpolated values 
         """
-        _X = [self.P(x[1], x[0]) for x in X]
-        _X = self.scaler.transform(_X)
-        return self.interpolator.predict(_X)
+        return self.interpolator.predict(self._transform(X))
     
 class KrigingInterpolator(Interpolator):
     """
     Kriging interpolator class
     """
-    def __init__(self, data, param_dict, verbose=False):
+    batched = True # Accepts one value per frame at each point (see __init__)
+    local = True # Accepts a number of neighbors for local kriging (see __init__)
+
+    SEARCH_STRATEGIES = ("exhaustive", "halving")
+    HALVING_FACTOR = 3 # Fraction of the combinations kept by each round of the "halving" search is 1 / HALVING_FACTOR
+    HALVING_MIN_FOLDS = 2
+
+    def __init__(self, data, param_dict, verbose=False, refit_variogram=True, selected_params=None,
+                 search="exhaustive", neighbors=None):
         """
-        data -> dict  (lat,long) : value
+        data -> (coordinates, values) arrays: (n, 2) array of (lat, long) and (n,) array of values, or
+        (n, frames) array with the value of each frame. Also accepts a dict (lat,long) : value, or
+        (lat,long) : list with the value of each frame
         param_dict -> dict containing parameters for grid search. Possible parameters are given by 
         https://geostat-framework.readthedocs.io/projects/pykrige/en/stable/generated/pykrige.rk.Krige.html#pykrige.rk.Krige
         Example: 
@@ -129,29 +234,100 @@ class KrigingInterpolator(Interpolator):
             "nlags": [4, 6, 8],
             "weight": [True, False]
         }
+        refit_variogram -> whether cross validation fits the variogram of each fold on its training points,
+        as cross_val_score does, or once on all points (faster, see KrigingLOO)
+        selected_params -> (params, score) previously selected from param_dict for the same data (a list with
+        one per frame in the batched mode, None for the frames to search), to fit without the grid search.
+        The selected ones are kept in self.selected_params.
+        search -> "exhaustive" to score every combination on every fold, or "halving" to score them on a
+        subset of the folds first and only score the best ones on every fold (see _halve)
+        neighbors -> local kriging: number of nearest stations whose system is solved at each point by
+        "universal" kriging, as "ordinary" kriging does with its n_closest_points. None solves the system
+        of every station (see KrigingWeights).
+
+        When data holds several values per point (every frame sharing the same known points), the
+        parameters are selected and the variogram is fitted for each frame, self.params and
+        self.best_score have one entry per frame and predict returns a (points x frames) array.
+        Frames ending up with the same variogram share their kriging weights (see KrigingWeights).
         """
         super().__init__(data, verbose=verbose)
+        if np.isnan(np.asarray(self.y, dtype=float)).any():
+            raise ValueError("Every frame must share the same known points")
+        if search not in self.SEARCH_STRATEGIES:
+            raise ValueError(f"Unknown search strategy: {search}")
+        self.search = search
+        self.refit_variogram = refit_variogram
+        self.neighbors = neighbors
         self.param_dict = {key: value if isinstance(value, list) else [value] for key, value in param_dict.items()}
-        params, self.best_score = self._find_params()
 
-        self.interpolator = Krige(**params)
-        self.interpolator.fit(self.X,self.y)
+        y = np.asarray(self.y, dtype=float)
+        frames_y = y.T if y.ndim == 2 else [y]
+        frames_selected_params = self._frames_selected_params(selected_params)
+        search_frames = [frame for frame, frame_selected_params in enumerate(frames_selected_params)
+                         if frame_selected_params is None]
+        searched_params = execution_pool.map(self._find_params, [frames_y[frame] for frame in search_frames],
+                                             points=len(self.X))
+        for frame, frame_selected_params in zip(search_frames, searched_params):
+            frames_selected_params[frame] = frame_selected_params
+        self._set_selected_params(frames_selected_params)
+
+        if np.ndim(self.y) == 2:
+            self.params = [params for params, _ in frames_selected_params]
+            self.best_score = np.array([score for _, score in frames_selected_params])
+            self.interpolators = []
+            for params, frame_y in zip(self.params, frames_y):
+                interpolator = Krige(**params)
+                interpolator.fit(self.X, frame_y)
+                self.interpolators.append(interpolator)
+        else:
+            self.params, self.best_score = self.selected_params
+
+            self.interpolator = Krige(**self.params)
+            self.interpolator.fit(self.X,self.y)
 
-    def _find_params(self):
+    def predict(self, X):
+        """
+        X -> AreaDiscretization or list of (lat, lon) pairs
+        returns an array containing interpolated values, or a (points x frames) array in the batched mode
+        """
+        _X = self._transform(X)
+        y = np.reshape(np.asarray(self.y, dtype=float), (len(self.X), -1))
+        frames_params, interpolators = (self.params, self.interpolators) if np.ndim(self.y) == 2 else ([self.params], [self.interpolator])
+        predictions = np.empty((len(_X), y.shape[1]))
+        kriging_weights = KrigingWeights(self.X, _X, neighbors=self.neighbors)
+
+        frames_per_variogram = {}
+        for frame, (params, interpolator) in enumerate(zip(frames_params, interpolators)):
+            if KrigingWeights.supports(params, len(self.X)):
+                model, params = interpolator.model, {**KrigingLOO.DEFAULT_PARAMS, **params}
+                variogram = (params["method"], params["n_closest_points"], params["exact_values"],
+                             model.variogram_model, tuple(model.variogram_model_parameters))
+                frames_per_variogram.setdefault(variogram, []).append(frame)
+            else:
+                predictions[:, frame] = interpolator.predict(_X)
+
+        for frames in frames_per_variogram.values():
+            predictions[:, frames] = kriging_weights.predict(interpolators[frames[0]].model,
+                                                             frames_params[frames[0]], y[:, frames])
+        return predictions if np.ndim(self.y) == 2 else predictions[:, 0]
+
+    def _find_params(self, y):
         """
         Apply grid search to find best parameter combination
+        y -> values at the known points
         """
         best_score = -np.inf
         best_params = {}
 
         combinations = [dict(zip(self.param_dict.keys(), valores)) for valores in itertools.product(*self.param_dict.values())]
+        loo = KrigingLOO(self.X, y, ConvexLOOCV().test_indices(self.X), refit_variogram=self.refit_variogram,
+                         neighbors=self.neighbors)
 
-        for c in combinations:
-            cv = ConvexLOOCV()
-            model = Krige(**c, verbose=False)
-            scores = cross_val_score(model, self.X, self.y, scoring='neg_root_mean_squared_error', cv=cv, n_jobs=-1, verbose=0)
-            score = np.mean(scores)
+        if self.search == "halving":
+            combinations = self._halve(combinations, y, loo)
 
+        scores = execution_pool.map(functools.partial(self._score, y=y, loo=loo), combinations, points=len(y))
+        for c, score in zip(combinations, scores):
             if score > best_score:
                 best_score = score
                 best_params = c
@@ -162,64 +338,362 @@ class KrigingInterpolator(Interpolator):
         if self.verbose:
             print(f"Best RMSE: {-1 * best_score}; params={best_params}")
         return best_params, -best_score
+
+    def _halve(self, combinations, y, loo):
+        """
+        Successive halving: score the combinations on a subset of the folds, keep the best
+        1 / HALVING_FACTOR of them and score those on HALVING_FACTOR times more folds, until a single
+        combination is left or the next round would use every fold.
+        The subsets are nested prefixes of a fixed shuffle of the folds, so the selection is reproducible.
+        returns the remaining combinations, in their original order
+        """
+        folds = np.random.default_rng(0).permutation(loo.test_indices)
+        rounds = math.ceil(math.log(max(len(combinations), 1), self.HALVING_FACTOR))
+        n_folds = max(self.HALVING_MIN_FOLDS, math.ceil(len(folds) / self.HALVING_FACTOR ** rounds))
+
+        while len(combinations) > 1 and n_folds < len(folds):
+            scores = np.array(execution_pool.map(functools.partial(self._score, y=y, loo=loo, test_indices=folds[:n_folds]),
+                                                 combinations, points=len(y)))
+            scores = np.where(np.isnan(scores), -np.inf, scores) # Singular systems rank last
+            kept = np.argsort(-scores, kind='stable')[:math.ceil(len(combinations) / self.HALVING_FACTOR)]
+            combinations = [combinations[i] for i in sorted(kept)]
+
+            if self.verbose:
+                print(f"Halving: kept {len(combinations)} combinations after {n_folds} folds")
+            n_folds *= self.HALVING_FACTOR
+
+        return combinations
+
+    def _score(self, c, y, loo, test_indices=None):
+        """
+        Leave one out score of the parameter combination c over the given test indices (every
+        ConvexLOOCV fold by default)
+        """
+        if KrigingLOO.supports(c):
+            return loo.score(c, test_indices)
+
+        if test_indices is None:
+            cv = ConvexLOOCV()
+        else:
+            cv = [(np.delete(np.arange(len(y)), i), np.array([i])) for i in test_indices]
+        model = Krige(**c, verbose=False)
+        scores = cross_val_score(model, self.X, y, scoring='neg_root_mean_squared_error', cv=cv, verbose=0)
+        return np.mean(scores)
         
 
 
+class LinearInterpolator(Interpolator):
+    """
+    Base class of the interpolators whose predictions are weighted sums of the known values, with
+    weights depending only on the coordinates and the parameters. The weights are computed from the
+    distances between the points to predict and the known points with NumPy matrix operations, and
+    the leave one out residuals have a closed form, so every parameter combination is scored for
+    every frame at once.
+
+    Subclasses define DEFAULT_PARAM_GRID, _weights and _loo_residuals.
+    """
+    DEFAULT_PARAM_GRID = {}
+    batched = True # Accepts one value per frame at each point (see __init__)
+
+    def __init__(self, data, param_dict=None, verbose=False, selected_params=None, loo_score=True):
+        """
+        data -> (coordinates, values) arrays: (n, 2) array of (lat, long) and (n,) array of values, or
+        (n, frames) array with the value of each frame. Also accepts a dict (lat,long) : value, or
+        (lat,long) : list with the value of each frame
+        param_dict -> dict with the value, or list of values for grid search, of each parameter. Missing
+        parameters, or parameters set to "auto", search the values of DEFAULT_PARAM_GRID
+        selected_params -> (params, score) previously selected for the same data (a list with one per frame
+        in the batched mode, None for the frames to search), to skip the search. The selected ones are
+        kept in self.selected_params.
+        loo_score -> whether to compute the leave one out score when there is a single combination
+        (best_score is NaN otherwise)
+
+        When data holds several values per point (every frame sharing the same known points), the
+        parameters are selected for each frame, self.params and self.best_score have one entry per frame
+        and predict returns a (points x frames) array. The weights of each distinct combination are
+        computed once for all of its frames.
+        """
+        super().__init__(data, verbose=verbose)
+        if np.isnan(np.asarray(self.y, dtype=float)).any():
+            raise ValueError("Every frame must share the same known points")
+
+        param_dict = {} if param_dict in (None, "auto") else param_dict
+        self.param_dict = {key: value if isinstance(value, list) else [value] for key, value in
+                           {**self.DEFAULT_PARAM_GRID, **param_dict}.items()}
+        self.param_dict = {key: self.DEFAULT_PARAM_GRID[key] if value == ["auto"] else value
+                           for key, value in self.param_dict.items()}
+        self.station_distances = cdist(self.X, self.X, "euclidean")
+
+        frames_selected_params = self._frames_selected_params(selected_params)
+        search_frames = [frame for frame, frame_selected_params in enumerate(frames_selected_params)
+                         if frame_selected_params is None]
+        if search_frames:
+            Y = np.reshape(self.y, (len(self.X), -1))[:, search_frames]
+            for frame, frame_selected_params in zip(search_frames, self._find_params(Y, loo_score)):
+                frames_selected_params[frame] = frame_selected_params
+        self._set_selected_params(frames_selected_params)
+
+        self.params = [params for params, _ in frames_selected_params]
+        self.best_score = np.array([score for _, score in frames_selected_params], dtype=float)
+        if np.ndim(self.y) != 2:
+            self.params, self.best_score = self.params[0], self.best_score[0]
+
+    def predict(self, X):
+        """
+        X -> AreaDiscretization or list of (lat, lon) pairs
+        returns an array containing interpolated values, or a (points x frames) array in the batched mode
+        """
+        points = self._transform(X)
+        distances = cdist(points, self.X, "euclidean")
+        Y = np.reshape(self.y, (len(self.X), -1))
+        frames_params = self.params if np.ndim(self.y) == 2 else [self.params]
+
+        frames_per_params = {}
+        for frame, params in enumerate(frames_params):
+            frames_per_params.setdefault(tuple(sorted(params.items())), []).append(frame)
+
+        predictions = np.empty((len(distances), Y.shape[1]))
+        for params, frames in frames_per_params.items():
+            predictions[:, frames] = self._weights(dict(params), points, distances).dot(Y[:, frames])
+        return predictions if np.ndim(self.y) == 2 else predictions[:, 0]
+
+    def _find_params(self, Y, loo_score=True):
+        """
+        Apply grid search to find the best parameter combination of each frame
+        Y -> (n, frames) array of values at the known points
+        returns the list with the (params, score) of each frame
+        """
+        combinations = [dict(zip(self.param_dict.keys(), values)) for values in itertools.product(*self.param_dict.values())]
+        if len(combinations) == 1 and not loo_score:
+            return [(combinations[0], math.nan)] * Y.shape[1]
+
+        test_indices = ConvexLOOCV().test_indices(self.X)
+        if len(test_indices) == 0:
+            raise ValueError("Cross validation needs at least one point inside the convex hull")
+
+        scores = np.empty((len(combinations), Y.shape[1]))
+        for i, c in enumerate(combinations):
+            try:
+                scores[i] = -np.mean(np.abs(self._loo_residuals(c, Y, test_indices)), axis=0)
+            except np.linalg.LinAlgError:
+                scores[i] = np.nan
+            if self.verbose:
+                print(f"RMSE: {-scores[i]}; params={c}")
+
+        best = np.argmax(np.where(np.isnan(scores), -np.inf, scores), axis=0) # First best combination of each frame
+        return [(combinations[i], -scores[i, frame]) for frame, i in enumerate(best)]
+
+    def _weights(self, params, points, distances):
+        """
+        params -> dict of parameters
+        points -> (m, 2) array of the (transformed) points to predict
+        distances -> (m, n) array of distances between the points to predict and the known points
+        returns the (m, n) array of weights of the known values at each point
+        """
+        raise NotImplementedError
+
+    def _loo_residuals(self, params, Y, test_indices):
+        """
+        params -> dict of parameters
+        Y -> (n, frames) array of values at the known points
+        test_indices -> indices of the points to leave out, one at a time
+        returns the (len(test_indices), frames) array of leave one out residuals (true minus predicted value)
+        """
+        raise NotImplementedError
+
+
+class IDWInterpolator(LinearInterpolator):
+    """
+    Inverse distance weighting interpolator: each point gets the average of the known values weighted
+    by 1 / distance ** power. Points at distance zero of known points take their (mean) value.
+    """
+    DEFAULT_PARAM_GRID = {"power": [1, 2, 3]}
+
+    def _weights(self, params, points, distances):
+        zero = distances == 0
+        with np.errstate(divide='ignore'):
+            weights = np.where(zero, 0, 1 / distances ** params["power"])
+        exact = zero.any(axis=1)
+        weights[exact] = zero[exact]
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def _loo_residuals(self, params, Y, test_indices):
+        distances = self.station_distances[test_indices].copy()
+        distances[np.arange(len(test_indices)), test_indices] = np.inf # Leave the test point out
+        return Y[test_indices] - self._weights(params, self.X[test_indices], distances).dot(Y)
+
+
+class RBFInterpolator(LinearInterpolator):
+    """
+    Radial basis function interpolator with a degree one polynomial term, solving
+        [Phi + smoothing * I   P] [c]   [y]
+        [P^T                   0] [a] = [0]
+    where Phi holds the kernel of the distances between the known points and P their coordinates
+    (with a column of ones). The kernels follow scipy.interpolate.RBFInterpolator; epsilon scales
+    the distances of the "multiquadric", "inverse_multiquadric" and "gaussian" kernels.
+
+    The leave one out residuals come from the inverse of the system (Rippa, 1999):
+        y_i - y_hat_(-i) = [A^-1 (y, 0)]_i / [A^-1]_ii
+    """
+    DEFAULT_PARAM_GRID = {"kernel": ["thin_plate_spline"], "epsilon": [1.0], "smoothing": [0.0]}
+
+    KERNELS = {
+        "linear": lambda r: -r,
+        "thin_plate_spline": lambda r: np.where(r > 0, r ** 2 * np.log(np.where(r > 0, r, 1)), 0.0),
+        "cubic": lambda r: r ** 3,
+        "multiquadric": lambda r: -np.sqrt(1 + r ** 2),
+        "inverse_multiquadric": lambda r: 1 / np.sqrt(1 + r ** 2),
+        "gaussian": lambda r: np.exp(-r ** 2),
+    }
+    SHAPE_KERNELS = ("multiquadric", "inverse_multiquadric", "gaussian")
+
+    def __init__(self, data, param_dict=None, verbose=False, selected_params=None, loo_score=True):
+        self._inverses = {}
+        super().__init__(data, param_dict, verbose=verbose, selected_params=selected_params, loo_score=loo_score)
+
+    def _weights(self, params, points, distances):
+        a_inv = self.__inverse(params)
+        return np.column_stack((self.__kernel(params, distances), self.__polynomial(points))).dot(a_inv[:, :len(self.X)])
+
+    def _loo_residuals(self, params, Y, test_indices):
+        a_inv = self.__inverse(params)
+        coefficients = a_inv[:, :len(self.X)].dot(Y)
+        return coefficients[test_indices] / np.diag(a_inv)[test_indices, np.newaxis]
+
+    def __kernel(self, params, distances):
+        if params["kernel"] not in self.KERNELS:
+            raise ValueError(f"Unknown kernel: {params['kernel']}")
+        if params["kernel"] in self.SHAPE_KERNELS:
+            distances = params["epsilon"] * distances
+        return self.KERNELS[params["kernel"]](distances)
+
+    @staticmethod
+    def __polynomial(X):
+        return np.column_stack((np.ones(len(X)), X))
+
+    def __inverse(self, params):
+        """
+        Inverse of the system of the known points, once per (kernel, epsilon, smoothing)
+        """
+        key = (params["kernel"], params["epsilon"], params["smoothing"])
+        if key not in self._inverses:
+            n = len(self.X)
+            a = np.zeros((n + 3, n + 3))
+            a[:n, :n] = self.__kernel(params, self.station_distances) + params["smoothing"] * np.eye(n)
+            a[:n, n:] = self.__polynomial(self.X)
+            a[n:, :n] = a[:n, n:].T
+            self._inverses[key] = np.linalg.inv(a)
+        return self._inverses[key]
+
+
 class KNNInterpolator(Interpolator):
     """
     KNN interpolator class.
     """
-    def __init__(self, data, k='auto', verbose=False):
+    SEARCH_STRATEGIES = ("exhaustive",) # Every k is scored by a single pass (see _loo_scores)
+    batched = True # Accepts one value per frame at each point (see __init__)
+
+    def __init__(self, data, k='auto', verbose=False, selected_params=None):
         """
-        data -> dict  (lat,long) : value
+        data -> (coordinates, values) arrays: (n, 2) array of (lat, long) and (n,) array of values, or
+        (n, frames) array with the value of each frame. Also accepts a dict (lat,long) : value, or
+        (lat,long) : list with the value of each frame
         k -> KNN number of neighbors parameter. Integer for a fixed value or "auto" 
         to select using cross validation
+        selected_params -> ({"k": k}, score) previously selected for the same data (a list with one per frame
+        in the batched mode, None for the frames to search), to skip the selection of k. The selected ones
+        are kept in self.selected_params.
+
+        When data holds several values per point (every frame sharing the same known points), k is
+        selected for each frame, self.k and self.best_score are arrays with one entry per frame and
+        predict returns a (points x frames) array. The neighbors and weights of each distinct k are
+        computed once for all of its frames.
         """
 
         k = k['k'] if isinstance(k, dict) else k # Allow to receive k as a dict
 
         super().__init__(data, verbose=verbose) 
-        if k == 'auto':
+        if np.isnan(np.asarray(self.y, dtype=float)).any():
+            raise ValueError("Every frame must share the same known points")
+        frames_selected_params = self._frames_selected_params(selected_params)
+        if k == 'auto' and all(frame_selected_params is not None for frame_selected_params in frames_selected_params):
+            self.k = np.array([params["k"] for params, _ in frames_selected_params])
+            self.best_score = np.array([score for _, score in frames_selected_params])
+            if np.ndim(self.y) != 2:
+                self.k, self.best_score = int(self.k[0]), self.best_score[0]
+        elif k == 'auto':
             self.k, self.best_score = self._find_k() 
         else:
+            if not 1 <= k <= len(self.y) - 1:
+                raise ValueError(f"k must be between 1 and the number of known points minus one ({len(self.y) - 1}): {k}")
             self.k = k
-            cv = ConvexLOOCV()
-            model = KNeighborsRegressor(n_neighbors=self.k, weights = 'distance')
-            scores = cross_val_score(model, self.X, self.y, scoring='neg_root_mean_squared_error', cv=cv, n_jobs=-1)
-            score = np.mean(scores)
+            score = self._loo_scores()[self.k - 1]
 
             if verbose:
                 print(f"RMSE: {-1 * score}")
 
             self.best_score = -score
 
-        self.interpolator = KNeighborsRegressor(n_neighbors = self.k, weights = 'distance')
-        self.interpolator.fit(self.X,self.y)
+        if np.ndim(self.y) == 2:
+            self.k = np.broadcast_to(self.k, np.shape(self.y)[1])
+            self.best_score = np.broadcast_to(self.best_score, np.shape(self.y)[1])
+            self._set_selected_params([({"k": int(k)}, float(score)) for k, score in zip(self.k, self.best_score)])
+            self.interpolators = {}
+            for frame_k in np.unique(self.k):
+                frames = np.nonzero(self.k == frame_k)[0]
+                interpolator = KNeighborsRegressor(n_neighbors = int(frame_k), weights = 'distance')
+                interpolator.fit(self.X, np.asarray(self.y)[:, frames])
+                self.interpolators[int(frame_k)] = (frames, interpolator)
+        else:
+            self._set_selected_params([({"k": int(self.k)}, float(self.best_score))])
+            self.interpolator = KNeighborsRegressor(n_neighbors = self.k, weights = 'distance')
+            self.interpolator.fit(self.X,self.y)
         
 
+    def predict(self, X):
+        """
+        X -> AreaDiscretization or list of (lat, lon) pairs
+        returns a list containing interpolated values, or a (points x frames) array in the batched mode
+        """
+        if np.ndim(self.y) != 2:
+            return super().predict(X)
+
+        _X = self._transform(X)
+        predictions = np.empty((len(_X), np.shape(self.y)[1]))
+        for frames, interpolator in self.interpolators.values():
+            predictions[:, frames] = np.reshape(interpolator.predict(_X), (len(_X), len(frames)))
+        return predictions
     
-    def _find_k(self):
+    def _loo_scores(self):
         """
-        Apply grid search to find best k parameter.
+        Score of every k in 1..n-1, as cross_val_score(KNeighborsRegressor(n_neighbors=k, weights='distance'),
+        scoring='neg_root_mean_squared_error', cv=ConvexLOOCV()) averages it: minus the mean absolute
+        leave one out error.
+        In the batched mode, returns a (n-1 x frames) array with the scores of every frame.
         """
+        test_indices = ConvexLOOCV().test_indices(self.X)
+        if len(test_indices) == 0:
+            raise ValueError("Cross validation needs at least one point inside the convex hull")
 
-        best_score = -np.inf
-        best_k = -1
-
-        for k in range(1,len(self.y)):
-            cv = ConvexLOOCV()
-            model = KNeighborsRegressor(n_neighbors=k, weights = 'distance')
-            scores = cross_val_score(model, self.X, self.y, scoring='neg_root_mean_squared_error', cv=cv, n_jobs=-1)
-            score = np.mean(scores)
+        y = np.asarray(self.y, dtype=float)
+        predictions = knn_loo_predictions(self.X, y, test_indices)
+        errors = np.abs(predictions - y[test_indices, np.newaxis])
+        return -np.mean(errors, axis=0)
 
-            if score > best_score:
-                best_score = score
-                best_k = k
+    def _find_k(self):
+        """
+        Apply grid search to find best k parameter.
+        """
 
-            if self.verbose:
-                print(f"RMSE: {-score}; k={k}")
+        scores = self._loo_scores()
+        best_k = np.argmax(scores, axis=0) + 1 # First k with the best score (of each frame)
+        best_score = np.max(scores, axis=0)
+        if scores.ndim == 1:
+            best_k = int(best_k)
 
         if self.verbose:
+            for k, score in enumerate(scores, start=1):
+                print(f"RMSE: {-score}; k={k}")
             print(f"Best RMSE: {-1 * best_score}; k={best_k}")
         return best_k, -best_score
     
@@ -0,0 +1,137 @@
+import time
+import uuid
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from utils.config import HEATMAP_JOB_WORKERS, HEATMAP_JOB_TTL
+
+
+class Job():
+    """
+    Computation submitted to a JobManager, with its status, progress and outcome.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, key):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.status = Job.QUEUED
+        self.frames_done = 0
+        self.frames_total = None
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.finished_at = None
+
+    def set_progress(self, done, total):
+        """
+        done -> number of frames computed
+        total -> number of frames of the job
+        """
+        self.frames_done = done
+        self.frames_total = total
+
+    def is_finished(self):
+        return self.status in (Job.DONE, Job.FAILED)
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "frames_done": self.frames_done,
+            "frames_total": self.frames_total,
+            "error": self.error,
+            "submitted_at": self.submitted_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager():
+    """
+    Runs long computations (e.g. heatmaps of many frames) on a background executor, so the requests
+    submitting them return right away with the id of the job to poll.
+
+    Jobs are deduplicated by key: submitting a key whose job is queued, running or done returns that job
+    instead of starting a new one, while a failed job is replaced. Finished jobs, and their results, are
+    kept for ttl seconds after they finish: unlike the response cache, their results are not invalidated
+    by new measures, so the ttl also bounds how stale a result can be.
+    """
+
+    def __init__(self, max_workers=HEATMAP_JOB_WORKERS, ttl=HEATMAP_JOB_TTL):
+        """
+        max_workers -> number of jobs running at the same time
+        ttl -> seconds the finished jobs are kept
+        """
+        self.max_workers = max_workers
+        self.ttl = ttl
+        self._jobs = {} # id --> job
+        self._jobs_by_key = {} # key --> job
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, key, run):
+        """
+        key -> hashable key of the computation (e.g. see services/response_cache.make_key)
+        run -> function receiving the job, returning its result (it may report progress with job.set_progress)
+        returns the job of the key
+        """
+        with self._lock:
+            self.__purge()
+            job = self._jobs_by_key.get(key)
+            if job is not None and job.status != Job.FAILED:
+                return job
+
+            job = Job(key)
+            self._jobs[job.id] = job
+            self._jobs_by_key[key] = job
+            self.__get_executor().submit(self.__run, job, run)
+            return job
+
+    def get(self, job_id):
+        """
+        returns the job, or None if unknown or expired
+        """
+        with self._lock:
+            self.__purge()
+            return self._jobs.get(job_id)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+    def __run(self, job, run):
+        job.status = Job.RUNNING
+        try:
+            job.result = run(job)
+            status = Job.DONE
+        except Exception as e:
+            job.error = str(e)
+            status = Job.FAILED
+            print(f"Job {job.id} failed: {e}")
+        job.finished_at = time.time() # Before the status, which makes the job finished
+        job.status = status
+
+    def __purge(self):
+        """
+        Removes the jobs finished more than ttl seconds ago.
+        """
+        now = time.time()
+        for job in [job for job in self._jobs.values() if job.is_finished() and now - job.finished_at > self.ttl]:
+            del self._jobs[job.id]
+            if self._jobs_by_key.get(job.key) is job:
+                del self._jobs_by_key[job.key]
+
+    def __get_executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="heatmap-job")
+        return self._executor
+
+
+# Shared by every request of the process
+job_manager = JobManager()
+atexit.register(job_manager.shutdown)
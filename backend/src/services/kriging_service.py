@@ -0,0 +1,364 @@
+import numpy as np
+import scipy.linalg
+from scipy.spatial import cKDTree
+from scipy.spatial.distance import cdist
+from pykrige.core import _adjust_for_anisotropy
+from pykrige.ok import OrdinaryKriging
+
+
+class KrigingLOO():
+    """
+    Leave one out scores of pykrige Krige parameter combinations over the ConvexLOOCV folds.
+
+    Gives the same scores as cross_val_score(Krige(**params), X, y, cv=ConvexLOOCV(),
+    scoring='neg_root_mean_squared_error'), without building an estimator per fold:
+    - The variogram of each fold is fitted on its training points, as Krige.fit does, once per
+      (fold, variogram_model, nlags, weight), so "ordinary" and "universal" combinations share it.
+    - "ordinary" kriging solves the small moving window system of the n_closest_points neighbors of
+      the left out point, as Krige.predict does.
+    - "universal" kriging (without drift terms) solves the system of all the training points, or the
+      moving window system of the `neighbors` nearest ones in local kriging.
+
+    When the variogram is fixed, i.e. "variogram_parameters" is given or refit_variogram is False,
+    every fold shares the kriging matrix of all the points. Universal kriging then gets every leave
+    one out residual from a single inverse through the closed form identity (Dubrule, 1983)
+        z_i - z_hat_(-i) = [A^-1 z]_i / [A^-1]_ii
+    With refit_variogram=False the variogram is fitted once on all the points instead of once per
+    fold, which is much faster but does not reproduce cross_val_score.
+    """
+
+    DEFAULT_PARAMS = {
+        "method": "ordinary",
+        "variogram_model": "linear",
+        "variogram_parameters": None,
+        "nlags": 6,
+        "weight": False,
+        "n_closest_points": 10,
+        "exact_values": True,
+        "verbose": False,
+    }
+
+    def __init__(self, X, y, test_indices, refit_variogram=True, neighbors=None):
+        """
+        X -> (n, 2) array of coordinates
+        y -> list of n values
+        test_indices -> indices of the points to leave out, one at a time (see ConvexLOOCV.test_indices)
+        refit_variogram -> whether each fold fits its own variogram (as cross_val_score does)
+        neighbors -> number of nearest points of the "universal" kriging systems (local kriging, see
+        KrigingWeights), or None to use every point
+        """
+        self.X = np.asarray(X, dtype=float)
+        self.y = np.asarray(y, dtype=float)
+        self.test_indices = list(test_indices)
+        self.refit_variogram = refit_variogram
+        self.neighbors = neighbors
+
+        self.dist = cdist(self.X, self.X, "euclidean")
+        self._models = {}
+        self._inverses = {}
+
+    @classmethod
+    def supports(cls, params):
+        """
+        params -> dict of Krige parameters
+        returns whether the parameters can be scored by this class (the remaining ones, e.g. drift
+        terms or anisotropy, are left to cross_val_score)
+        """
+        params = {**cls.DEFAULT_PARAMS, **params}
+        return (set(params) <= set(cls.DEFAULT_PARAMS)
+                and params["method"] in ("ordinary", "universal")
+                and params["variogram_model"] in OrdinaryKriging.variogram_dict)
+
+    def score(self, params, test_indices=None):
+        """
+        params -> dict of Krige parameters
+        test_indices -> subset of the test indices to leave out, all of them by default
+        returns the mean over the folds of the negative RMSE, i.e. minus the mean absolute leave one
+        out error. As in cross_val_score, the score is NaN when the kriging system of any fold is singular.
+        """
+        test_indices = self.test_indices if test_indices is None else list(test_indices)
+        if len(test_indices) == 0:
+            raise ValueError("Cross validation needs at least one point inside the convex hull")
+
+        residuals = self.residuals(params, test_indices)
+        if np.isnan(residuals).any():
+            return np.nan
+        return -np.mean(np.abs(residuals))
+
+    def residuals(self, params, test_indices=None):
+        """
+        params -> dict of Krige parameters
+        test_indices -> subset of the test indices to leave out, all of them by default
+        returns the array of leave one out residuals (true minus predicted value) of the test points
+        """
+        test_indices = self.test_indices if test_indices is None else list(test_indices)
+        params = {**self.DEFAULT_PARAMS, **params}
+        fixed_variogram = params["variogram_parameters"] is not None or not self.refit_variogram
+
+        if fixed_variogram and params["method"] == "universal" and not self.__local_universal():
+            return self.__closed_form_residuals(params, test_indices)
+
+        residuals = []
+        for i in test_indices:
+            fold = None if fixed_variogram else i
+            model, a, indices = self.__get_model(fold, params)
+            try:
+                prediction = self.__predict(model, a, indices, i, params)
+            except np.linalg.LinAlgError:
+                prediction = np.nan
+            residuals.append(self.y[i] - prediction)
+
+        return np.array(residuals)
+
+    def __get_model(self, fold, params):
+        """
+        fold -> index of the left out point, or None to fit on every point
+        returns the OrdinaryKriging model holding the fitted variogram, its kriging matrix and the
+        indices of its points
+        """
+        variogram_parameters = params["variogram_parameters"]
+        if isinstance(variogram_parameters, dict):
+            variogram_parameters = tuple(sorted(variogram_parameters.items()))
+        elif variogram_parameters is not None:
+            variogram_parameters = tuple(variogram_parameters)
+
+        key = (fold, params["variogram_model"], variogram_parameters, params["nlags"], params["weight"])
+        if key not in self._models:
+            indices = np.arange(len(self.y)) if fold is None else np.delete(np.arange(len(self.y)), fold)
+            model = OrdinaryKriging(self.X[indices, 0], self.X[indices, 1], self.y[indices],
+                                    variogram_model=params["variogram_model"],
+                                    variogram_parameters=params["variogram_parameters"],
+                                    nlags=params["nlags"],
+                                    weight=params["weight"])
+            self._models[key] = (model, model._get_kriging_matrix(len(indices)), indices)
+
+        return self._models[key]
+
+    def __predict(self, model, a_all, indices, i, params):
+        """
+        Kriging prediction at point i from the points `indices` (other than i), as Krige.predict computes it.
+        a_all -> kriging matrix of the points `indices`
+        """
+        n = len(indices)
+        positions = np.nonzero(indices != i)[0]
+
+        if params["method"] == "ordinary":
+            n_closest_points = params["n_closest_points"]
+            if len(positions) < n_closest_points:
+                raise np.linalg.LinAlgError("Not enough points for the moving window")
+            positions = self.__nearest(i, indices, positions, n_closest_points)
+        elif self.__local_universal():
+            positions = self.__nearest(i, indices, positions, self.neighbors)
+
+        selector = np.concatenate((positions, [n]))
+        a = a_all[selector[:, np.newaxis], selector]
+        b = self.__right_hand_side(model, self.dist[i, indices[positions]], params)
+
+        x = scipy.linalg.solve(a, b)
+        return x[:-1].dot(self.y[indices[positions]])
+
+    def __nearest(self, i, indices, positions, size):
+        order = np.argsort(self.dist[i, indices[positions]], kind='stable')
+        return positions[order[:size]]
+
+    def __local_universal(self):
+        """
+        Whether the "universal" kriging folds use a moving window (smaller than the n - 1 training points)
+        """
+        return self.neighbors is not None and self.neighbors < len(self.y) - 1
+
+    @staticmethod
+    def __right_hand_side(model, distances, params):
+        b = np.ones(len(distances) + 1)
+        b[:-1] = -model.variogram_function(model.variogram_model_parameters, distances)
+        if params["exact_values"]:
+            b[:-1][np.absolute(distances) <= model.eps] = 0.0
+        return b
+
+    def __closed_form_residuals(self, params, test_indices):
+        """
+        Leave one out residuals of universal kriging (without drift terms) with a fixed variogram,
+        from the inverse of the kriging matrix of every point.
+        """
+        model, a, _ = self.__get_model(None, params)
+        key = id(model)
+        if key not in self._inverses:
+            try:
+                a_inv = scipy.linalg.inv(a)
+            except np.linalg.LinAlgError:
+                a_inv = None
+            self._inverses[key] = a_inv
+
+        a_inv = self._inverses[key]
+        if a_inv is None:
+            return np.full(len(test_indices), np.nan)
+
+        weighted_values = a_inv.dot(np.append(self.y, 0.0))
+        return weighted_values[test_indices] / np.diag(a_inv)[test_indices]
+
+
+class KrigingWeights():
+    """
+    Kriging weights of a set of stations at a set of points.
+
+    Krige.predict gives each point a weighted sum of the station values, whose weights only depend on
+    the coordinates and the fitted variogram. Frames sharing the stations and the variogram therefore
+    share the weights, and their predictions are a single product with the (stations x frames) values.
+    - The distances between the stations, and between the points and the stations (or their
+      nearest stations, for local kriging), are computed once.
+    - The weights are computed once per (method, variogram_model, variogram_model_parameters,
+      window, exact_values).
+
+    "ordinary" kriging is local: each point only weighs its n_closest_points nearest stations (its
+    moving window). "universal" kriging solves the system of every station for every point, unless
+    `neighbors` is given, which makes it local as well. The nearest stations are found with a k-d tree,
+    and the points sharing the same window (the same set of nearest stations) share the inverse of
+    its system, so the cost grows linearly with the number of points and the weights are kept as a
+    (points x window) array.
+    """
+
+    CHUNK_SIZE = 4096 # Points whose window systems are solved at once
+
+    def __init__(self, X, points, neighbors=None):
+        """
+        X -> (n, 2) array with the coordinates of the stations
+        points -> (m, 2) array with the coordinates to predict
+        neighbors -> number of nearest stations of the "universal" kriging systems, or None to use every station
+        """
+        self.X = np.asarray(X, dtype=float)
+        self.points = np.asarray(points, dtype=float)
+        self.neighbors = neighbors
+
+        self._coordinates = None
+        self._data_distances = None
+        self._points_distances = None
+        self._neighbors = {}
+        self._weights = {}
+
+    @staticmethod
+    def supports(params, n):
+        """
+        params -> dict of Krige parameters
+        n -> number of stations
+        returns whether Krige.predict with these parameters is reproduced by the weights
+        """
+        params = {**KrigingLOO.DEFAULT_PARAMS, **params}
+        return KrigingLOO.supports(params) and (params["method"] == "universal" or params["n_closest_points"] <= n)
+
+    def predict(self, model, params, Z):
+        """
+        model -> OrdinaryKriging or UniversalKriging model fitted by Krige on the stations
+        params -> dict of Krige parameters of the model
+        Z -> (n, frames) array of station values kriged with the model variogram
+        returns the (m, frames) array of predictions
+        """
+        Z = np.asarray(Z, dtype=float)
+        indices, weights = self.__get_weights(model, params)
+        if indices is None:
+            return weights.dot(Z)
+        return np.einsum('mk,mkf->mf', weights, Z[indices])
+
+    def weights(self, model, params):
+        """
+        model -> OrdinaryKriging or UniversalKriging model fitted by Krige on the stations
+        params -> dict of Krige parameters of the model
+        returns the (m, n) array of kriging weights
+        """
+        indices, weights = self.__get_weights(model, params)
+        if indices is None:
+            return weights
+        dense_weights = np.zeros((len(self.points), len(self.X)))
+        np.put_along_axis(dense_weights, indices, weights, axis=1)
+        return dense_weights
+
+    def __window(self, params):
+        """
+        Number of nearest stations weighed by each point, or None for every station
+        """
+        if params["method"] == "ordinary":
+            return params["n_closest_points"]
+        if self.neighbors is not None and self.neighbors < len(self.X):
+            return self.neighbors
+        return None
+
+    def __get_weights(self, model, params):
+        """
+        returns the (m, window) arrays with the indices of the nearest stations of each point and their
+        weights, or None and the (m, n) array of weights of every station
+        """
+        params = {**KrigingLOO.DEFAULT_PARAMS, **params}
+        method = params["method"]
+        window = self.__window(params)
+        key = (method, model.variogram_model, tuple(model.variogram_model_parameters),
+               window, model.exact_values)
+
+        if key not in self._weights:
+            data_coordinates, points_coordinates = self.__adjusted_coordinates(model)
+            if self._data_distances is None:
+                self._data_distances = cdist(data_coordinates, data_coordinates, "euclidean")
+
+            n = len(self.X)
+            a = np.zeros((n + 1, n + 1))
+            a[:n, :n] = -model.variogram_function(model.variogram_model_parameters, self._data_distances)
+            np.fill_diagonal(a, 0.0)
+            a[n, :] = 1.0
+            a[:, n] = 1.0
+            a[n, n] = 0.0
+
+            if window is not None:
+                self._weights[key] = self.__moving_window_weights(model, a, window)
+            else:
+                if self._points_distances is None:
+                    self._points_distances = cdist(points_coordinates, data_coordinates, "euclidean")
+                b = self.__right_hand_sides(model, self._points_distances)
+                self._weights[key] = (None, scipy.linalg.lu_solve(scipy.linalg.lu_factor(a), b.T)[:n].T)
+
+        return self._weights[key]
+
+    def __adjusted_coordinates(self, model):
+        """
+        Coordinates of the stations and of the points after the anisotropy adjustment of the model,
+        as Krige.predict computes them. They only depend on the stations (see supports).
+        """
+        if self._coordinates is None:
+            data_coordinates = np.column_stack((model.X_ADJUSTED, model.Y_ADJUSTED))
+            # _adjust_for_anisotropy shifts its input in place
+            points_coordinates = _adjust_for_anisotropy(self.points.copy(), [model.XCENTER, model.YCENTER],
+                                                        [model.anisotropy_scaling], [model.anisotropy_angle])
+            self._coordinates = (data_coordinates, points_coordinates)
+        return self._coordinates
+
+    def __moving_window_weights(self, model, a_all, window):
+        """
+        Weights of the `window` nearest stations of every point, from the moving window systems.
+        The system of each distinct window is inverted once.
+        returns the (m, window) arrays of station indices and weights
+        """
+        if window not in self._neighbors:
+            data_coordinates, points_coordinates = self.__adjusted_coordinates(model)
+            distances, indices = cKDTree(data_coordinates).query(points_coordinates, k=window, eps=0.0)
+            distances, indices = distances.reshape(len(self.points), window), indices.reshape(len(self.points), window)
+            # Sorted indices identify the window of each point
+            order = np.argsort(indices, axis=1)
+            indices, distances = np.take_along_axis(indices, order, axis=1), np.take_along_axis(distances, order, axis=1)
+            windows, point_windows = np.unique(indices, axis=0, return_inverse=True)
+            self._neighbors[window] = (distances, indices, windows, point_windows.reshape(-1))
+        distances, indices, windows, point_windows = self._neighbors[window]
+
+        selectors = np.concatenate((windows, np.full((len(windows), 1), len(self.X))), axis=1)
+        a_inv = np.linalg.inv(a_all[selectors[:, :, np.newaxis], selectors[:, np.newaxis, :]])
+        b = self.__right_hand_sides(model, distances)
+
+        weights = np.empty(indices.shape)
+        for start in range(0, len(indices), self.CHUNK_SIZE):
+            chunk = slice(start, start + self.CHUNK_SIZE)
+            weights[chunk] = np.einsum('mij,mj->mi', a_inv[point_windows[chunk], :-1], b[chunk])
+        return indices, weights
+
+    @staticmethod
+    def __right_hand_sides(model, distances):
+        b = np.ones((len(distances), distances.shape[1] + 1))
+        b[:, :-1] = -model.variogram_function(model.variogram_model_parameters, distances)
+        if model.exact_values:
+            b[:, :-1][np.absolute(distances) <= model.eps] = 0.0
+        return b
@@ -0,0 +1,215 @@
+import os
+import json
+import glob
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from utils.config import RESPONSE_CACHE_MEMORY_BYTES, RESPONSE_CACHE_PATH, RESPONSE_CACHE_DISK_BYTES
+
+
+# Period of the responses depending on every measure of their indicators
+ALL_TIME = (datetime.min, datetime.max)
+
+# Interpolation methods whose params are grids of values to search, a single value standing for the list
+# holding only that value (KNN takes a fixed k instead, e.g. {"k": 5}, and fails on {"k": [5]})
+GRID_PARAMS_METHODS = ("Kriging", "IDW", "RBF")
+
+
+def canonicalize_payload(payload):
+    """
+    Normalize a payload so that equivalent requests get the same cache key: the keys are sorted
+    and, for the interpolators searching grids of params, the single parameter values are wrapped
+    in lists, as they treat a value and the list holding only that value the same way.
+    """
+    payload = dict(payload)
+    if isinstance(payload.get("interpolator"), dict):
+        interpolator = dict(payload["interpolator"])
+        if interpolator.get("method") in GRID_PARAMS_METHODS and isinstance(interpolator.get("params"), dict):
+            interpolator["params"] = {key: value if isinstance(value, list) else [value]
+                                      for key, value in interpolator["params"].items()}
+        payload["interpolator"] = interpolator
+    return json.dumps(payload, sort_keys=True, default=str)
+
+
+def make_key(endpoint, payload):
+    """
+    endpoint -> name of the cached endpoint (e.g. "heatmap")
+    payload -> request payload
+    returns the cache key of the response
+    """
+    return (endpoint, canonicalize_payload(payload))
+
+
+class ResponseCache():
+    """
+    LRU cache of the responses of the controllers, bounded by the size of the pickled responses.
+
+    The least recently used responses are evicted when the cached responses exceed max_memory_bytes.
+    When a path is given, evicted responses are spilled to files in it (up to max_disk_bytes, the
+    least recently used files being deleted first) and moved back to memory when requested again.
+    Spilled files do not outlive the process: the directory is emptied on creation.
+
+    Each response is stored with the indicators and the period of the measures it depends on, so new
+    measures only invalidate the affected responses (see invalidate). Hits and misses are counted for
+    monitoring (see stats).
+    """
+
+    def __init__(self, max_memory_bytes=RESPONSE_CACHE_MEMORY_BYTES, path=RESPONSE_CACHE_PATH,
+                 max_disk_bytes=RESPONSE_CACHE_DISK_BYTES):
+        """
+        max_memory_bytes -> maximum size of the pickled responses kept in memory
+        path -> directory of the spilled responses, or None to drop the evicted responses
+        max_disk_bytes -> maximum size of the spilled responses
+        """
+        self.max_memory_bytes = max_memory_bytes
+        self.path = path
+        self.max_disk_bytes = max_disk_bytes
+
+        self._memory = OrderedDict() # key --> (indicator_ids, first_datetime, end_datetime, data)
+        self._disk = OrderedDict() # key --> (indicator_ids, first_datetime, end_datetime, size)
+        self._memory_bytes = 0
+        self._disk_bytes = 0
+        self._counts = {"hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+        self._lock = threading.Lock()
+
+        if self.path is not None:
+            os.makedirs(self.path, exist_ok=True)
+            for file_path in glob.glob(os.path.join(self.path, "*.pkl")):
+                os.remove(file_path)
+
+    def get(self, key):
+        """
+        key -> cache key (see make_key)
+        returns the cached response, or None
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._counts["hits"] += 1
+                return pickle.loads(self._memory[key][3])
+
+            if key in self._disk:
+                indicator_ids, first_datetime, end_datetime, _ = self.__pop_disk(key)
+                try:
+                    with open(self.__file_path(key), "rb") as file:
+                        data = file.read()
+                except OSError:
+                    data = None
+                self.__remove_file(key)
+                if data is not None:
+                    self._counts["hits"] += 1
+                    self._counts["disk_hits"] += 1
+                    self.__store(key, (indicator_ids, first_datetime, end_datetime, data))
+                    return pickle.loads(data)
+
+            self._counts["misses"] += 1
+            return None
+
+    def set(self, key, response, indicator_ids, first_datetime, end_datetime):
+        """
+        key -> cache key (see make_key)
+        response -> picklable response
+        indicator_ids -> IDs of the indicators of the response
+        first_datetime, end_datetime -> period of the measures of the response (end excluded)
+        """
+        data = pickle.dumps(response, protocol=pickle.HIGHEST_PROTOCOL)
+        with self._lock:
+            if key in self._memory:
+                self._memory_bytes -= len(self._memory.pop(key)[3])
+            if key in self._disk:
+                self.__pop_disk(key)
+                self.__remove_file(key)
+            self.__store(key, (tuple(indicator_ids), first_datetime, end_datetime, data))
+
+    def invalidate(self, indicator_id, first_datetime, last_datetime):
+        """
+        Removes the responses of the indicator whose period contains measures between `first_datetime`
+        and `last_datetime` (inclusive).
+        """
+        def is_stale(entry):
+            indicator_ids, start, end, _ = entry
+            return indicator_id in indicator_ids and start <= last_datetime and first_datetime < end
+
+        with self._lock:
+            for key in [key for key, entry in self._memory.items() if is_stale(entry)]:
+                self._memory_bytes -= len(self._memory.pop(key)[3])
+                self._counts["invalidations"] += 1
+            for key in [key for key, entry in self._disk.items() if is_stale(entry)]:
+                self.__pop_disk(key)
+                self.__remove_file(key)
+                self._counts["invalidations"] += 1
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._disk):
+                self.__remove_file(key)
+            self._memory.clear()
+            self._disk.clear()
+            self._memory_bytes = self._disk_bytes = 0
+
+    def stats(self):
+        """
+        returns the hit and miss counts and the size of the cache
+        """
+        with self._lock:
+            requests = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "hit_rate": self._counts["hits"] / requests if requests else None,
+                "entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def __len__(self):
+        return len(self._memory) + len(self._disk)
+
+    def __store(self, key, entry):
+        """
+        Keeps the entry in memory, evicting (or spilling) the least recently used ones over the limit.
+        """
+        self._memory[key] = entry
+        self._memory_bytes += len(entry[3])
+        while self._memory_bytes > self.max_memory_bytes and self._memory:
+            evicted_key, evicted_entry = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted_entry[3])
+            self._counts["evictions"] += 1
+            self.__spill(evicted_key, evicted_entry)
+
+    def __spill(self, key, entry):
+        indicator_ids, first_datetime, end_datetime, data = entry
+        if self.path is None or len(data) > self.max_disk_bytes:
+            return
+        try:
+            with open(self.__file_path(key), "wb") as file:
+                file.write(data)
+        except OSError as e:
+            print(f"Could not spill a cached response to {self.path}: {e}")
+            return
+        self._disk[key] = (indicator_ids, first_datetime, end_datetime, len(data))
+        self._disk_bytes += len(data)
+        while self._disk_bytes > self.max_disk_bytes:
+            evicted_key = next(iter(self._disk))
+            self.__pop_disk(evicted_key)
+            self.__remove_file(evicted_key)
+
+    def __pop_disk(self, key):
+        entry = self._disk.pop(key)
+        self._disk_bytes -= entry[3]
+        return entry
+
+    def __file_path(self, key):
+        return os.path.join(self.path, hashlib.sha1(repr(key).encode()).hexdigest() + ".pkl")
+
+    def __remove_file(self, key):
+        try:
+            os.remove(self.__file_path(key))
+        except OSError:
+            pass
+
+
+# Shared by every request of the process
+response_cache = ResponseCache()
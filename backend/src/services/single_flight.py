@@ -0,0 +1,64 @@
+import threading
+
+
+class _Call():
+    """
+    Computation in flight, and its outcome once done.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight():
+    """
+    Coalesces concurrent computations of the same key: the first caller (the leader) runs the
+    computation and the callers arriving while it runs wait for it and share its result, or its
+    exception. Once it is done, the next caller starts a new computation, so results meant to be
+    reused afterwards must be cached by the computation itself (see HeatMapController.get_heatmap_frames).
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        key -> hashable key of the computation
+        fn -> function without arguments running the computation
+        returns the result of fn, computed once for the concurrent callers with the same key
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    def in_flight(self):
+        """
+        returns the number of computations running
+        """
+        with self._lock:
+            return len(self._calls)
+
+
+# Shared by every request of the process
+single_flight = SingleFlight()
@@ -0,0 +1,332 @@
+import os
+import json
+import math
+import zlib
+import struct
+import shutil
+import hashlib
+import tempfile
+import threading
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from metadata.meta_data import INDICATORS, QUALITY_COLORS, GREEN, YELLOW, PINK, RED, PURPLE
+from services.response_cache import make_key
+from utils.config import TILE_CACHE_PATH, TILE_CACHE_SIZE, TILE_GRID_CACHE_SIZE
+
+
+TILE_SIZE = 256 # Pixels
+OPACITY = 102 # Alpha of the colored pixels, as the 0.4 fill opacity of the frontend rectangles
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def hash_payload(payload: dict) -> str:
+    """
+    Hash of the response cache key of a heatmap payload (see services/response_cache.make_key), so the
+    equivalent payloads share their tiles.
+    """
+    return hashlib.sha1(repr(make_key("heatmap", payload)).encode()).hexdigest()
+
+
+def encode_png(rgba: np.ndarray) -> bytes:
+    """
+    rgba -> (height, width, 4) uint8 array
+    returns the bytes of the RGBA PNG image
+    """
+    height, width, _ = rgba.shape
+    # Each scanline starts with its filter type (0, none)
+    scanlines = np.column_stack((np.zeros(height, dtype=np.uint8), rgba.reshape(height, width * 4)))
+
+    def chunk(chunk_type, data):
+        return (struct.pack(">I", len(data)) + chunk_type + data
+                + struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    return (PNG_SIGNATURE
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(scanlines.tobytes(), 6))
+            + chunk(b"IEND", b""))
+
+
+def tile_coordinates(z: int, x: int, y: int, size: int = TILE_SIZE) -> tuple:
+    """
+    Coordinates of the pixel centers of the Web Mercator tile (z, x, y).
+
+    Returns:
+        tuple: The latitude of each pixel row (north to south) and the longitude of each pixel column.
+    """
+    n = 2 ** z * size
+    pixels = np.arange(size) + 0.5
+    long = (x * size + pixels) / n * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(math.pi * (1 - 2 * (y * size + pixels) / n))))
+    return lat, long
+
+
+def render_tile(grid, values: np.ndarray, quality_colors: tuple, z: int, x: int, y: int) -> bytes:
+    """
+    Render the values of a heatmap in a PNG tile. Each pixel gets the color of its closest grid cell,
+    and is transparent outside the grid and in the cells without a value.
+
+    Args:
+        grid (RectangularDiscretization): The grid of the heatmap.
+        values (np.ndarray): The value of each cell of the grid, NaN for the cells without a value.
+        quality_colors (tuple): The quality intervals and the (r, g, b) quality colors (see QUALITY_COLORS).
+        z, x, y (int): The tile.
+
+    Returns:
+        bytes: The PNG tile.
+    """
+    lat, long = tile_coordinates(z, x, y)
+    borders = grid.borders_coordinates
+    rows = np.rint((lat - borders["min_lat"]) / (borders["max_lat"] - borders["min_lat"]) * (grid.shape[0] - 1)).astype(int)
+    columns = np.rint((long - borders["min_long"]) / (borders["max_long"] - borders["min_long"]) * (grid.shape[1] - 1)).astype(int)
+    inside = (((rows >= 0) & (rows < grid.shape[0]))[:, np.newaxis]
+              & ((columns >= 0) & (columns < grid.shape[1]))[np.newaxis, :])
+
+    pixel_values = np.reshape(values, grid.shape)[np.clip(rows, 0, grid.shape[0] - 1)][:, np.clip(columns, 0, grid.shape[1] - 1)]
+    colored = inside & ~np.isnan(pixel_values)
+
+    quality_intervals, colors = quality_colors
+    color_indices = np.searchsorted(quality_intervals, pixel_values[colored], side="left")
+    rgba = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype=np.uint8)
+    rgba[colored, :3] = np.asarray(colors, dtype=np.uint8)[np.minimum(color_indices, len(colors) - 1)]
+    rgba[colored, 3] = OPACITY
+    return encode_png(rgba)
+
+
+def get_quality_colors(indicator: str, values: np.ndarray) -> tuple:
+    """
+    Quality intervals and colors of the indicator (see QUALITY_COLORS). The indicators without quality
+    intervals split the range of the values evenly.
+    """
+    if indicator in QUALITY_COLORS:
+        return QUALITY_COLORS[indicator]
+    colors = [GREEN, YELLOW, PINK, RED, PURPLE]
+    known = values[~np.isnan(values)]
+    if len(known) == 0:
+        return [], colors[:1]
+    return list(np.linspace(known.min(), known.max(), len(colors) + 1)[1:-1]), colors
+
+
+class TileCache():
+    """
+    On disk LRU cache of the PNG tiles of the heatmaps, keyed by (payload hash, frame, z, x, y).
+
+    The tiles of a payload are kept in a directory named by its hash, with a "range.json" file holding
+    the indicator and the period of the payload (see invalidate). The recency of the tiles is their
+    modification time, so the cache survives restarts.
+    """
+
+    RANGE_FILE = "range.json"
+
+    def __init__(self, path=TILE_CACHE_PATH, max_size=TILE_CACHE_SIZE):
+        """
+        path -> directory of the tiles
+        max_size -> maximum number of tiles, the least recently used ones being deleted first
+        """
+        self.path = path
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._ranges = {}
+        self._lock = threading.Lock()
+        self.__load()
+
+    def get(self, key):
+        """
+        key -> (payload hash, frame, z, x, y)
+        returns the PNG tile, or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            tile_path = self.__tile_path(key)
+            try:
+                with open(tile_path, "rb") as file:
+                    tile = file.read()
+                os.utime(tile_path)
+            except OSError:
+                del self._entries[key]
+                return None
+            return tile
+
+    def set(self, key, tile, indicator_id, first_datetime, end_datetime):
+        """
+        key -> (payload hash, frame, z, x, y)
+        tile -> PNG tile
+        indicator_id, first_datetime, end_datetime -> indicator and period of the payload
+        """
+        with self._lock:
+            payload_hash = key[0]
+            if payload_hash not in self._ranges:
+                self._ranges[payload_hash] = (indicator_id, first_datetime, end_datetime)
+                self.__write(os.path.join(self.path, payload_hash, self.RANGE_FILE),
+                             json.dumps([indicator_id, first_datetime.isoformat(), end_datetime.isoformat()]).encode())
+            self.__write(self.__tile_path(key), tile)
+            self._entries[key] = True
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                evicted, _ = self._entries.popitem(last=False)
+                self.__remove(self.__tile_path(evicted))
+
+    def invalidate(self, indicator_id, first_datetime, last_datetime):
+        """
+        Deletes the tiles of the payloads of the indicator whose period contains measures between
+        `first_datetime` and `last_datetime` (inclusive).
+        """
+        with self._lock:
+            stale_hashes = [payload_hash for payload_hash, (payload_indicator_id, start, end) in self._ranges.items()
+                            if payload_indicator_id == indicator_id and start <= last_datetime and first_datetime < end]
+            for payload_hash in stale_hashes:
+                del self._ranges[payload_hash]
+                shutil.rmtree(os.path.join(self.path, payload_hash), ignore_errors=True)
+            stale_hashes = set(stale_hashes)
+            for key in [key for key in self._entries if key[0] in stale_hashes]:
+                del self._entries[key]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __tile_path(self, key):
+        payload_hash, frame, z, x, y = key
+        return os.path.join(self.path, payload_hash, str(frame), str(z), str(x), f"{y}.png")
+
+    @staticmethod
+    def __write(file_path, data):
+        """
+        Writes to a temporary file replacing the file, so readers never see a partial file.
+        """
+        directory = os.path.dirname(file_path)
+        os.makedirs(directory, exist_ok=True)
+        with tempfile.NamedTemporaryFile(mode="wb", dir=directory, delete=False) as file:
+            file.write(data)
+        os.replace(file.name, file_path)
+
+    @staticmethod
+    def __remove(file_path):
+        try:
+            os.remove(file_path)
+        except OSError:
+            pass
+
+    def __load(self):
+        """
+        Indexes the tiles already on disk, from the least to the most recently used.
+        """
+        if not os.path.isdir(self.path):
+            return
+        tiles = []
+        for payload_hash in os.listdir(self.path):
+            try:
+                with open(os.path.join(self.path, payload_hash, self.RANGE_FILE)) as file:
+                    indicator_id, start, end = json.load(file)
+            except (OSError, ValueError):
+                continue
+            self._ranges[payload_hash] = (indicator_id, datetime.fromisoformat(start), datetime.fromisoformat(end))
+
+            for directory, _, file_names in os.walk(os.path.join(self.path, payload_hash)):
+                parts = os.path.relpath(directory, os.path.join(self.path, payload_hash)).split(os.sep)
+                for file_name in file_names:
+                    if len(parts) != 3 or not file_name.endswith(".png"):
+                        continue
+                    frame, z, x = parts
+                    key = (payload_hash, frame, int(z), int(x), int(file_name[:-len(".png")]))
+                    tiles.append((os.path.getmtime(os.path.join(directory, file_name)), key))
+
+        for _, key in sorted(tiles):
+            self._entries[key] = True
+        while len(self._entries) > self.max_size:
+            evicted, _ = self._entries.popitem(last=False)
+            self.__remove(self.__tile_path(evicted))
+
+
+class TileService():
+    """
+    Renders the PNG tiles of the heatmaps. Tiles are served from the TileCache, and the tiles of a
+    payload missing from it are rendered from the interpolated grid of the payload, which is computed
+    by the HeatMapController once and kept in memory for the next tiles.
+    """
+
+    def __init__(self, tile_cache=None, grid_cache_size=TILE_GRID_CACHE_SIZE):
+        """
+        tile_cache -> TileCache of the rendered tiles, or None for a TileCache in TILE_CACHE_PATH, created
+        on first use (it indexes the tiles already on disk)
+        grid_cache_size -> number of payloads whose interpolated grids are kept in memory
+        """
+        self._tile_cache = tile_cache
+        self.grid_cache_size = grid_cache_size
+        self._grids = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def tile_cache(self):
+        with self._lock:
+            if self._tile_cache is None:
+                self._tile_cache = TileCache()
+            return self._tile_cache
+
+    def get_tile(self, payload: dict, frame: str, z: int, x: int, y: int, heatmap_controller) -> bytes:
+        """
+        Args:
+            payload (dict): The heatmap payload (see HeatMapController.get_heatmap_frames).
+            frame (str): The key of the heatmap of the payload to render.
+            z, x, y (int): The tile.
+            heatmap_controller: The HeatMapController computing the heatmaps on a cache miss.
+
+        Returns:
+            bytes: The PNG tile, or None if the payload has no heatmap with the key frame.
+        """
+        payload_hash = hash_payload(payload)
+        key = (payload_hash, str(frame), z, x, y)
+        tile = self.tile_cache.get(key)
+        if tile is not None:
+            return tile
+
+        grid, values = self.__get_grids(payload_hash, payload, heatmap_controller)
+        if str(frame) not in values:
+            return None
+        frame_values = values[str(frame)]
+
+        tile = render_tile(grid, frame_values, get_quality_colors(payload["indicator"], frame_values), z, x, y)
+        self.tile_cache.set(key, tile, INDICATORS[payload["indicator"]], *heatmap_controller.get_time_range(payload))
+        return tile
+
+    def invalidate(self, indicator_id, first_datetime, last_datetime):
+        """
+        Drops the tiles and the grids of the payloads of the indicator whose period contains measures
+        between `first_datetime` and `last_datetime` (inclusive).
+        """
+        self.tile_cache.invalidate(indicator_id, first_datetime, last_datetime)
+        with self._lock:
+            for payload_hash in [payload_hash for payload_hash, (payload_indicator_id, start, end, _) in self._grids.items()
+                                 if payload_indicator_id == indicator_id and start <= last_datetime and first_datetime < end]:
+                del self._grids[payload_hash]
+
+    def __get_grids(self, payload_hash, payload, heatmap_controller):
+        """
+        returns the grid of the payload and the values of each of its heatmaps over the whole grid
+        """
+        with self._lock:
+            if payload_hash in self._grids:
+                self._grids.move_to_end(payload_hash)
+                return self._grids[payload_hash][3]
+
+        frames = heatmap_controller.get_heatmap_frames(payload=payload)
+        grid = heatmap_controller.get_grid()
+        values = {}
+        for key, frame in frames.items():
+            values[key] = np.full(len(grid), np.nan)
+            if frame is not None:
+                area_discretization, frame_values = frame
+                values[key][area_discretization.indices] = frame_values
+
+        with self._lock:
+            self._grids[payload_hash] = (INDICATORS[payload["indicator"]], *heatmap_controller.get_time_range(payload),
+                                         (grid, values))
+            while len(self._grids) > self.grid_cache_size:
+                self._grids.popitem(last=False)
+        return grid, values
+
+
+# Shared by every request of the process
+tile_service = TileService()
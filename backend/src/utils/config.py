@@ -0,0 +1,58 @@
+import os
+import tempfile
+
+
+def get_bool_env(name, default):
+    return os.environ.get(name, str(default)).lower() in ("1", "true", "yes")
+
+
+# Partition the 'measure_indicator' table by RANGE of YEAR(datetime), one partition per year.
+# Partitioned InnoDB tables do not support foreign keys, so the table is created without them.
+PARTITION_MEASURE_INDICATOR = get_bool_env("PARTITION_MEASURE_INDICATOR", False)
+PARTITION_FIRST_YEAR = int(os.environ.get("PARTITION_FIRST_YEAR", 2000))
+PARTITION_LAST_YEAR = int(os.environ.get("PARTITION_LAST_YEAR", 2030))
+
+# Connection pool of the SQLAlchemy engine shared by the requests (see database/session.py).
+# Up to DB_POOL_SIZE + DB_MAX_OVERFLOW requests hold a connection at the same time.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 10))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 20))
+DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 3600))
+DB_POOL_PRE_PING = get_bool_env("DB_POOL_PRE_PING", True)
+
+# Hyperparameters selected by the heatmap interpolators, reused by later requests for the same frames
+# (see services/hyperparameter_cache.py). Entries are also saved to HYPERPARAMETER_CACHE_PATH when set.
+HYPERPARAMETER_CACHE_SIZE = int(os.environ.get("HYPERPARAMETER_CACHE_SIZE", 4096))
+HYPERPARAMETER_CACHE_PATH = os.environ.get("HYPERPARAMETER_CACHE_PATH") or None
+
+# Pool running the interpolation work (frames, parameter candidates) of the heatmap requests
+# (see services/execution_service.py): "thread" or "process" workers, created once per process.
+# Work smaller than INTERPOLATION_INLINE_THRESHOLD (units x known points) runs inline.
+INTERPOLATION_POOL_KIND = os.environ.get("INTERPOLATION_POOL_KIND", "thread")
+INTERPOLATION_POOL_SIZE = int(os.environ.get("INTERPOLATION_POOL_SIZE", os.cpu_count() or 1))
+INTERPOLATION_INLINE_THRESHOLD = int(os.environ.get("INTERPOLATION_INLINE_THRESHOLD", 100))
+
+# Heatmap grid: number of rows (latitude divisions) of the rectangular grid covering the city.
+# KRIGING_NEIGHBORS makes universal kriging local: each cell only solves the system of its nearest
+# stations (ordinary kriging already does, with its n_closest_points), which keeps fine grids and
+# many stations tractable. Unset, universal kriging solves the system of every station.
+HEATMAP_GRID_LAT_POINTS = int(os.environ.get("HEATMAP_GRID_LAT_POINTS", 60))
+KRIGING_NEIGHBORS = int(os.environ["KRIGING_NEIGHBORS"]) if os.environ.get("KRIGING_NEIGHBORS") else None
+
+# PNG tiles of the heatmaps (see services/tile_service.py): up to TILE_CACHE_SIZE tiles are kept in
+# TILE_CACHE_PATH, and the interpolated grids of the last TILE_GRID_CACHE_SIZE requests in memory.
+TILE_CACHE_PATH = os.environ.get("TILE_CACHE_PATH") or os.path.join(tempfile.gettempdir(), "heatmap_tiles")
+TILE_CACHE_SIZE = int(os.environ.get("TILE_CACHE_SIZE", 20000))
+TILE_GRID_CACHE_SIZE = int(os.environ.get("TILE_GRID_CACHE_SIZE", 16))
+
+# Responses of /heatmap and /linegraph, reused by identical requests until new measures of their
+# indicators and period are inserted (see services/response_cache.py). Responses evicted from memory
+# are spilled to RESPONSE_CACHE_PATH when set.
+RESPONSE_CACHE_MEMORY_BYTES = int(os.environ.get("RESPONSE_CACHE_MEMORY_BYTES", 256 * 1024 * 1024))
+RESPONSE_CACHE_PATH = os.environ.get("RESPONSE_CACHE_PATH") or None
+RESPONSE_CACHE_DISK_BYTES = int(os.environ.get("RESPONSE_CACHE_DISK_BYTES", 2 * 1024 * 1024 * 1024))
+
+# Asynchronous heatmap jobs (see services/job_service.py): HEATMAP_JOB_WORKERS jobs are computed at
+# the same time, and the finished jobs are kept for HEATMAP_JOB_TTL seconds.
+HEATMAP_JOB_WORKERS = int(os.environ.get("HEATMAP_JOB_WORKERS", 2))
+HEATMAP_JOB_TTL = int(os.environ.get("HEATMAP_JOB_TTL", 3600))
@@ -1,6 +1,6 @@
 import pandas as pd
 import requests
-from datetime import datetime
+from datetime import datetime, timedelta
 from utils.credentials import LOGIN_QUALAR, PASSWORD_QUALAR
 
 def get_session_id():
@@ -158,3 +158,37 @@ def generate_date_range_df(maximum_date):
     df_hourly['datetime'] = pd.to_datetime(df_hourly['datetime'])
     df_hourly.sort_values(by="datetime", ascending=True, inplace=True)
     return df_hourly
+
+
+def get_time_reference_range(time_reference):
+    """
+    Converts a time reference string into the half-open datetime range [start, end) it represents.
+
+    Parameters:
+        time_reference (str): A string representing the time reference (e.g., "2024", "2024-11", 
+                              "2024-11-19", "2024-11-19 14").
+
+    Returns:
+        tuple: A tuple containing two datetimes:
+            - start (datetime): The first instant of the time reference.
+            - end (datetime): The first instant after the time reference.
+    """
+    datetime_list = time_reference.split(" ")
+    date_list = [int(value) for value in datetime_list[0].split("-")]
+
+    year = date_list[0]
+    month = date_list[1] if len(date_list) > 1 else 1
+    day = date_list[2] if len(date_list) > 2 else 1
+    hour = int(datetime_list[1].split(":")[0]) if len(datetime_list) > 1 else 0
+
+    start = datetime(year, month, day, hour)
+    if len(datetime_list) > 1:
+        end = start + timedelta(hours=1)
+    elif len(date_list) > 2:
+        end = start + timedelta(days=1)
+    elif len(date_list) > 1:
+        end = datetime(year + month // 12, month % 12 + 1, 1)
+    else:
+        end = datetime(year + 1, 1, 1)
+    return start, end
+
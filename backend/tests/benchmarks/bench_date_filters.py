@@ -0,0 +1,117 @@
+"""
+Compares the query plans and timings of the queries of MeasureIndicatorRepository with the
+`extract(...) == value` queries on `measure_indicator` they replaced.
+
+The heatmap queries still read `measure_indicator`, so they compare two filters of the same query:
+the `extract(...) == value` predicates and the half-open datetime ranges. The line graph queries now
+read the rollup tables (`measure_indicator_daily` and `measure_indicator_climatology`), so they compare
+the legacy query on the raw table with the read of the precomputed buckets.
+
+Run it inside the backend container, against a populated database:
+
+    python tests/benchmarks/bench_date_filters.py
+"""
+import sys
+import os
+import time
+from sqlalchemy import create_engine, text, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from utils.credentials import LOGIN_MYSQL, PASSWORD_MYSQL
+from metadata.meta_data import INDICATORS
+from repositories import MeasureIndicatorRepository
+
+
+DATABASE_URI = f'mysql+pymysql://{LOGIN_MYSQL}:{PASSWORD_MYSQL}@db/poluicao'
+INDICATOR_ID = INDICATORS["MP2.5"]
+
+# Name --> query as written before the change
+LEGACY_QUERIES = {
+    "heatmap instant": f"""
+        SELECT idStation, AVG(value) FROM measure_indicator
+        WHERE idIndicator = {INDICATOR_ID} AND EXTRACT(year FROM datetime) = 2023 AND EXTRACT(month FROM datetime) = 3
+        AND EXTRACT(day FROM datetime) = 1 AND EXTRACT(hour FROM datetime) = 12
+        GROUP BY idStation
+    """,
+    "heatmap hourly": f"""
+        SELECT EXTRACT(hour FROM datetime), idStation, AVG(value) FROM measure_indicator
+        WHERE idIndicator = {INDICATOR_ID} AND EXTRACT(year FROM datetime) = 2023 AND EXTRACT(month FROM datetime) = 3
+        AND EXTRACT(day FROM datetime) = 1
+        GROUP BY EXTRACT(hour FROM datetime), idStation
+    """,
+    "linegraph daily": f"""
+        SELECT EXTRACT(day FROM datetime), AVG(value) FROM measure_indicator
+        WHERE EXTRACT(year FROM datetime) = 2008 AND EXTRACT(month FROM datetime) = 12 AND idIndicator = {INDICATOR_ID}
+        GROUP BY EXTRACT(day FROM datetime)
+    """,
+    "linegraph hourly": f"""
+        SELECT EXTRACT(hour FROM datetime) AS hour, AVG(value) FROM measure_indicator
+        WHERE EXTRACT(month FROM datetime) = 12 AND idIndicator = {INDICATOR_ID}
+        GROUP BY hour ORDER BY hour
+    """,
+}
+
+# Name --> (what the current query reads, call issuing the current query)
+CURRENT_QUERIES = {
+    "heatmap instant": ("datetime range on measure_indicator",
+                        lambda repository: repository.get_mean_measure_indicators(indicator_id=INDICATOR_ID,
+                                                                                  time_reference_str="2023-03-01 12")),
+    "heatmap hourly": ("datetime range on measure_indicator",
+                       lambda repository: repository.get_mean_measure_indicators_per_period(indicator_id=INDICATOR_ID,
+                                                                                            period="hour",
+                                                                                            time_reference_str="2023-03-01")),
+    "linegraph daily": ("measure_indicator_daily rollup",
+                        lambda repository: repository.get_measure_indicator_by_day(year=2008, month=12,
+                                                                                   indicator_ids=[INDICATOR_ID])),
+    "linegraph hourly": ("measure_indicator_climatology",
+                         lambda repository: repository.get_measure_indicator_by_hour(month=12,
+                                                                                     indicator_ids=[INDICATOR_ID])),
+}
+
+
+def print_plan(rows):
+    for row in rows:
+        print(f"    table={row['table']} type={row['type']} key={row['key']} rows={row['rows']} extra={row['Extra']}")
+
+
+def elapsed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def main():
+    engine = create_engine(DATABASE_URI)
+    session = sessionmaker(bind=engine)()
+    repository = MeasureIndicatorRepository(session)
+
+    captured = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    with engine.connect() as connection:
+        for name, legacy_query in LEGACY_QUERIES.items():
+            print(f"### {name}")
+
+            print("legacy (extract on measure_indicator):")
+            print_plan(connection.execute(text("EXPLAIN " + legacy_query)).mappings().all())
+            print(f"    elapsed={elapsed(lambda: connection.execute(text(legacy_query)).all()):.3f}s")
+
+            label, current_query = CURRENT_QUERIES[name]
+            captured.clear()
+            current_elapsed = elapsed(lambda: current_query(repository))
+            statement, parameters = captured[-1]
+
+            print(f"current ({label}):")
+            print_plan(connection.exec_driver_sql("EXPLAIN " + statement, parameters).mappings().all())
+            print(f"    elapsed={current_elapsed:.3f}s")
+            print()
+
+    session.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import sys
+import os
+import math
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.discretization_service import get_rectangular_discretization, get_utm_transformer
+from services.interpolation_service import Scaler
+from controllers.heatmap_controller import HeatMapController, _get_covered_discretization, _get_station_cells
+from metadata.meta_data import STATIONS_ID, RADIUS
+
+
+BORDERS = HeatMapController.BORDERS_COORDINATES
+
+
+def build_grid_points(number_of_lat_points):
+    """
+    The list of (lat, long) points of the grid, built point by point as the controller used to
+    """
+    lat_range = np.linspace(BORDERS['min_lat'], BORDERS['max_lat'], number_of_lat_points)
+    aspect_ratio = (BORDERS['max_lat'] - BORDERS['min_lat']) / (BORDERS['max_long'] - BORDERS['min_long'])
+    long_range = np.linspace(BORDERS['min_long'], BORDERS['max_long'], int(number_of_lat_points / aspect_ratio))
+    return [(lat, long) for lat in lat_range for long in long_range]
+
+
+def haversine_dist(lat1, lon1, lat2, lon2):
+    """
+    Haversine distance of a pair of points, as the controller used to compute it
+    """
+    lat1_rad, lon1_rad, lat2_rad, lon2_rad = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2_rad - lat1_rad) / 2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin((lon2_rad - lon1_rad) / 2)**2
+    return 6371.0 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def covered_points(points, indicator, station_ids):
+    """
+    The points closer than the radius of one of the stations, checked point by point and station by station
+    """
+    return [point for point in points
+            if any(haversine_dist(*point, *STATIONS_ID[station_id]) < RADIUS[indicator][station_id]
+                   for station_id in station_ids)]
+
+
+def closest_point(points, coordinates):
+    """
+    Index of the closest point to the coordinates, found by a linear scan as the controller used to
+    """
+    min_dist, min_dist_index = float("inf"), None
+    for i, point in enumerate(points):
+        dist = math.sqrt((point[0] - coordinates[0]) ** 2 + (point[1] - coordinates[1]) ** 2)
+        if dist < min_dist:
+            min_dist, min_dist_index = dist, i
+    return min_dist_index
+
+
+class TestRectangularDiscretization:
+    def test_grid_is_built_once(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        assert get_rectangular_discretization(number_of_lat_points=20, **BORDERS) is grid
+        assert get_rectangular_discretization(number_of_lat_points=21, **BORDERS) is not grid
+        assert HeatMapController(session=None).get_grid() is HeatMapController(session=None).get_grid()
+
+    def test_grid_matches_point_by_point_grid(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        points = build_grid_points(20)
+        assert list(grid) == points
+        assert grid.shape[0] * grid.shape[1] == len(points)
+
+        transformer = get_utm_transformer()
+        for i in [0, 17, len(points) - 1]:
+            assert np.allclose(grid.utm[i], transformer.transform(points[i][1], points[i][0]))
+
+    def test_scaled_coordinates_are_memoized(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        scaler = Scaler()
+        scaler.fit_transform(grid.utm[::7])
+
+        scaled = grid.scaled(scaler)
+        assert grid.scaled(scaler) is scaled
+        assert np.array_equal(scaled, scaler.transform(grid.utm))
+
+
+class TestCoverage:
+    def test_coverage_mask_matches_haversine_loop(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        station_ids = sorted(STATIONS_ID)[:12]
+        mask = grid.coverage_mask([STATIONS_ID[station_id] for station_id in station_ids],
+                                  [RADIUS["MP10"][station_id] for station_id in station_ids])
+
+        assert 0 < mask.sum() < len(grid)
+        assert [point for point, covered in zip(grid, mask) if covered] == covered_points(grid, "MP10", station_ids)
+
+    def test_covered_discretization(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        station_ids = frozenset(sorted(STATIONS_ID)[::3])
+        covered = _get_covered_discretization(grid, "O3", station_ids)
+
+        assert _get_covered_discretization(grid, "O3", station_ids) is covered # Memoized
+        assert list(covered) == covered_points(grid, "O3", station_ids)
+        # The subset keeps the projection and the position of its points in the grid
+        assert np.array_equal(covered.utm, grid.utm[covered.indices])
+        assert list(covered) == [grid[i] for i in covered.indices]
+
+
+class TestStationCells:
+    def test_closest_points_match_linear_scan(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        covered = _get_covered_discretization(grid, "MP10", frozenset(sorted(STATIONS_ID)[:12]))
+        coordinates = list(STATIONS_ID.values())
+
+        points = list(covered)
+        assert covered.closest_points(coordinates).tolist() == [closest_point(points, c) for c in coordinates]
+
+    def test_station_cells(self):
+        grid = get_rectangular_discretization(number_of_lat_points=20, **BORDERS)
+        covered = _get_covered_discretization(grid, "CO", frozenset(sorted(STATIONS_ID)[1::2]))
+        station_cells = _get_station_cells(covered)
+
+        assert _get_station_cells(covered) is station_cells # Memoized
+        assert set(station_cells) == set(STATIONS_ID)
+        points = list(covered)
+        assert all(station_cells[station_id] == closest_point(points, coordinates)
+                   for station_id, coordinates in STATIONS_ID.items())
+
+
+if __name__ == "__main__":
+    TestRectangularDiscretization().test_grid_is_built_once()
+    TestRectangularDiscretization().test_grid_matches_point_by_point_grid()
+    TestRectangularDiscretization().test_scaled_coordinates_are_memoized()
+    TestCoverage().test_coverage_mask_matches_haversine_loop()
+    TestCoverage().test_covered_discretization()
+    TestStationCells().test_closest_points_match_linear_scan()
+    TestStationCells().test_station_cells()
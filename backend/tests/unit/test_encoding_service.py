@@ -0,0 +1,74 @@
+import sys
+import os
+import json
+import base64
+import struct
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.discretization_service import RectangularDiscretization
+from services.encoding_service import encode_compact, encode_binary, UINT16_NODATA
+
+
+def sample_frames():
+    grid = RectangularDiscretization(min_lat=-24.0, max_lat=-23.4, min_long=-46.8, max_long=-46.4, number_of_lat_points=12)
+    rng = np.random.default_rng(0)
+    first, second = np.arange(len(grid)) % 3 == 0, np.arange(len(grid)) % 5 == 0
+    frames = {
+        "1": (grid.subset(first), rng.uniform(0, 80, np.count_nonzero(first))),
+        "2": (grid.subset(second), rng.uniform(0, 80, np.count_nonzero(second))),
+        "3": None,
+    }
+    return grid, frames
+
+
+def decode_grid(header, values):
+    """
+    Values of every cell of the grid (NaN outside the mask and for missing values)
+    """
+    mask = np.unpackbits(np.frombuffer(base64.b64decode(header["grid"]["mask"]), dtype=np.uint8))
+    mask = mask[:np.prod(header["grid"]["shape"])].astype(bool)
+    grid_values = np.full(len(mask), np.nan)
+    grid_values[mask] = values
+    return grid_values
+
+
+def expected_grid_values(grid, frame):
+    grid_values = np.full(len(grid), np.nan)
+    if frame is not None:
+        grid_values[frame[0].indices] = frame[1]
+    return grid_values
+
+
+class TestEncoding:
+    def test_compact_float32(self):
+        grid, frames = sample_frames()
+        header = json.loads(json.dumps(encode_compact(grid, frames)))
+
+        assert header["grid"]["shape"] == list(grid.shape)
+        assert [frame["key"] for frame in header["frames"]] == ["1", "2", "3"]
+        for frame_header in header["frames"]:
+            values = np.frombuffer(base64.b64decode(frame_header["values"]), dtype="<f4")
+            assert np.allclose(decode_grid(header, values), expected_grid_values(grid, frames[frame_header["key"]]),
+                               rtol=1e-6, equal_nan=True)
+
+    def test_binary_uint16(self):
+        grid, frames = sample_frames()
+        body = encode_binary(grid, frames, dtype="uint16")
+
+        header_length = struct.unpack("<I", body[:4])[0]
+        header = json.loads(body[4:4 + header_length])
+        offset = 4 + header_length + (-(4 + header_length) % 4)
+        for frame_header in header["frames"]:
+            quantized = np.frombuffer(body, dtype="<u2", count=header["grid"]["cells"], offset=offset)
+            offset += quantized.nbytes + (-quantized.nbytes % 4)
+            values = np.where(quantized == UINT16_NODATA, np.nan, frame_header["offset"] + frame_header["scale"] * quantized)
+
+            expected = expected_grid_values(grid, frames[frame_header["key"]])
+            assert np.array_equal(np.isnan(decode_grid(header, values)), np.isnan(expected))
+            assert np.nanmax(np.abs(decode_grid(header, values) - expected), initial=0) <= frame_header["scale"] / 2 + 1e-9
+        assert offset == len(body)
+
+
+if __name__ == "__main__":
+    TestEncoding().test_compact_float32()
+    TestEncoding().test_binary_uint16()
@@ -0,0 +1,41 @@
+import sys
+import os
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.execution_service import ExecutionPool, in_worker
+
+
+def thread_name(_):
+    return threading.current_thread().name
+
+
+class TestExecutionPool:
+    def test_small_work_runs_inline(self):
+        pool = ExecutionPool(kind="thread", max_workers=4, inline_threshold=100)
+        main_thread = threading.current_thread().name
+
+        assert pool.map(thread_name, range(3), points=10) == [main_thread] * 3
+        assert pool.map(thread_name, [0], points=1000) == [main_thread]
+        assert pool._executor is None
+        assert all(name != main_thread for name in pool.map(thread_name, range(3), points=50))
+        pool.shutdown()
+
+    def test_nested_work_runs_inline(self):
+        pool = ExecutionPool(kind="thread", max_workers=2, inline_threshold=0)
+
+        def outer(i):
+            # Both workers are busy with the outer units, so the inner ones must not wait on the pool
+            return in_worker(), pool.map(lambda j: (i, j, thread_name(j)), range(3))
+
+        results = pool.map(outer, range(2))
+        pool.shutdown()
+
+        for i, (nested, inner_results) in enumerate(results):
+            assert nested
+            assert [(a, b) for a, b, _ in inner_results] == [(i, 0), (i, 1), (i, 2)]
+            assert len({name for _, _, name in inner_results}) == 1
+
+
+if __name__ == "__main__":
+    TestExecutionPool().test_small_work_runs_inline()
+    TestExecutionPool().test_nested_work_runs_inline()
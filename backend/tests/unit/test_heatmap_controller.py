@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.response_cache import ResponseCache
+from controllers.heatmap_controller import HeatMapController
+
+
+def heatmap_payload(method="Kriging", **interpolator):
+    return {"indicator": "MP10", "interval": "instant", "hour": "2023-03-01 12",
+            "interpolator": {"method": method, "params": {}, **interpolator}}
+
+
+class TestHeatMapController:
+    def test_validate_search_strategy(self):
+        controller = HeatMapController(session=None)
+        assert controller.validate_payload_format(heatmap_payload())
+        assert controller.validate_payload_format(heatmap_payload(search="halving"))
+        assert controller.validate_payload_format(heatmap_payload("KNN", search="halving")) # Known, downgraded
+        assert not controller.validate_payload_format(heatmap_payload(search="halvng"))
+        assert not controller.validate_payload_format(heatmap_payload("KNN", search="random"))
+
+    def test_unsupported_search_strategy_is_downgraded(self, monkeypatch):
+        searches = []
+
+        def get_heatmaps(self, **kwargs):
+            searches.append(kwargs["search"])
+            return {"1": None}
+
+        monkeypatch.setattr(HeatMapController, "_HeatMapController__get_heatmaps", get_heatmaps)
+        for method in ["Kriging", "KNN"]:
+            controller = HeatMapController(session=None)
+            controller.response_cache = ResponseCache(path=None)
+            controller.get_heatmap(heatmap_payload(method, search="halving"))
+            assert controller.search_strategy == searches[-1]
+        assert searches == ["halving", "exhaustive"]
+
+
+if __name__ == "__main__":
+    TestHeatMapController().test_validate_search_strategy()
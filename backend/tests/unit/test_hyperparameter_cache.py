@@ -0,0 +1,52 @@
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.hyperparameter_cache import HyperparameterCache, make_key
+
+
+PARAM_GRID = {"method": ["ordinary", "universal"], "variogram_model": ["linear"]}
+
+
+def key(time_key, indicator_id=1, station_ids=(1, 2, 3)):
+    return make_key(indicator_id, "hourly", time_key, station_ids, "Kriging", PARAM_GRID)
+
+
+class TestHyperparameterCache:
+    def test_lru_eviction(self):
+        cache = HyperparameterCache(max_size=2, path=None)
+        cache.set(key("2023-03-01 00"), ({"method": "ordinary"}, 1.0))
+        cache.set(key("2023-03-01 01"), ({"method": "universal"}, 2.0))
+        cache.get(key("2023-03-01 00")) # Now the most recently used
+        cache.set(key("2023-03-01 02"), ({"method": "ordinary"}, 3.0))
+
+        assert cache.get(key("2023-03-01 00")) == ({"method": "ordinary"}, 1.0)
+        assert cache.get(key("2023-03-01 01")) is None
+        assert len(cache) == 2
+
+    def test_persistence(self, tmp_path):
+        path = str(tmp_path / "cache" / "hyperparameters.pkl")
+        HyperparameterCache(path=path).set_many({key("2023-03"): ({"k": 3}, 4.5),
+                                                 key("2023-04", station_ids=(1, 2)): ({"k": 4}, 5.5)})
+
+        cache = HyperparameterCache(path=path)
+        assert cache.get(key("2023-03")) == ({"k": 3}, 4.5)
+        assert cache.get(key("2023-04", station_ids=(2, 1))) == ({"k": 4}, 5.5)
+
+    def test_invalidate_overlapping_periods(self):
+        cache = HyperparameterCache(path=None)
+        time_keys = ["2022", "2023", "2023-03", "2023-04", "2023-03-01", "2023-03-02",
+                     "2023-03-01 12", "2023-03-01 13"]
+        cache.set_many({key(time_key): ({"k": 1}, 1.0) for time_key in time_keys})
+        cache.set(key("2023-03-01 12", indicator_id=2), ({"k": 1}, 1.0))
+
+        cache.invalidate(1, first_datetime=datetime(2023, 3, 1, 12, 0), last_datetime=datetime(2023, 3, 1, 12, 0))
+
+        remaining = [time_key for time_key in time_keys if cache.get(key(time_key)) is not None]
+        assert remaining == ["2022", "2023-04", "2023-03-02", "2023-03-01 13"]
+        assert cache.get(key("2023-03-01 12", indicator_id=2)) is not None
+
+
+if __name__ == "__main__":
+    TestHyperparameterCache().test_lru_eviction()
+    TestHyperparameterCache().test_invalidate_overlapping_periods()
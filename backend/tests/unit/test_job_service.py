@@ -0,0 +1,69 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.job_service import JobManager, Job
+
+
+def wait(job, timeout=5):
+    deadline = time.time() + timeout
+    while not job.is_finished() and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+class TestJobManager:
+    def test_progress_and_dedupe(self):
+        manager = JobManager(max_workers=2, ttl=60)
+        release = threading.Event()
+        calls = []
+
+        def run(job):
+            calls.append(1)
+            job.set_progress(1, 3)
+            release.wait(5)
+            job.set_progress(3, 3)
+            return "heatmaps"
+
+        job = manager.submit("key", run)
+        while job.frames_done == 0:
+            time.sleep(0.01)
+        assert job.status == Job.RUNNING and (job.frames_done, job.frames_total) == (1, 3)
+        assert manager.submit("key", run) is job # Identical payload while running
+
+        release.set()
+        assert wait(job).status == Job.DONE and job.result == "heatmaps"
+        assert manager.submit("key", run) is job # Identical payload once done
+        assert manager.get(job.id).to_dict()["frames_done"] == 3
+        assert len(calls) == 1
+        manager.shutdown()
+
+    def test_failed_jobs_are_retried(self):
+        manager = JobManager(max_workers=1, ttl=60)
+
+        def fail(job):
+            raise ValueError("no data")
+
+        job = wait(manager.submit("key", fail))
+        assert job.status == Job.FAILED and job.error == "no data"
+
+        retry = wait(manager.submit("key", lambda job: "heatmaps"))
+        assert retry is not job and retry.result == "heatmaps"
+        manager.shutdown()
+
+    def test_ttl(self):
+        manager = JobManager(max_workers=1, ttl=0.1)
+        job = wait(manager.submit("key", lambda job: "heatmaps"))
+        assert manager.get(job.id) is job
+
+        time.sleep(0.2)
+        assert manager.get(job.id) is None
+        assert manager.submit("key", lambda job: "heatmaps") is not job
+        manager.shutdown()
+
+
+if __name__ == "__main__":
+    TestJobManager().test_progress_and_dedupe()
+    TestJobManager().test_failed_jobs_are_retried()
+    TestJobManager().test_ttl()
@@ -0,0 +1,87 @@
+import sys
+import os
+import numpy as np
+import pytest
+from sklearn.model_selection import cross_val_score
+from sklearn.neighbors import KNeighborsRegressor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.interpolation_service import ConvexLOOCV, KNNInterpolator
+
+
+def random_data(seed, n, duplicates=0):
+    """
+    Returns a dict (lat, long) : value of n random stations over São Paulo, the last `duplicates`
+    of them (almost) sharing the coordinates of the first ones.
+    """
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(-23.8, -23.4, n)
+    long = rng.uniform(-46.8, -46.4, n)
+    lat[n - duplicates:] = lat[:duplicates]
+    long[n - duplicates:] = long[:duplicates] + 1e-12 # Keeps the dict keys distinct
+    return {(a, b): value for a, b, value in zip(lat, long, rng.uniform(10, 120, n))}
+
+
+def sklearn_scores(interpolator):
+    return [np.mean(cross_val_score(KNeighborsRegressor(n_neighbors=k, weights='distance'),
+                                    interpolator.X, interpolator.y, scoring='neg_root_mean_squared_error',
+                                    cv=ConvexLOOCV()))
+            for k in range(1, len(interpolator.y))]
+
+
+class TestKNNLOO:
+    def test_auto_k_matches_cross_val_score(self):
+        for seed, n, duplicates in [(0, 30, 0), (1, 12, 0), (2, 25, 3)]:
+            interpolator = KNNInterpolator(random_data(seed, n, duplicates), k='auto')
+            scores = sklearn_scores(interpolator)
+
+            assert interpolator.k == int(np.argmax(scores)) + 1
+            assert np.isclose(interpolator.best_score, -max(scores))
+
+    def test_fixed_k_matches_cross_val_score(self):
+        data = random_data(3, 20)
+        for k in [1, 4, 19]:
+            interpolator = KNNInterpolator(data, k=k)
+            assert np.isclose(interpolator.best_score, -sklearn_scores(interpolator)[k - 1])
+
+    def test_fixed_k_out_of_range(self):
+        data = random_data(3, 20)
+        for k in [0, -1, 20]:
+            with pytest.raises(ValueError):
+                KNNInterpolator(data, k=k)
+
+    def test_batched_matches_per_frame(self):
+        frames = [random_data(seed, 25, 3) for seed in [4, 5, 6]]
+        coordinates = list(frames[0])
+        frames = [dict(zip(coordinates, frame.values())) for frame in frames] # Same stations, other values
+        grid = [(lat, long) for lat in np.linspace(-23.8, -23.4, 7) for long in np.linspace(-46.8, -46.4, 7)]
+
+        batched = KNNInterpolator({c: [frame[c] for frame in frames] for c in coordinates}, k='auto')
+        predictions = batched.predict(grid)
+
+        assert predictions.shape == (len(grid), len(frames))
+        for i, frame in enumerate(frames):
+            interpolator = KNNInterpolator(frame, k='auto')
+            assert batched.k[i] == interpolator.k
+            assert np.isclose(batched.best_score[i], interpolator.best_score)
+            assert np.allclose(predictions[:, i], interpolator.predict(grid))
+
+    def test_array_input_matches_dict_input(self):
+        data = random_data(7, 20)
+        data[(-23.5, -46.5)] = np.nan # Points without a value are dropped
+        coordinates, values = np.array(list(data.keys())), np.array(list(data.values()))
+        grid = [(lat, long) for lat in np.linspace(-23.8, -23.4, 5) for long in np.linspace(-46.8, -46.4, 5)]
+
+        from_dict = KNNInterpolator(data, k='auto')
+        from_arrays = KNNInterpolator((coordinates, values), k='auto')
+
+        assert from_arrays.k == from_dict.k
+        assert np.array_equal(from_arrays.X, from_dict.X)
+        assert np.array_equal(from_arrays.predict(np.array(grid)), from_dict.predict(grid))
+
+
+if __name__ == "__main__":
+    TestKNNLOO().test_auto_k_matches_cross_val_score()
+    TestKNNLOO().test_fixed_k_matches_cross_val_score()
+    TestKNNLOO().test_fixed_k_out_of_range()
+    TestKNNLOO().test_batched_matches_per_frame()
+    TestKNNLOO().test_array_input_matches_dict_input()
@@ -0,0 +1,132 @@
+import sys
+import os
+import io
+import contextlib
+import itertools
+import warnings
+import numpy as np
+from sklearn.model_selection import cross_val_score
+from pykrige.ok import OrdinaryKriging
+from pykrige.rk import Krige
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.interpolation_service import ConvexLOOCV, KrigingInterpolator
+from services.kriging_service import KrigingLOO, KrigingWeights
+
+
+PARAM_DICT = {
+    "method": ["ordinary", "universal"],
+    "variogram_model": ["linear", "spherical"],
+    "nlags": [6],
+    "weight": [True, False],
+}
+
+
+def random_data(seed, n):
+    rng = np.random.default_rng(seed)
+    X = rng.random((n, 2))
+    y = 50 + 10 * np.sin(5 * X[:, 0]) + rng.standard_normal(n)
+    return X, list(y)
+
+
+def cross_val_score_mean(X, y, params):
+    with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+        warnings.simplefilter("ignore")
+        return np.mean(cross_val_score(Krige(**params), X, y, scoring='neg_root_mean_squared_error',
+                                       cv=ConvexLOOCV()))
+
+
+class TestKrigingLOO:
+    def test_matches_cross_val_score(self):
+        X, y = random_data(0, 14)
+        loo = KrigingLOO(X, y, ConvexLOOCV().test_indices(X))
+        for values in itertools.product(*PARAM_DICT.values()):
+            params = dict(zip(PARAM_DICT.keys(), values))
+            assert np.isclose(loo.score(params), cross_val_score_mean(X, y, params), rtol=1e-8)
+
+    def test_fixed_variogram_closed_form(self):
+        X, y = random_data(1, 16)
+        loo = KrigingLOO(X, y, ConvexLOOCV().test_indices(X))
+        for params in [{"method": "universal", "variogram_model": "spherical", "variogram_parameters": [2.0, 0.4, 0.1]},
+                       {"method": "universal", "variogram_model": "linear", "variogram_parameters": [2.0, 0.1]},
+                       {"method": "ordinary", "variogram_model": "gaussian", "variogram_parameters": [2.0, 0.4, 0.1]}]:
+            assert np.isclose(loo.score(params), cross_val_score_mean(X, y, params), rtol=1e-8)
+
+    def test_shared_variogram(self):
+        # Without refits, every fold uses the variogram fitted on all the points
+        X, y = random_data(2, 16)
+        loo = KrigingLOO(X, y, ConvexLOOCV().test_indices(X), refit_variogram=False)
+        for method in ["ordinary", "universal"]:
+            params = {"method": method, "variogram_model": "spherical", "nlags": 6}
+            variogram_parameters = OrdinaryKriging(X[:, 0], X[:, 1], y, variogram_model="spherical",
+                                                   nlags=6).variogram_model_parameters
+            expected = cross_val_score_mean(X, y, {**params, "variogram_parameters": list(variogram_parameters)})
+            assert np.isclose(loo.score(params), expected, rtol=1e-8)
+
+    def test_too_few_neighbors(self):
+        # cross_val_score gives NaN when the moving window has more points than the fold
+        X, y = random_data(3, 9)
+        loo = KrigingLOO(X, y, ConvexLOOCV().test_indices(X))
+        assert np.isnan(loo.score({"method": "ordinary"}))
+        assert not np.isnan(loo.score({"method": "universal"}))
+
+    def test_halving_search(self):
+        X, y = random_data(6, 30)
+        data = {tuple(x): value for x, value in zip(X, y)}
+        param_dict = {**PARAM_DICT, "variogram_model": ["linear", "spherical", "gaussian"], "nlags": [4, 6]}
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            exhaustive = KrigingInterpolator(data, param_dict)
+            halving = KrigingInterpolator(data, param_dict, search="halving")
+
+        # The selected combination gets its full leave one out score, which can't beat the exhaustive search
+        loo = KrigingLOO(halving.X, halving.y, ConvexLOOCV().test_indices(halving.X))
+        assert np.isclose(halving.best_score, -loo.score(halving.params))
+        assert halving.best_score >= exhaustive.best_score - 1e-12
+
+
+class TestKrigingWeights:
+    def test_matches_krige_predict(self):
+        X, y = random_data(4, 20)
+        points = np.random.default_rng(5).random((40, 2))
+        frames = np.column_stack([y, np.array(y)[::-1], np.square(y)])
+        weights = KrigingWeights(X, points)
+        for method, variogram_parameters in itertools.product(["ordinary", "universal"],
+                                                               [None, {"sill": 4.0, "range": 0.5, "nugget": 0.1}]):
+            params = {"method": method, "variogram_model": "spherical", "variogram_parameters": variogram_parameters}
+            with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+                warnings.simplefilter("ignore")
+                krige = Krige(**params)
+                krige.fit(X, y)
+                expected = krige.predict(points)
+            assert np.allclose(weights.predict(krige.model, params, frames)[:, 0], expected, rtol=1e-8)
+
+    def test_local_universal_kriging(self):
+        # Without drift terms, universal kriging of the nearest stations is the ordinary kriging moving window
+        X, y = random_data(7, 30)
+        points = np.random.default_rng(8).random((200, 2))
+        variogram_parameters = {"sill": 4.0, "range": 0.5, "nugget": 0.1}
+        models = {}
+        with warnings.catch_warnings(), contextlib.redirect_stdout(io.StringIO()):
+            warnings.simplefilter("ignore")
+            for method in ["ordinary", "universal"]:
+                models[method] = Krige(method=method, variogram_model="spherical", variogram_parameters=variogram_parameters,
+                                       n_closest_points=6)
+                models[method].fit(X, y)
+            expected = models["ordinary"].predict(points)
+
+        weights = KrigingWeights(X, points, neighbors=6)
+        predictions = weights.predict(models["universal"].model, {"method": "universal"}, np.array(y)[:, np.newaxis])
+        assert np.allclose(predictions[:, 0], expected, rtol=1e-8)
+        # Far fewer distinct windows than points, each inverted once
+        assert len(weights._neighbors[6][2]) < len(points) / 2
+        assert np.count_nonzero(weights.weights(models["universal"].model, {"method": "universal"}), axis=1).max() <= 6
+
+
+if __name__ == "__main__":
+    TestKrigingLOO().test_matches_cross_val_score()
+    TestKrigingLOO().test_fixed_variogram_closed_form()
+    TestKrigingLOO().test_shared_variogram()
+    TestKrigingLOO().test_too_few_neighbors()
+    TestKrigingLOO().test_halving_search()
+    TestKrigingWeights().test_matches_krige_predict()
+    TestKrigingWeights().test_local_universal_kriging()
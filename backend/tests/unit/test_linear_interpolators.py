@@ -0,0 +1,51 @@
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.interpolation_service import IDWInterpolator, RBFInterpolator, ConvexLOOCV
+
+
+def sample_data(n=20, frames=3, seed=0):
+    rng = np.random.default_rng(seed)
+    coordinates = np.column_stack((-23.5 + rng.uniform(-0.3, 0.3, n), -46.6 + rng.uniform(-0.3, 0.3, n)))
+    return coordinates, rng.uniform(0, 50, (n, frames))
+
+
+class TestLinearInterpolators:
+    def test_loo_residuals_match_refitting(self):
+        coordinates, values = sample_data()
+        for interpolator_class, params in [(IDWInterpolator, {"power": 2}),
+                                           (RBFInterpolator, {"kernel": "gaussian", "epsilon": 3.0, "smoothing": 0.1}),
+                                           (RBFInterpolator, {"kernel": "thin_plate_spline"})]:
+            interpolator = interpolator_class((coordinates, values), params)
+            test_indices = ConvexLOOCV().test_indices(interpolator.X)
+            residuals = interpolator._loo_residuals(interpolator.params[0], values, test_indices)
+
+            for residual, i in zip(residuals, test_indices):
+                others = np.arange(len(values)) != i
+                # Refit in the same scaled coordinates, since the kernels depend on the scale
+                refit = interpolator_class((coordinates[others], values[others]), params)
+                refit.scaler = interpolator.scaler
+                refit.X = interpolator.X[others]
+                refit.station_distances = interpolator.station_distances[others][:, others]
+                assert np.allclose(residual, values[i] - refit.predict(coordinates[i:i + 1])[0])
+
+    def test_batched_frames_match_single_frames(self):
+        coordinates, values = sample_data()
+        for interpolator_class, param_dict in [(IDWInterpolator, None),
+                                               (RBFInterpolator, {"kernel": ["linear", "gaussian"], "epsilon": [1.0, 3.0]})]:
+            batched = interpolator_class((coordinates, values), param_dict)
+            predictions = batched.predict(coordinates)
+
+            for frame in range(values.shape[1]):
+                single = interpolator_class((coordinates, values[:, frame]), param_dict)
+                assert single.params == batched.params[frame]
+                assert np.isclose(single.best_score, batched.best_score[frame])
+                assert np.allclose(single.predict(coordinates), predictions[:, frame])
+            # Without smoothing, both interpolate the known values
+            assert np.allclose(predictions, values)
+
+
+if __name__ == "__main__":
+    TestLinearInterpolators().test_loo_residuals_match_refitting()
+    TestLinearInterpolators().test_batched_frames_match_single_frames()
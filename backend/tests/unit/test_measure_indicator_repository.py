@@ -0,0 +1,89 @@
+import sys
+import os
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from repositories import MeasureIndicatorRepository
+
+
+INDICATOR_ID = 12
+STATION_IDS = [1, 2, 3]
+
+
+@pytest.fixture
+def repository():
+    """
+    Repository over an in-memory SQLite database standing in for MySQL, holding hourly measures of
+    three stations from 2023-02-27 to 2023-03-02 (and measures of another indicator), with the
+    daily rollup of those measures.
+    """
+    engine = create_engine("sqlite://")
+    random.seed(0)
+    rows = [{"idStation": station_id, "idIndicator": indicator_id, "datetime": datetime(2023, 2, 27) + timedelta(hours=hour),
+             "value": random.uniform(0, 100)}
+            for station_id in STATION_IDS for indicator_id in [INDICATOR_ID, 63] for hour in range(4 * 24)
+            if random.random() < 0.8]
+
+    with engine.begin() as connection:
+        connection.execute(text("""
+            CREATE TABLE measure_indicator (idStation INTEGER, idIndicator INTEGER, datetime DATETIME, value FLOAT,
+                                            PRIMARY KEY (idStation, idIndicator, datetime))
+        """))
+        connection.execute(text("""
+            CREATE TABLE measure_indicator_daily (idStation INTEGER, idIndicator INTEGER, date DATE, sum_value FLOAT,
+                                                  count_value INTEGER, min_value FLOAT, max_value FLOAT,
+                                                  PRIMARY KEY (idStation, idIndicator, date))
+        """))
+        connection.execute(text("""
+            INSERT INTO measure_indicator (idStation, idIndicator, datetime, value)
+            VALUES (:idStation, :idIndicator, :datetime, :value)
+        """), [{**row, "datetime": row["datetime"].strftime("%Y-%m-%d %H:%M:%S.000000")} for row in rows])
+        connection.execute(text("""
+            INSERT INTO measure_indicator_daily (idStation, idIndicator, date, sum_value, count_value, min_value, max_value)
+            SELECT idStation, idIndicator, DATE(datetime), SUM(value), COUNT(value), MIN(value), MAX(value)
+            FROM measure_indicator GROUP BY idStation, idIndicator, DATE(datetime)
+        """))
+
+    session = sessionmaker(bind=engine)()
+    yield MeasureIndicatorRepository(session)
+    session.close()
+    engine.dispose()
+
+
+def as_dict(rows):
+    return {row.idStation: row.value for row in rows}
+
+
+class TestMeasureIndicatorRepository:
+    def test_hours_match_queries_per_hour(self, repository):
+        rows = repository.get_mean_measure_indicators_per_period(indicator_id=INDICATOR_ID, period="hour",
+                                                                 time_reference_str="2023-03-01")
+        per_hour = {}
+        for row in rows:
+            per_hour.setdefault(int(row.period), []).append(row)
+
+        assert sorted(per_hour) == list(range(24))
+        for hour, hour_rows in per_hour.items():
+            expected = as_dict(repository.get_mean_measure_indicators(indicator_id=INDICATOR_ID,
+                                                                      time_reference_str=f"2023-03-01 {hour:02d}"))
+            assert as_dict(hour_rows) == pytest.approx(expected)
+
+    def test_days_match_queries_per_day(self, repository):
+        rows = repository.get_mean_measure_indicators_per_period(indicator_id=INDICATOR_ID, period="day",
+                                                                 time_reference_str="2023-02")
+        per_day = {}
+        for row in rows:
+            per_day.setdefault(int(row.period), []).append(row)
+
+        assert sorted(per_day) == [27, 28] # Only the days of the month
+        for day, day_rows in per_day.items():
+            expected = as_dict(repository.get_mean_measure_indicators(indicator_id=INDICATOR_ID,
+                                                                      time_reference_str=f"2023-02-{day:02d}"))
+            assert as_dict(day_rows) == pytest.approx(expected)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
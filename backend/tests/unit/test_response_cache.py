@@ -0,0 +1,64 @@
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.response_cache import ResponseCache, make_key, ALL_TIME
+
+
+MARCH = (datetime(2023, 3, 1), datetime(2023, 4, 1))
+
+
+def heatmap_key(day="2023-03-01", params=None):
+    return make_key("heatmap", {"interval": "hourly", "day": day, "indicator": "MP10",
+                                "interpolator": {"method": "Kriging", "params": params or {"method": "ordinary"}}})
+
+
+class TestResponseCache:
+    def test_canonical_payload(self):
+        assert heatmap_key(params={"method": "ordinary", "nlags": 6}) == heatmap_key(params={"nlags": [6], "method": ["ordinary"]})
+        assert heatmap_key(params={"nlags": [4, 6]}) != heatmap_key(params={"nlags": [6, 4]})
+        assert heatmap_key(day="2023-03-01") != heatmap_key(day="2023-03-02")
+
+    def test_knn_params_are_not_wrapped(self):
+        def knn_key(params):
+            return make_key("heatmap", {"indicator": "MP10", "interpolator": {"method": "KNN", "params": params}})
+
+        # A fixed k is not a grid of one k, which KNNInterpolator rejects
+        assert knn_key({"k": 5}) != knn_key({"k": [5]})
+        assert '"k": 5' in knn_key({"k": 5})[1]
+
+    def test_lru_and_disk_spill(self, tmp_path):
+        response = list(range(1000))
+        cache = ResponseCache(max_memory_bytes=6000, path=str(tmp_path), max_disk_bytes=10 ** 6)
+        for day in ["2023-03-01", "2023-03-02", "2023-03-03"]: # Only the last two fit in memory
+            cache.set(heatmap_key(day), response, [12], *MARCH)
+
+        assert cache.stats()["entries"] == 2 and cache.stats()["disk_entries"] == 1
+        assert cache.get(heatmap_key("2023-03-01")) == response # Moved back to memory
+        assert cache.get(heatmap_key("2023-03-04")) is None
+
+        stats = cache.stats()
+        assert (stats["hits"], stats["disk_hits"], stats["misses"]) == (1, 1, 1)
+        assert len(cache) == 3 and len(os.listdir(tmp_path)) == 1
+
+    def test_invalidate(self):
+        cache = ResponseCache(path=None)
+        cache.set(heatmap_key("2023-03-01"), "march", [12], *MARCH)
+        cache.set(heatmap_key("2023-04-01"), "april", [12], datetime(2023, 4, 1), datetime(2023, 5, 1))
+        cache.set(make_key("linegraph", {"indicators": ["MP10", "O3"], "interval": "yearly"}), "years", [12, 63], *ALL_TIME)
+        cache.set(make_key("linegraph", {"indicators": ["CO"], "interval": "yearly"}), "co", [16], *ALL_TIME)
+
+        cache.invalidate(63, datetime(2023, 3, 10), datetime(2023, 3, 12))
+        cache.invalidate(12, datetime(2023, 3, 31, 23), datetime(2023, 3, 31, 23))
+
+        assert cache.get(heatmap_key("2023-03-01")) is None
+        assert cache.get(heatmap_key("2023-04-01")) == "april"
+        assert cache.get(make_key("linegraph", {"indicators": ["MP10", "O3"], "interval": "yearly"})) is None
+        assert cache.get(make_key("linegraph", {"indicators": ["CO"], "interval": "yearly"})) == "co"
+        assert cache.stats()["invalidations"] == 2
+
+
+if __name__ == "__main__":
+    TestResponseCache().test_canonical_payload()
+    TestResponseCache().test_knn_params_are_not_wrapped()
+    TestResponseCache().test_invalidate()
@@ -0,0 +1,61 @@
+import sys
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import Flask, jsonify
+from sqlalchemy import text
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from database.session import create_pooled_engine, create_scoped_session, register_session_teardown
+
+
+NUMBER_OF_REQUESTS = 8
+
+
+def build_app(database_uri, barrier):
+    """
+    Builds an app wired like app.py, against a SQLite file standing in for MySQL.
+    Each request waits at the barrier while holding its connection, so the requests only
+    complete if all of them run at the same time.
+    """
+    engine = create_pooled_engine(database_uri, connect_args={"check_same_thread": False})
+    Session = create_scoped_session(engine)
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE TABLE measure (id INTEGER PRIMARY KEY, value REAL)"))
+        connection.execute(text("INSERT INTO measure (id, value) VALUES (1, 1.5), (2, 2.5)"))
+
+    app = Flask(__name__)
+    register_session_teardown(app, Session)
+
+    @app.route('/measure')
+    def measure():
+        session = Session()
+        value = session.execute(text("SELECT SUM(value) FROM measure")).scalar()
+        barrier.wait(timeout=10)
+        return jsonify({"session": id(session), "thread": threading.get_ident(), "value": value})
+
+    return app, engine
+
+
+class TestSession:
+    def test_parallel_requests(self):
+        with tempfile.TemporaryDirectory() as directory:
+            barrier = threading.Barrier(NUMBER_OF_REQUESTS)
+            app, engine = build_app(f"sqlite:///{os.path.join(directory, 'stand_in.db')}", barrier)
+            client = app.test_client()
+
+            with ThreadPoolExecutor(max_workers=NUMBER_OF_REQUESTS) as executor:
+                responses = list(executor.map(lambda _: client.get('/measure').get_json(),
+                                              range(NUMBER_OF_REQUESTS)))
+
+            assert all(response["value"] == 4.0 for response in responses)
+            assert len({response["thread"] for response in responses}) == NUMBER_OF_REQUESTS
+            assert len({response["session"] for response in responses}) == NUMBER_OF_REQUESTS
+            assert not barrier.broken
+            assert engine.pool.checkedout() == 0 # Every session was removed at the end of its request
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    TestSession().test_parallel_requests()
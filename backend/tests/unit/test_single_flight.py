@@ -0,0 +1,98 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.single_flight import SingleFlight
+from services.response_cache import ResponseCache
+from controllers.heatmap_controller import HeatMapController
+
+
+N = 8
+
+
+def run_concurrently(fn, n=N):
+    """
+    Calls fn(i) from n threads released at the same moment
+    returns the list of results (or exceptions) of each call
+    """
+    barrier = threading.Barrier(n)
+    results = [None] * n
+
+    def target(i):
+        barrier.wait()
+        try:
+            results[i] = fn(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=target, args=(i,)) for i in range(n)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+class TestSingleFlight:
+    def test_concurrent_calls_share_one_computation(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.2)
+            return {"value": len(calls)}
+
+        results = run_concurrently(lambda i: single_flight.do("key", compute))
+        assert len(calls) == 1
+        assert all(result is results[0] for result in results)
+        assert single_flight.in_flight() == 0
+
+        single_flight.do("key", compute) # Not in flight anymore
+        assert len(calls) == 2
+
+    def test_errors_are_shared(self):
+        single_flight = SingleFlight()
+
+        def compute():
+            time.sleep(0.2)
+            raise ValueError("failed")
+
+        results = run_concurrently(lambda i: single_flight.do("key", compute))
+        assert all(isinstance(result, ValueError) for result in results)
+        assert single_flight.in_flight() == 0
+
+    def test_identical_heatmap_requests(self, monkeypatch):
+        calls = []
+
+        def get_heatmaps(self, **kwargs):
+            calls.append(kwargs)
+            time.sleep(0.2) # A slow grid search
+            self.cv_scores["1"] = 4.2
+            return {"1": None}
+
+        monkeypatch.setattr(HeatMapController, "_HeatMapController__get_heatmaps", get_heatmaps)
+        cache = ResponseCache(path=None)
+        interpolator = {"method": "Kriging", "params": {"method": ["ordinary", "universal"], "nlags": 6}}
+
+        def request(i):
+            controller = HeatMapController(session=None)
+            controller.response_cache = cache
+            # The same canonical payload, with the fields in a different order
+            payload = ({"indicator": "MP10", "interval": "instant", "hour": "2023-03-01 12", "interpolator": interpolator}
+                       if i % 2 else {"interpolator": interpolator, "hour": "2023-03-01 12", "interval": "instant", "indicator": "MP10"})
+            return controller.get_heatmap(payload), controller.cv_scores
+
+        results = run_concurrently(request)
+        assert len(calls) == 1
+        assert all(result == ({"1": []}, {"1": 4.2}) for result in results)
+
+        request(0) # Served from the response cache
+        assert len(calls) == 1
+        assert cache.stats()["misses"] == N
+
+
+if __name__ == "__main__":
+    TestSingleFlight().test_concurrent_calls_share_one_computation()
+    TestSingleFlight().test_errors_are_shared()
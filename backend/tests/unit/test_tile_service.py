@@ -0,0 +1,108 @@
+import sys
+import os
+import zlib
+import struct
+from datetime import datetime
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'src')))
+from services.discretization_service import RectangularDiscretization
+from services.tile_service import TileCache, TileService, render_tile, tile_coordinates, TILE_SIZE, OPACITY
+from controllers.heatmap_controller import HeatMapController
+
+
+def decode_png(png):
+    """
+    RGBA pixels of a PNG written by encode_png (8 bit RGBA, unfiltered scanlines)
+    """
+    assert png[:8] == b"\x89PNG\r\n\x1a\n"
+    position, chunks = 8, {}
+    while position < len(png):
+        length, = struct.unpack(">I", png[position:position + 4])
+        chunk_type, data = png[position + 4:position + 8], png[position + 8:position + 8 + length]
+        crc, = struct.unpack(">I", png[position + 8 + length:position + 12 + length])
+        assert crc == zlib.crc32(chunk_type + data) & 0xffffffff
+        chunks[chunk_type] = data
+        position += 12 + length
+
+    width, height = struct.unpack(">II", chunks[b"IHDR"][:8])
+    scanlines = np.frombuffer(zlib.decompress(chunks[b"IDAT"]), dtype=np.uint8).reshape(height, 1 + 4 * width)
+    assert not scanlines[:, 0].any()
+    return scanlines[:, 1:].reshape(height, width, 4)
+
+
+class StubHeatMapController():
+    """
+    Computes a heatmap of constant values over the whole grid, counting the computations
+    """
+    def __init__(self, grid):
+        self.grid = grid
+        self.calls = 0
+
+    def get_heatmap_frames(self, payload):
+        self.calls += 1
+        return {"12": (self.grid, np.full(len(self.grid), 30.0)), "13": None}
+
+    def get_grid(self):
+        return self.grid
+
+    get_time_range = staticmethod(HeatMapController.get_time_range)
+
+
+class TestTiles:
+    def test_render_tile(self):
+        grid = RectangularDiscretization(min_lat=-24.0, max_lat=-23.4, min_long=-46.8, max_long=-46.4, number_of_lat_points=30)
+        values = np.where(grid.long < -46.6, 10.0, 60.0)
+        values[grid.lat > -23.5] = np.nan
+        quality_colors = ([50], [(0, 128, 0), (255, 0, 0)])
+
+        # Tile at zoom 7 containing the whole grid
+        rgba = decode_png(render_tile(grid, values, quality_colors, 7, 47, 72))
+        lat, long = tile_coordinates(7, 47, 72)
+        assert rgba.shape == (TILE_SIZE, TILE_SIZE, 4)
+
+        def pixel(pixel_lat, pixel_long):
+            return tuple(rgba[np.argmin(np.abs(lat - pixel_lat)), np.argmin(np.abs(long - pixel_long))])
+
+        assert pixel(-23.8, -46.7) == (0, 128, 0, OPACITY)
+        assert pixel(-23.8, -46.5) == (255, 0, 0, OPACITY)
+        assert pixel(-23.45, -46.7)[3] == 0 # No value
+        assert pixel(-24.5, -46.7)[3] == 0 # Outside the grid
+
+    def test_tile_cache(self, tmp_path):
+        path = str(tmp_path / "tiles")
+        period = (datetime(2023, 3, 1), datetime(2023, 4, 1))
+        cache = TileCache(path=path, max_size=2)
+        cache.set(("a", "1", 10, 1, 1), b"first", 12, *period)
+        cache.set(("a", "1", 10, 1, 2), b"second", 12, *period)
+        cache.get(("a", "1", 10, 1, 1)) # Now the most recently used
+        cache.set(("b", "1", 10, 1, 1), b"third", 63, *period)
+
+        cache = TileCache(path=path, max_size=2)
+        assert cache.get(("a", "1", 10, 1, 1)) == b"first"
+        assert cache.get(("a", "1", 10, 1, 2)) is None
+        assert cache.get(("b", "1", 10, 1, 1)) == b"third"
+
+        cache.invalidate(12, datetime(2023, 3, 5), datetime(2023, 3, 5))
+        assert cache.get(("a", "1", 10, 1, 1)) is None
+        assert cache.get(("b", "1", 10, 1, 1)) == b"third"
+        assert not os.path.exists(os.path.join(path, "a"))
+
+    def test_tile_service(self, tmp_path):
+        grid = RectangularDiscretization(min_lat=-24.0, max_lat=-23.4, min_long=-46.8, max_long=-46.4, number_of_lat_points=30)
+        controller = StubHeatMapController(grid)
+        service = TileService(tile_cache=TileCache(path=str(tmp_path)))
+        payload = {"indicator": "MP10", "interval": "hourly", "day": "2023-03-01",
+                   "interpolator": {"method": "Kriging", "params": {"nlags": 6}}}
+        # The same canonical payload, with the fields in a different order and the parameters in lists
+        equivalent = {"interpolator": {"params": {"nlags": [6]}, "method": "Kriging"}, "day": "2023-03-01",
+                      "interval": "hourly", "indicator": "MP10"}
+
+        tile = service.get_tile(payload, "12", 7, 47, 72, controller)
+        assert service.get_tile(equivalent, "12", 7, 47, 72, controller) == tile
+        assert service.get_tile(equivalent, "13", 7, 47, 72, controller) is not None # A frame without data
+        assert service.get_tile(payload, "14", 7, 47, 72, controller) is None # Not a frame of the payload
+        assert controller.calls == 1 and len(service.tile_cache) == 2
+
+
+if __name__ == "__main__":
+    TestTiles().test_render_tile()
@@ -13,5 +13,19 @@ export const interpolatorMethods = [
             { name : "nlags", type : "number" },
             { name : "weight", type : "checkbox"}
         ]
+    },
+    {
+        name : "IDW",
+        params : [
+            { name : "power", type: "number"}
+        ]
+    },
+    {
+        name : "RBF",
+        params : [
+            { name : "kernel", type : "text", options : ['thin_plate_spline', 'linear', 'cubic', 'multiquadric', 'inverse_multiquadric', 'gaussian'] },
+            { name : "epsilon", type : "number" },
+            { name : "smoothing", type : "number" }
+        ]
     }
 ]
\ No newline at end of file